@@ -0,0 +1,63 @@
+"""
+Server-side reduction for dashboard charts and tables: pre-binned histograms, time series
+resampled to a granularity that fits a point budget, and fixed-size table pages, so what is
+sent to the browser is bounded regardless of data volume.
+"""
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# (pandas offset alias, label, approximate days per period), finest first
+FREQUENCIES = (("D", "day", 1), ("W-MON", "week", 7), ("MS", "month", 30.44), ("QS", "quarter", 91.3))
+
+
+def histogram(values: pd.Series, bins: int = 20, value_range: Optional[Tuple[float, float]] = None) -> pd.DataFrame:
+    """Counts per equal-width bin (NaNs dropped) - plot with a bar chart instead of px.histogram."""
+    values = pd.to_numeric(values, errors="coerce").dropna().to_numpy()
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return pd.DataFrame({"bin_start": edges[:-1], "bin_end": edges[1:], "count": counts})
+
+
+def choose_frequency(start: pd.Timestamp, end: pd.Timestamp, max_points: int = 366) -> Tuple[str, str]:
+    """Finest of day/week/month/quarter that keeps (end - start) within max_points periods."""
+    span_days = max((pd.Timestamp(end) - pd.Timestamp(start)).days, 1)
+    for alias, label, days in FREQUENCIES:
+        if span_days / days <= max_points:
+            return alias, label
+    return FREQUENCIES[-1][0], FREQUENCIES[-1][1]
+
+
+def resample_series(
+    frame: pd.DataFrame,
+    date_col: str,
+    value_cols: Sequence[str],
+    max_points: int = 366,
+) -> Tuple[pd.DataFrame, str]:
+    """Sum value_cols per day/week/month/quarter chosen from the date range; returns (frame, label)."""
+    if frame.empty:
+        return frame, "day"
+    dates = pd.to_datetime(frame[date_col])
+    alias, label = choose_frequency(dates.min(), dates.max(), max_points)
+    out = frame.assign(**{date_col: dates}).set_index(date_col)[list(value_cols)].resample(alias).sum().reset_index()
+    return out, label
+
+
+def top_n(frame: pd.DataFrame, label_col: str, value_col: str, n: int = 25, other: str = "Other") -> pd.DataFrame:
+    """Largest n rows by value_col; the remainder is folded into a single `other` row."""
+    if len(frame) <= n:
+        return frame
+    ranked = frame.sort_values(value_col, ascending=False)
+    head, rest = ranked.iloc[:n], ranked.iloc[n:]
+    return pd.concat([head, pd.DataFrame({label_col: [other], value_col: [rest[value_col].sum()]})], ignore_index=True)
+
+
+def page_bounds(total: int, page: int, page_size: int) -> Tuple[int, int]:
+    start = min(max(page, 0) * page_size, total)
+    return start, min(start + page_size, total)
+
+
+def page_of(frame: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+    """Zero-based page of frame rows."""
+    start, end = page_bounds(len(frame), page, page_size)
+    return frame.iloc[start:end]
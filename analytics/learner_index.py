@@ -0,0 +1,43 @@
+"""
+Learner index over the enrollment model: rows are grouped by learner_id once, so a learner's
+enrollments are a slice (binary search on sorted ids) instead of a full boolean scan, and
+prefix search over ids is a pair of searchsorted calls with pagination.
+"""
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class LearnerIndex:
+    def __init__(self, frame: pd.DataFrame, column: str = "learner_id"):
+        codes, uniques = pd.factorize(frame[column], sort=True)
+        ids = np.asarray(uniques, dtype=str)
+        if len(ids) > 1 and not (ids[:-1] <= ids[1:]).all():
+            # Categoricals sort by category order and numbers numerically; search needs string order
+            codes, uniques = pd.factorize(frame[column].astype(str).where(frame[column].notna()), sort=True)
+            ids = np.asarray(uniques, dtype=str)
+        valid = codes >= 0
+        order = np.argsort(codes[valid], kind="stable")
+        counts = np.bincount(codes[valid], minlength=len(uniques))
+        self.frame = frame.iloc[np.flatnonzero(valid)[order]].reset_index(drop=True)
+        self.ids = ids
+        self.ends = np.cumsum(counts)
+        self.starts = self.ends - counts
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self, learner_id: str) -> pd.DataFrame:
+        """All rows for learner_id (empty frame if unknown)."""
+        pos = np.searchsorted(self.ids, learner_id)
+        if pos >= len(self.ids) or self.ids[pos] != learner_id:
+            return self.frame.iloc[0:0]
+        return self.frame.iloc[self.starts[pos]:self.ends[pos]]
+
+    def search(self, prefix: str = "", page: int = 0, page_size: int = 50) -> Tuple[List[str], int]:
+        """One page of ids starting with prefix, in sorted order, plus the total number of matches."""
+        lo = np.searchsorted(self.ids, prefix, side="left")
+        hi = np.searchsorted(self.ids, prefix + "\U0010ffff", side="left") if prefix else len(self.ids)
+        start = lo + max(page, 0) * page_size
+        return self.ids[start:min(hi, start + page_size)].tolist(), int(hi - lo)
@@ -0,0 +1,50 @@
+"""
+Typed, pre-joined enrollment model shared by dashboard pages: one merge with the course
+dimension, parsed dates, categorical ids and a boolean certificate flag, plus a source
+fingerprint used to invalidate caches when the underlying files change.
+"""
+import os
+from pathlib import Path
+from typing import Iterable, Tuple
+
+import pandas as pd
+
+CATEGORY_COLUMNS = ("learner_id", "course_id", "instructor_id", "course_name", "category_name", "level_code")
+
+
+def source_fingerprint(paths: Iterable[Path]) -> Tuple:
+    """(path, mtime_ns, size) per existing file - cheap to compute on every rerun, changes on any rewrite."""
+    out = []
+    for p in paths:
+        p = Path(p)
+        if p.is_dir():
+            out.extend(source_fingerprint(sorted(p.glob("*.parquet"))))
+        elif p.exists():
+            st = os.stat(p)
+            out.append((str(p), st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+def to_bool(series: pd.Series) -> pd.Series:
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.strip().str.lower().isin(("true", "1", "yes"))
+
+
+def enrollment_model(enrollments: pd.DataFrame, courses: pd.DataFrame) -> pd.DataFrame:
+    """Enrollments joined to courses once, with compact dtypes for repeated filtering/grouping."""
+    if enrollments.empty:
+        return enrollments
+    enr = enrollments.merge(courses, on="course_id", how="left") if not courses.empty else enrollments.copy()
+    if "enroll_date" in enr.columns:
+        enr["enroll_date"] = pd.to_datetime(enr["enroll_date"], errors="coerce")
+    if "progress_pct" in enr.columns:
+        enr["progress_pct"] = pd.to_numeric(enr["progress_pct"], errors="coerce").astype("float32")
+    if "time_spent_minutes" in enr.columns:
+        enr["time_spent_minutes"] = pd.to_numeric(enr["time_spent_minutes"], errors="coerce")
+    if "certificate_issued" in enr.columns:
+        enr["certificate_issued"] = to_bool(enr["certificate_issued"])
+    for col in CATEGORY_COLUMNS:
+        if col in enr.columns:
+            enr[col] = enr[col].astype("category")
+    return enr
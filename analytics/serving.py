@@ -0,0 +1,271 @@
+"""
+Shared aggregation engine and serving layer for the dashboard and the Power BI export:
+pre-aggregated Parquet tables (summary, by date, course, course name, category, learner,
+progress histogram) computed in one pass over the ETL staging output (or the sample CSVs).
+Results are memoized by the sources' fingerprint - in memory and in the data/serving store,
+which is stamped with the fingerprint it was built from - so each data refresh is aggregated
+once, not once per consumer per rerun.
+Run from project root: python analytics/serving.py
+"""
+import os
+import sys
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pandas as pd
+
+BASE = Path(__file__).resolve().parent.parent
+DATA = BASE / "data"
+STAGING = DATA / "staging"
+SERVING = DATA / "serving"
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from analytics.downsample import histogram  # noqa: E402
+from analytics.model import source_fingerprint  # noqa: E402
+
+AGGREGATES = ("summary", "by_date", "by_course", "by_course_name", "by_category", "by_learner", "progress_hist")
+ENROLLMENT_COLUMNS = [
+    "enrollment_id", "learner_id", "course_id", "enroll_date",
+    "progress_pct", "time_spent_minutes", "certificate_issued",
+]
+ENTITIES = ("learners", "enrollments", "courses")
+PROGRESS_BINS = 20
+FINGERPRINT_NAME = "_fingerprint.json"
+
+# fingerprint -> aggregates; holds only the latest refresh
+_memo: dict = {}
+
+
+def entity_paths(entity: str) -> list:
+    """Where an entity can come from: staged Parquet parts, else the sample CSV."""
+    return [STAGING / entity, DATA / f"sample_{entity}.csv"]
+
+
+def sources_fingerprint(entities=ENTITIES) -> tuple:
+    return source_fingerprint(p for entity in entities for p in entity_paths(entity))
+
+
+def read_entity(entity: str, columns: Optional[list] = None) -> pd.DataFrame:
+    """Staged Parquet parts (staging/<entity>/) when present, else data/sample_<entity>.csv."""
+    staged, sample = entity_paths(entity)
+    if staged.is_dir() and any(staged.glob("*.parquet")):
+        return pd.read_parquet(staged, columns=columns)
+    if not sample.exists():
+        return pd.DataFrame()
+    return pd.read_csv(sample, usecols=lambda c: columns is None or c in columns)
+
+
+def input_source() -> str:
+    staged = STAGING / "enrollments"
+    return "staging" if staged.is_dir() and any(staged.glob("*.parquet")) else "sample"
+
+
+@dataclass(eq=False)
+class AnalyticsInput:
+    """The frames every aggregate is computed from, plus the fingerprint they were read at."""
+
+    enrollments: pd.DataFrame
+    courses: pd.DataFrame
+    learners: pd.DataFrame = field(default_factory=pd.DataFrame)
+    fingerprint: tuple = ()
+    source: str = "sample"
+
+    @classmethod
+    def load(cls, with_learners: bool = False, enrollment_columns: Optional[list] = ENROLLMENT_COLUMNS) -> "AnalyticsInput":
+        fingerprint = sources_fingerprint()
+        return cls(
+            enrollments=read_entity("enrollments", enrollment_columns),
+            courses=read_entity("courses"),
+            learners=read_entity("learners") if with_learners else pd.DataFrame(),
+            fingerprint=fingerprint,
+            source=input_source(),
+        )
+
+
+def load_sources() -> Tuple[pd.DataFrame, pd.DataFrame]:
+    inputs = AnalyticsInput.load()
+    return inputs.enrollments, inputs.courses
+
+
+def completion_flags(enrollments: pd.DataFrame) -> pd.Series:
+    """Completed = certificate_issued when that column carries booleans, else progress_pct >= 100."""
+    cert = enrollments.get("certificate_issued")
+    if cert is not None and (cert.dtype == bool or cert.astype(str).str.lower().eq("true").any()):
+        return cert.astype(str).str.lower().eq("true")
+    if "progress_pct" in enrollments.columns:
+        return pd.to_numeric(enrollments["progress_pct"], errors="coerce") >= 100
+    return pd.Series(False, index=enrollments.index)
+
+
+def build_aggregates(enrollments: pd.DataFrame, courses: pd.DataFrame) -> dict:
+    """
+    All aggregates from one typed pass over enrollments. Course-level sums are grouped on
+    course_id only and joined to the (small) course table afterwards, and the category and
+    course-name views are rolled up from that table rather than from the enrollment rows.
+    """
+    enr = pd.DataFrame(index=enrollments.index)
+    enr["completed"] = completion_flags(enrollments)
+    enr["progress_pct"] = pd.to_numeric(enrollments.get("progress_pct"), errors="coerce")
+    for col in ("learner_id", "course_id", "time_spent_minutes"):
+        if col in enrollments.columns:
+            enr[col] = enrollments[col]
+
+    summary = pd.DataFrame([{
+        "total_enrollments": len(enr),
+        "completed": int(enr["completed"].sum()),
+        "unique_learners": enr["learner_id"].nunique() if "learner_id" in enr.columns else 0,
+        "unique_courses": enr["course_id"].nunique() if "course_id" in enr.columns else 0,
+    }])
+
+    by_date = pd.DataFrame(columns=["enroll_date", "count", "completed"])
+    if "enroll_date" in enrollments.columns:
+        dates = pd.to_datetime(enrollments["enroll_date"])
+        by_date = (
+            enr.groupby(dates.rename("enroll_date"))
+            .agg(count=("completed", "size"), completed=("completed", "sum"))
+            .reset_index()
+        )
+
+    by_course = pd.DataFrame()
+    if "course_id" in enr.columns:
+        course_sums = (
+            enr.groupby("course_id")
+            .agg(
+                enrollments=("completed", "size"),
+                progress_sum=("progress_pct", "sum"),
+                progress_count=("progress_pct", "count"),
+                completed=("completed", "sum"),
+            )
+            .reset_index()
+        )
+        if not courses.empty:
+            # Keep courses without enrollments so the catalogue view stays complete
+            by_course = courses.merge(course_sums, on="course_id", how="left")
+            by_course[["enrollments", "completed", "progress_count"]] = (
+                by_course[["enrollments", "completed", "progress_count"]].fillna(0).astype("int64")
+            )
+            by_course["progress_sum"] = by_course["progress_sum"].fillna(0.0)
+        else:
+            by_course = course_sums
+        by_course.insert(
+            by_course.columns.get_loc("progress_sum"), "avg_progress",
+            by_course["progress_sum"] / by_course["progress_count"].where(by_course["progress_count"] > 0),
+        )
+
+    by_course_name = pd.DataFrame(columns=["course_name", "enrollments", "avg_progress"])
+    if "course_name" in by_course.columns:
+        named = by_course[by_course["enrollments"] > 0].groupby("course_name")[["enrollments", "progress_sum", "progress_count"]].sum()
+        named["avg_progress"] = named["progress_sum"] / named["progress_count"].where(named["progress_count"] > 0)
+        by_course_name = named[["enrollments", "avg_progress"]].reset_index()
+
+    by_category = pd.DataFrame(columns=["category_name", "courses", "enrollments"])
+    if "category_name" in by_course.columns:
+        by_category = (
+            by_course.groupby("category_name")
+            .agg(courses=("course_id", "nunique"), enrollments=("enrollments", "sum"))
+            .reset_index()
+        )
+
+    by_learner = pd.DataFrame()
+    if "learner_id" in enr.columns:
+        learner_aggs = {"courses": ("completed", "size"), "avg_progress": ("progress_pct", "mean"), "completed": ("completed", "sum")}
+        if "time_spent_minutes" in enr.columns:
+            learner_aggs["time_spent_minutes"] = ("time_spent_minutes", "sum")
+        by_learner = enr.groupby("learner_id").agg(**learner_aggs).reset_index()
+
+    progress_hist = histogram(enr["progress_pct"], bins=PROGRESS_BINS, value_range=(0, 100))
+
+    return {
+        "summary": summary,
+        "by_date": by_date,
+        "by_course": by_course.drop(columns=["progress_sum", "progress_count"], errors="ignore"),
+        "by_course_name": by_course_name,
+        "by_category": by_category,
+        "by_learner": by_learner,
+        "progress_hist": progress_hist,
+    }
+
+
+def _as_json(fingerprint: tuple) -> list:
+    return json.loads(json.dumps(fingerprint))
+
+
+def write_aggregates(aggs: dict, out_dir: Path = SERVING, fingerprint: Optional[tuple] = None) -> None:
+    """Each table is written to a temp file and renamed, so readers never see a partial file.
+    The fingerprint stamp is written last, so a store is only trusted once every table is in place."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = out_dir / FINGERPRINT_NAME
+    if stamp.exists():
+        stamp.unlink()
+    for name, df in aggs.items():
+        tmp = out_dir / f".{name}.parquet.tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, out_dir / f"{name}.parquet")
+    if fingerprint is not None:
+        stamp.write_text(json.dumps(_as_json(fingerprint)))
+
+
+def _store_matches(out_dir: Path, fingerprint: Optional[tuple]) -> bool:
+    if not all((out_dir / f"{name}.parquet").exists() for name in AGGREGATES):
+        return False
+    if fingerprint is None:
+        return True
+    stamp = out_dir / FINGERPRINT_NAME
+    return stamp.exists() and json.loads(stamp.read_text()) == _as_json(fingerprint)
+
+
+def read_aggregates(out_dir: Path = SERVING, fingerprint: Optional[tuple] = None) -> Optional[dict]:
+    """The serving tables, or None if the store has not been built (or, with fingerprint, was
+    built from different sources)."""
+    out_dir = Path(out_dir)
+    if not _store_matches(out_dir, fingerprint):
+        return None
+    return {name: pd.read_parquet(out_dir / f"{name}.parquet") for name in AGGREGATES}
+
+
+def serving_is_current(out_dir: Optional[Path] = None) -> bool:
+    """True when the serving store holds every table, built from the current sources."""
+    return _store_matches(Path(SERVING if out_dir is None else out_dir), sources_fingerprint())
+
+
+def get_aggregates(inputs: Optional[AnalyticsInput] = None, out_dir: Optional[Path] = None, persist: bool = True) -> dict:
+    """
+    Aggregates for the current sources: from the in-process memo, else the serving store if it
+    was built from the same fingerprint, else computed once (and persisted for other consumers).
+    Callers must treat the returned frames as read-only.
+    """
+    out_dir = SERVING if out_dir is None else out_dir
+    fingerprint = inputs.fingerprint if inputs is not None else sources_fingerprint()
+    if fingerprint in _memo:
+        return _memo[fingerprint]
+    aggs = read_aggregates(out_dir, fingerprint)
+    if aggs is None:
+        inputs = inputs if inputs is not None else AnalyticsInput.load()
+        aggs = build_aggregates(inputs.enrollments, inputs.courses)
+        if persist:
+            write_aggregates(aggs, out_dir, fingerprint)
+    _memo.clear()
+    _memo[fingerprint] = aggs
+    return aggs
+
+
+def build_serving_layer(out_dir: Path = SERVING) -> dict:
+    inputs = AnalyticsInput.load()
+    aggs = build_aggregates(inputs.enrollments, inputs.courses)
+    write_aggregates(aggs, out_dir, inputs.fingerprint)
+    _memo.clear()
+    _memo[inputs.fingerprint] = aggs
+    return aggs
+
+
+def main():
+    aggs = build_serving_layer()
+    print(f"Serving aggregates written to {SERVING}: " + ", ".join(f"{k} ({len(v)} rows)" for k, v in aggs.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from analytics.downsample import choose_frequency, histogram, page_bounds, page_of, resample_series, top_n
+
+
+@pytest.mark.parametrize("total, page, page_size, expected", [
+    (10, 0, 4, (0, 4)),
+    (10, 2, 4, (8, 10)),
+    (10, 3, 4, (10, 10)),
+    (10, -1, 4, (0, 4)),
+    (0, 0, 4, (0, 0)),
+    (8, 1, 4, (4, 8)),
+])
+def test_page_bounds(total, page, page_size, expected):
+    assert page_bounds(total, page, page_size) == expected
+
+
+def test_page_of_returns_the_zero_based_page():
+    frame = pd.DataFrame({"id": range(10)})
+
+    assert page_of(frame, 1, 4)["id"].tolist() == [4, 5, 6, 7]
+    assert page_of(frame, 2, 4)["id"].tolist() == [8, 9]
+    assert page_of(frame, 5, 4).empty
+
+
+@pytest.mark.parametrize("days, max_points, expected", [
+    (30, 366, "day"),
+    (365, 366, "day"),
+    (800, 366, "week"),
+    (365 * 10, 366, "month"),
+    (365 * 40, 366, "quarter"),
+    (365 * 200, 366, "quarter"),
+])
+def test_choose_frequency_keeps_within_the_point_budget(days, max_points, expected):
+    start = pd.Timestamp("2020-01-01")
+    assert choose_frequency(start, start + pd.Timedelta(days=days), max_points)[1] == expected
+
+
+def test_resample_series_sums_per_chosen_period():
+    frame = pd.DataFrame({
+        "enroll_date": ["2024-01-01", "2024-01-15", "2024-02-03", "2025-06-30"],
+        "count": [1, 2, 3, 4],
+    })
+
+    out, label = resample_series(frame, "enroll_date", ["count"], max_points=24)
+
+    assert label == "month"
+    assert len(out) <= 24
+    assert out["count"].sum() == 10
+    assert out.set_index("enroll_date").loc["2024-01-01", "count"] == 3
+
+
+def test_resample_series_empty_frame():
+    frame = pd.DataFrame({"enroll_date": [], "count": []})
+
+    out, label = resample_series(frame, "enroll_date", ["count"])
+
+    assert out.empty and label == "day"
+
+
+def test_top_n_folds_the_remainder_into_other():
+    frame = pd.DataFrame({"course": list("abcde"), "n": [5, 1, 4, 2, 3]})
+
+    out = top_n(frame, "course", "n", n=2)
+
+    assert out["course"].tolist() == ["a", "c", "Other"]
+    assert out["n"].tolist() == [5, 4, 6]
+    assert top_n(frame, "course", "n", n=5) is frame
+
+
+def test_histogram_drops_nans_and_counts_every_value():
+    out = histogram(pd.Series([0, 10, 20, None, "x", 100]), bins=4, value_range=(0, 100))
+
+    assert out["count"].tolist() == [3, 0, 0, 1]
+    assert out["bin_start"].tolist() == [0, 25, 50, 75]
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from analytics.learner_index import LearnerIndex
+
+
+def _frame():
+    return pd.DataFrame({
+        "learner_id": ["L2", "L1", "L3", "L1", None, "L2", "L10"],
+        "enrollment_id": ["E1", "E2", "E3", "E4", "E5", "E6", "E7"],
+    })
+
+
+def test_rows_returns_each_learners_rows_in_original_order():
+    index = LearnerIndex(_frame())
+
+    assert len(index) == 4
+    assert index.rows("L1")["enrollment_id"].tolist() == ["E2", "E4"]
+    assert index.rows("L2")["enrollment_id"].tolist() == ["E1", "E6"]
+    assert index.rows("L10")["enrollment_id"].tolist() == ["E7"]
+
+
+def test_rows_for_unknown_or_missing_ids_is_empty():
+    index = LearnerIndex(_frame())
+
+    for learner_id in ("L0", "L4", "ZZ", "", "L1 "):
+        empty = index.rows(learner_id)
+        assert empty.empty
+        assert list(empty.columns) == ["learner_id", "enrollment_id"]
+    assert "E5" not in index.frame["enrollment_id"].tolist()
+
+
+def test_search_pages_prefix_matches_in_sorted_order():
+    index = LearnerIndex(_frame())
+
+    assert index.search("L1", page_size=1) == (["L1"], 2)
+    assert index.search("L1", page=1, page_size=1) == (["L10"], 2)
+    assert index.search("L1", page=2, page_size=1) == ([], 2)
+    assert index.search("L1", page=-1, page_size=1) == (["L1"], 2)
+    assert index.search("X") == ([], 0)
+    assert index.search() == (["L1", "L10", "L2", "L3"], 4)
+
+
+def test_non_string_ids_are_searched_in_string_order():
+    numeric = LearnerIndex(pd.DataFrame({"learner_id": [2, 10, 2], "n": [1, 2, 3]}))
+    assert numeric.ids.tolist() == ["10", "2"]
+    assert numeric.rows("2")["n"].tolist() == [1, 3]
+
+    categories = pd.Categorical(["b", "a", "b"], categories=["b", "a"])
+    categorical = LearnerIndex(pd.DataFrame({"learner_id": categories, "n": [1, 2, 3]}))
+    assert categorical.search("") == (["a", "b"], 2)
+    assert categorical.rows("b")["n"].tolist() == [1, 3]
+    assert np.array_equal(categorical.starts, [0, 1])
@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+
+from analytics.model import enrollment_model, source_fingerprint, to_bool
+
+
+def _enrollments():
+    return pd.DataFrame({
+        "enrollment_id": ["E1", "E2", "E3"],
+        "learner_id": ["L1", "L2", "L1"],
+        "course_id": ["C1", "C2", "C9"],
+        "enroll_date": ["2024-01-10", "not a date", "2024-03-01"],
+        "progress_pct": ["40", "x", 100],
+        "time_spent_minutes": [5, "", 30],
+        "certificate_issued": ["True", "no", " YES "],
+    })
+
+
+def _courses():
+    return pd.DataFrame({"course_id": ["C1", "C2"], "course_name": ["Python", "SQL"]})
+
+
+def test_to_bool():
+    assert to_bool(pd.Series(["true", " TRUE ", "1", "yes", "false", "0", "", None])).tolist() == [
+        True, True, True, True, False, False, False, False,
+    ]
+    assert to_bool(pd.Series([1, 0])).tolist() == [True, False]
+    flags = pd.Series([True, False])
+    assert to_bool(flags) is flags
+
+
+def test_enrollment_model_joins_and_types_columns():
+    enr = enrollment_model(_enrollments(), _courses())
+
+    assert enr["course_name"].tolist()[:2] == ["Python", "SQL"]
+    assert pd.isna(enr["course_name"].iloc[2])
+    assert enr["enroll_date"].iloc[0] == pd.Timestamp("2024-01-10")
+    assert pd.isna(enr["enroll_date"].iloc[1])
+    assert enr["progress_pct"].dtype == "float32"
+    assert enr["progress_pct"].isna().tolist() == [False, True, False]
+    assert enr["time_spent_minutes"].isna().tolist() == [False, True, False]
+    assert enr["certificate_issued"].tolist() == [True, False, True]
+    for col in ("learner_id", "course_id", "course_name"):
+        assert isinstance(enr[col].dtype, pd.CategoricalDtype)
+
+
+def test_enrollment_model_without_courses_leaves_the_input_alone():
+    enrollments = _enrollments()
+
+    enr = enrollment_model(enrollments, pd.DataFrame())
+
+    assert "course_name" not in enr.columns
+    pd.testing.assert_frame_equal(enrollments, _enrollments())
+    assert enrollment_model(enrollments.iloc[0:0], _courses()).empty
+
+
+def test_source_fingerprint_tracks_files_and_parquet_dirs(tmp_path):
+    csv = tmp_path / "enrollments.csv"
+    csv.write_text("a\n1\n")
+    parts = tmp_path / "staging"
+    parts.mkdir()
+    for name in ("part-00001.parquet", "part-00000.parquet", "notes.txt"):
+        (parts / name).write_text("x")
+
+    before = source_fingerprint([csv, parts, tmp_path / "missing.csv"])
+
+    assert [entry[0] for entry in before] == [
+        str(csv), str(parts / "part-00000.parquet"), str(parts / "part-00001.parquet"),
+    ]
+    assert source_fingerprint([csv, parts]) == before
+
+    csv.write_text("a\n1\n2\n")
+    stat = csv.stat()
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert source_fingerprint([csv, parts]) != before
@@ -0,0 +1,37 @@
+import os
+
+import pandas as pd
+import pytest
+
+from analytics import serving
+
+
+def test_store_is_reused_for_unchanged_sources(data_dir, monkeypatch):
+    first = serving.get_aggregates()
+    assert (data_dir / "serving" / serving.FINGERPRINT_NAME).exists()
+
+    serving._memo.clear()
+    monkeypatch.setattr(serving, "build_aggregates", lambda *a: pytest.fail("store should be reused"))
+    second = serving.get_aggregates()
+
+    for name in serving.AGGREGATES:
+        pd.testing.assert_frame_equal(first[name], second[name], check_dtype=False)
+
+
+def test_store_is_rebuilt_after_sources_change(data_dir):
+    before = serving.get_aggregates()["summary"]
+
+    path = data_dir / "sample_enrollments.csv"
+    enrollments = pd.read_csv(path)
+    pd.concat([enrollments, enrollments.tail(1).assign(enrollment_id="E999")]).to_csv(path, index=False)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    after = serving.get_aggregates()["summary"]
+    assert after["total_enrollments"].iloc[0] == before["total_enrollments"].iloc[0] + 1
+
+
+def test_read_aggregates_rejects_a_store_from_other_sources(data_dir):
+    serving.build_serving_layer(data_dir / "serving")
+    assert serving.read_aggregates(data_dir / "serving", serving.sources_fingerprint()) is not None
+    assert serving.read_aggregates(data_dir / "serving", (("other", 0, 0),)) is None
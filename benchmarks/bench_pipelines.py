@@ -0,0 +1,262 @@
+"""
+Benchmark: end-to-end data paths at several scales - ETL (elt_pipeline_csv_to_dw and the chunked
+run_pipelines), Spark batch_enrollments / batch_events_aggregate, the Power BI export and the
+dashboard aggregations - on synthetic datasets from scripts/generate_synthetic_data.py.
+Each benchmark runs in a fresh process, so peak RSS is its own (for Spark, the Python driver only).
+Results are written as JSON; with a baseline, slower or larger runs beyond the tolerance are flagged.
+
+Run from project root:
+  python benchmarks/bench_pipelines.py --scales small,medium
+  python benchmarks/bench_pipelines.py --scales small --save-baseline
+  python benchmarks/bench_pipelines.py --scales small --baseline benchmarks/baseline.json
+"""
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing as mp
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from etl.extract_load import peak_rss_mb  # noqa: E402
+from scripts.generate_synthetic_data import (  # noqa: E402
+    iter_courses,
+    iter_enrollments,
+    iter_events,
+    iter_learners,
+    write_entity,
+)
+
+try:
+    import pyspark  # noqa: F401
+    HAS_SPARK = True
+except ImportError:
+    HAS_SPARK = False
+
+BENCH_DATA = BASE / "data" / "bench"
+RESULTS = BASE / "benchmarks" / "results"
+DEFAULT_BASELINE = BASE / "benchmarks" / "baseline.json"
+SCALES = {
+    "small": {"learners": 2_000, "courses": 100, "enrollments": 20_000, "events": 100_000},
+    "medium": {"learners": 50_000, "courses": 500, "enrollments": 1_000_000, "events": 5_000_000},
+    "large": {"learners": 500_000, "courses": 2_000, "enrollments": 10_000_000, "events": 50_000_000},
+}
+ENTITIES = ("learners", "courses", "enrollments")
+SPEC_NAME = "_spec.json"
+
+
+def ensure_dataset(scale: str, seed: int = 42) -> Path:
+    """data/bench/<scale>/: raw CSVs plus events Parquet, regenerated only when the spec changes."""
+    spec = {**SCALES[scale], "seed": seed}
+    root = BENCH_DATA / scale
+    spec_path = root / SPEC_NAME
+    if spec_path.exists() and json.loads(spec_path.read_text()) == spec:
+        return root
+    shutil.rmtree(root, ignore_errors=True)
+    raw, start, days = root / "raw", pd.Timestamp("2024-01-01"), 365
+    common = dict(chunk_rows=250_000, seed=seed)
+    write_entity("learners", iter_learners(spec["learners"], start_date=start, days=days, **common), raw, "csv")
+    write_entity("courses", iter_courses(spec["courses"], **common), raw, "csv")
+    write_entity("enrollments", iter_enrollments(spec["enrollments"], spec["learners"], spec["courses"],
+                                                 start_date=start, days=days, skew=1.1, **common), raw, "csv")
+    write_entity("events", iter_events(spec["events"], spec["learners"], spec["courses"],
+                                       start_date=start, days=days, skew=1.1, **common), root / "events", "parquet")
+    spec_path.write_text(json.dumps(spec))
+    return root
+
+
+def dataset_rows(dataset: Path, entities=ENTITIES) -> int:
+    spec = json.loads((dataset / SPEC_NAME).read_text())
+    return sum(spec[e] for e in entities)
+
+
+def _etl_config() -> dict:
+    """Settings without Snowflake credentials, so only local staging is measured."""
+    from etl.extract_load import load_config
+    config = load_config()
+    config["snowflake"] = {}
+    return config
+
+
+def bench_etl_batch(dataset: Path, work: Path) -> int:
+    import etl.extract_load as el
+    el.STAGING = work / "staging"
+    config = _etl_config()
+    for entity in ENTITIES:
+        el.elt_pipeline_csv_to_dw(str(dataset / "raw" / f"{entity}.csv"), entity, config)
+    return dataset_rows(dataset)
+
+
+def bench_etl_stream(dataset: Path, work: Path) -> int:
+    import etl.extract_load as el
+    el.STAGING = work / "staging"
+    raw = work / "raw"
+    raw.mkdir(parents=True, exist_ok=True)
+    for entity in ENTITIES:
+        (raw / f"{entity}.csv").symlink_to(dataset / "raw" / f"{entity}.csv")
+    return sum(s["rows"] for s in el.run_pipelines(raw, _etl_config()))
+
+
+def bench_spark_enrollments(dataset: Path, work: Path) -> int:
+    from spark_jobs.batch_processing import batch_enrollments, get_spark
+    spark = get_spark("bench-enrollments")
+    try:
+        batch_enrollments(spark, str(dataset / "raw"), str(work / "enrollments"), pattern="enrollments*.csv")
+        return dataset_rows(dataset, ["enrollments"])
+    finally:
+        spark.stop()
+
+
+def bench_spark_events(dataset: Path, work: Path) -> int:
+    from spark_jobs.batch_processing import batch_events_aggregate, get_spark
+    spark = get_spark("bench-events")
+    try:
+        batch_events_aggregate(spark, str(dataset / "events"), str(work / "events_daily"), str(work / "sessions"))
+        return dataset_rows(dataset, ["events"])
+    finally:
+        spark.stop()
+
+
+def bench_powerbi(dataset: Path, work: Path) -> int:
+    import analytics.serving as serving
+    import powerbi.build_powerbi_data as pbi
+    data = work / "data"
+    data.mkdir(parents=True, exist_ok=True)
+    for entity in ENTITIES:
+        (data / f"sample_{entity}.csv").symlink_to(dataset / "raw" / f"{entity}.csv")
+    serving.DATA, serving.STAGING, serving.SERVING = data, work / "staging", work / "serving"
+    pbi.OUT, pbi.OUT_DATA = work / "powerbi", work / "powerbi" / "data"
+    pbi.OUT.mkdir(parents=True, exist_ok=True)
+    pbi.main(["--force"])
+    return dataset_rows(dataset)
+
+
+def bench_dashboard_aggregates(dataset: Path, work: Path) -> int:
+    from analytics.serving import ENROLLMENT_COLUMNS, build_aggregates
+    enrollments = pd.read_csv(dataset / "raw" / "enrollments.csv", usecols=ENROLLMENT_COLUMNS)
+    courses = pd.read_csv(dataset / "raw" / "courses.csv")
+    build_aggregates(enrollments, courses)
+    return len(enrollments)
+
+
+BENCHMARKS = {
+    "etl_batch": (bench_etl_batch, False),
+    "etl_stream": (bench_etl_stream, False),
+    "spark_enrollments": (bench_spark_enrollments, True),
+    "spark_events": (bench_spark_events, True),
+    "powerbi_export": (bench_powerbi, False),
+    "dashboard_aggregates": (bench_dashboard_aggregates, False),
+}
+
+
+def process_peak_mb() -> float:
+    """
+    VmHWM of this process where /proc is available: unlike ru_maxrss it is reset by exec, so a
+    spawned child does not inherit the parent's peak (e.g. from dataset generation).
+    """
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return peak_rss_mb()
+
+
+def _child(name: str, dataset: str, work: str, queue) -> None:
+    fn, _ = BENCHMARKS[name]
+    start = time.perf_counter()
+    rows = fn(Path(dataset), Path(work))
+    seconds = time.perf_counter() - start
+    queue.put({"rows": rows, "seconds": round(seconds, 3),
+               "rows_per_sec": round(rows / seconds) if seconds else None, "peak_rss_mb": round(process_peak_mb(), 1)})
+
+
+def run_benchmark(name: str, scale: str, dataset: Path) -> dict:
+    """Run one benchmark in a spawned process (clean peak RSS); work files go to a scratch dir."""
+    result = {"benchmark": name, "scale": scale}
+    if BENCHMARKS[name][1] and not HAS_SPARK:
+        return {**result, "status": "skipped", "reason": "pyspark not installed"}
+    work = BENCH_DATA / "_work" / f"{name}_{scale}"
+    shutil.rmtree(work, ignore_errors=True)
+    work.mkdir(parents=True)
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(name, str(dataset), str(work), queue))
+    proc.start()
+    proc.join()
+    shutil.rmtree(work, ignore_errors=True)
+    if proc.exitcode != 0 or queue.empty():
+        return {**result, "status": "failed", "exitcode": proc.exitcode}
+    return {**result, "status": "ok", **queue.get()}
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Results whose seconds or peak_rss_mb exceed the baseline run by more than tolerance."""
+    base = {(r["benchmark"], r["scale"]): r for r in baseline if r.get("status") == "ok"}
+    regressions = []
+    for r in results:
+        ref = base.get((r["benchmark"], r["scale"]))
+        if r.get("status") != "ok" or ref is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if ref.get(metric) and r[metric] > ref[metric] * (1 + tolerance):
+                regressions.append({"benchmark": r["benchmark"], "scale": r["scale"], "metric": metric,
+                                    "baseline": ref[metric], "current": r[metric],
+                                    "change_pct": round(100 * (r[metric] / ref[metric] - 1), 1)})
+    return regressions
+
+
+def print_report(results: list) -> None:
+    print(f"{'benchmark':<22}{'scale':<8}{'rows':>12}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}")
+    for r in results:
+        if r["status"] != "ok":
+            print(f"{r['benchmark']:<22}{r['scale']:<8}  {r['status']} {r.get('reason', '')}")
+            continue
+        print(f"{r['benchmark']:<22}{r['scale']:<8}{r['rows']:>12,}{r['seconds']:>10.2f}"
+              f"{r['rows_per_sec'] or 0:>12,}{r['peak_rss_mb']:>10.1f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ETL, Spark, Power BI export and dashboard paths")
+    parser.add_argument("--scales", default="small", help=f"comma-separated: {', '.join(SCALES)}")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS), help="comma-separated subset")
+    parser.add_argument("--output", help="results JSON (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown/growth vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales.split(","):
+        dataset = ensure_dataset(scale)
+        for name in args.benchmarks.split(","):
+            print(f"--- {name} @ {scale}")
+            results.append(run_benchmark(name, scale, dataset))
+    print_report(results)
+
+    output = Path(args.output) if args.output else RESULTS / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {"created": datetime.now().isoformat(timespec="seconds"), "results": results}
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved: {baseline_path}")
+    elif baseline_path.exists():
+        report["regressions"] = compare(results, json.loads(baseline_path.read_text())["results"], args.tolerance)
+        for reg in report["regressions"]:
+            print(f"REGRESSION {reg['benchmark']} @ {reg['scale']}: {reg['metric']} "
+                  f"{reg['baseline']} -> {reg['current']} (+{reg['change_pct']}%)")
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results: {output}")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
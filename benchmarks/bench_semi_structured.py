@@ -0,0 +1,75 @@
+"""
+Benchmark: per-row insert_semi_structured vs batched insert_semi_structured_batch for
+raw_learning_events backfills, against a fake cursor that sleeps a simulated round-trip per execute.
+Run from project root: python benchmarks/bench_semi_structured.py [events] [rtt_ms]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from snowflake.snowflake_ops import (  # noqa: E402
+    RecordingConnection,
+    RecordingCursor,
+    insert_semi_structured,
+    insert_semi_structured_batch,
+)
+
+EVENT_TYPES = ["video_view", "quiz_attempt", "page_view", "assignment_submit"]
+
+
+class LatencyCursor(RecordingCursor):
+    def execute(self, sql: str, params=None):
+        time.sleep(self._conn.rtt_seconds)
+        return super().execute(sql, params)
+
+
+class LatencyConnection(RecordingConnection):
+    def __init__(self, rtt_seconds: float):
+        super().__init__()
+        self.rtt_seconds = rtt_seconds
+
+    def cursor(self) -> LatencyCursor:
+        return LatencyCursor(self)
+
+
+def make_events(n: int) -> list:
+    rng = random.Random(42)
+    return [
+        {
+            "event_id": f"EV{i:09d}",
+            "learner_id": f"L{rng.randint(1, 10_000):06d}",
+            "course_id": f"C{rng.randint(100, 199)}",
+            "event_time": "2024-03-01T10:00:00",
+            "event_type": rng.choice(EVENT_TYPES),
+            "duration_seconds": rng.randint(5, 1800),
+            "score": round(rng.random() * 100, 2),
+        }
+        for i in range(n)
+    ]
+
+
+def main(events: int = 5000, rtt_ms: float = 2.0) -> None:
+    payloads = make_events(events)
+    rtt = rtt_ms / 1000
+
+    conn = LatencyConnection(rtt)
+    start = time.perf_counter()
+    for p in payloads:
+        insert_semi_structured(conn, "raw_learning_events", p, id_val=p["event_id"])
+    per_row = time.perf_counter() - start
+    print(f"per-row : {events} events, {len(conn.executed)} statements, {events / per_row:,.0f} events/s")
+
+    conn = LatencyConnection(rtt)
+    stats = insert_semi_structured_batch(conn, "raw_learning_events", payloads)
+    print(f"batched : {stats['events']} events, {stats['batches']} statements, {stats['events_per_sec']:,.0f} events/s")
+    print(f"speedup : {per_row / stats['seconds']:.1f}x at {rtt_ms} ms simulated round-trip")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 5000, float(args[1]) if len(args) > 1 else 2.0)
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from benchmarks import bench_pipelines as bench
+from etl import extract_load as el
+
+TINY = {"learners": 30, "courses": 4, "enrollments": 60, "events": 50}
+
+
+def _result(benchmark="etl_stream", seconds=1.0, peak_rss_mb=100.0, status="ok"):
+    return {"benchmark": benchmark, "scale": "small", "status": status, "seconds": seconds, "peak_rss_mb": peak_rss_mb}
+
+
+def test_compare_flags_growth_beyond_tolerance():
+    baseline = [_result(), _result("powerbi_export", seconds=2.0)]
+    results = [_result(seconds=1.25, peak_rss_mb=105.0), _result("powerbi_export", seconds=2.1)]
+
+    regressions = bench.compare(results, baseline, tolerance=0.2)
+
+    assert regressions == [{
+        "benchmark": "etl_stream", "scale": "small", "metric": "seconds",
+        "baseline": 1.0, "current": 1.25, "change_pct": 25.0,
+    }]
+
+
+def test_compare_ignores_skipped_runs_and_missing_baselines():
+    baseline = [_result(status="skipped"), _result("spark_events", seconds=1.0)]
+    results = [_result(seconds=9.0), _result("spark_events", status="skipped")]
+
+    assert bench.compare(results, baseline, tolerance=0.1) == []
+
+
+def test_dataset_is_reused_until_its_spec_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench, "BENCH_DATA", tmp_path)
+    monkeypatch.setitem(bench.SCALES, "tiny", dict(TINY))
+
+    dataset = bench.ensure_dataset("tiny")
+    stamp = (dataset / "raw" / "learners.csv").stat().st_mtime_ns
+    assert bench.ensure_dataset("tiny") == dataset
+    assert (dataset / "raw" / "learners.csv").stat().st_mtime_ns == stamp
+
+    bench.SCALES["tiny"]["learners"] = 40
+    bench.ensure_dataset("tiny")
+    assert len(pd.read_csv(dataset / "raw" / "learners.csv")) == 40
+
+
+def test_etl_stream_benchmark_counts_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench, "BENCH_DATA", tmp_path / "bench")
+    monkeypatch.setitem(bench.SCALES, "tiny", dict(TINY))
+    # The benchmark points the ETL at its work dir; monkeypatch restores the module afterwards
+    monkeypatch.setattr(el, "STAGING", el.STAGING)
+    dataset = bench.ensure_dataset("tiny")
+
+    rows = bench.bench_etl_stream(dataset, tmp_path / "work")
+
+    assert rows == bench.dataset_rows(dataset) == 94
@@ -0,0 +1,27 @@
+"""pytest setup: tests import the project's top-level packages (etl, analytics, warehouse, ...)."""
+import sys
+import shutil
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).resolve().parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """The sample CSVs copied into a scratch data dir that analytics/serving.py reads from
+    (staging and the serving store live under it too)."""
+    from analytics import serving
+
+    data = tmp_path / "data"
+    data.mkdir()
+    for entity in serving.ENTITIES:
+        shutil.copy(serving.DATA / f"sample_{entity}.csv", data)
+    monkeypatch.setattr(serving, "DATA", data)
+    monkeypatch.setattr(serving, "STAGING", data / "staging")
+    monkeypatch.setattr(serving, "SERVING", data / "serving")
+    monkeypatch.setattr(serving, "_memo", {})
+    return data
@@ -2,8 +2,10 @@
 Interactive Data Visualization Dashboard - Online Learning Platform Analytics.
 Run: streamlit run dashboard/app.py
 """
+import sys
 import streamlit as st
 import pandas as pd
+import yaml
 import plotly.express as px
 import plotly.graph_objects as go
 from pathlib import Path
@@ -18,29 +20,96 @@ st.set_page_config(
 # Load sample data (in production: connect to Snowflake or Parquet)
 BASE = Path(__file__).resolve().parent.parent
 DATA = BASE / "data"
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from analytics.downsample import page_bounds, page_of, resample_series, top_n  # noqa: E402
+from analytics.learner_index import LearnerIndex  # noqa: E402
+from analytics.model import enrollment_model, source_fingerprint  # noqa: E402
+from analytics.serving import AnalyticsInput, get_aggregates, input_source, sources_fingerprint  # noqa: E402
+from warehouse.duckdb_engine import db_path, read_dashboard_aggregates  # noqa: E402
 
 
 @st.cache_data
-def load_data():
-    learners = pd.read_csv(DATA / "sample_learners.csv") if (DATA / "sample_learners.csv").exists() else pd.DataFrame()
-    enrollments = pd.read_csv(DATA / "sample_enrollments.csv") if (DATA / "sample_enrollments.csv").exists() else pd.DataFrame()
-    courses = pd.read_csv(DATA / "sample_courses.csv") if (DATA / "sample_courses.csv").exists() else pd.DataFrame()
-    return learners, enrollments, courses
+def load_settings() -> dict:
+    """dashboard: section of config/settings.yaml."""
+    config_path = BASE / "config" / "settings.yaml"
+    if not config_path.exists():
+        return {}
+    with open(config_path) as f:
+        return (yaml.safe_load(f) or {}).get("dashboard") or {}
+
+
+def data_fingerprint() -> tuple:
+    """Cache key for everything below: changes whenever a staged part or sample CSV is rewritten
+    (or, with the duckdb backend, the warehouse file)."""
+    if load_settings().get("backend") == "duckdb":
+        return sources_fingerprint() + source_fingerprint([db_path()])
+    return sources_fingerprint()
+
+
+@st.cache_resource(max_entries=1)
+def load_input(fingerprint: tuple = ()) -> AnalyticsInput:
+    """Staged entities (data/staging) when the ETL has run, else the sample CSVs; read-only."""
+    return AnalyticsInput.load(with_learners=True, enrollment_columns=None)
+
+
+def load_data(fingerprint: tuple = ()):
+    inputs = load_input(fingerprint)
+    return inputs.learners, inputs.enrollments, inputs.courses
+
+
+@st.cache_resource(max_entries=1)
+def load_aggregates(fingerprint: tuple = ()):
+    """Shared aggregates (analytics/serving.py): read from the serving store when it matches the
+    current sources, else computed once and stored for the Power BI export as well.
+    With dashboard.backend: duckdb they are queried from the local warehouse when it was built
+    from the current sources."""
+    if load_settings().get("backend") == "duckdb":
+        aggs = read_dashboard_aggregates()
+        if aggs is not None:
+            return aggs, "warehouse"
+    source = input_source()
+    if not sources_fingerprint(("enrollments",)):
+        return None, source
+    # No inputs: get_aggregates reads the entities only when neither its memo nor the store matches
+    aggs = get_aggregates()
+    return (aggs if aggs["summary"]["total_enrollments"].iloc[0] else None), source
+
+
+@st.cache_resource(max_entries=1)
+def load_model(fingerprint: tuple = ()) -> pd.DataFrame:
+    """Pre-joined, typed enrollment frame. cache_resource hands every rerun the same object
+    (no per-rerun copy), so callers must treat it as read-only."""
+    _, enrollments, courses = load_data(fingerprint)
+    return enrollment_model(enrollments, courses)
+
+
+@st.cache_resource(max_entries=1)
+def load_learner_index(fingerprint: tuple = ()) -> LearnerIndex:
+    return LearnerIndex(load_model(fingerprint))
+
+
+def paged_dataframe(frame: pd.DataFrame, key: str) -> None:
+    """Render one page of frame (dashboard.table_page_size rows) instead of shipping it whole."""
+    page_size = int(load_settings().get("table_page_size", 1000))
+    pages = max(1, -(-len(frame) // page_size))
+    page_no = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key) if pages > 1 else 1
+    start, end = page_bounds(len(frame), int(page_no) - 1, page_size)
+    st.caption(f"Rows {start + 1 if end else 0:,}–{end:,} of {len(frame):,}")
+    st.dataframe(page_of(frame, int(page_no) - 1, page_size), use_container_width=True)
 
 
 def main():
     st.title("📊 Online Learning Platform Analytics")
     st.markdown("Star/Snowflake DW • ETL • Spark • Snowflake • Security • Performance")
 
-    learners, enrollments, courses = load_data()
-    if enrollments.empty or courses.empty:
-        st.info("Using sample data from `data/`. Add CSV files or connect to Snowflake for live data.")
-        if learners.empty:
-            learners = pd.read_csv(DATA / "sample_learners.csv") if (DATA / "sample_learners.csv").exists() else pd.DataFrame()
-        if enrollments.empty:
-            enrollments = pd.read_csv(DATA / "sample_enrollments.csv") if (DATA / "sample_enrollments.csv").exists() else pd.DataFrame()
-        if courses.empty:
-            courses = pd.read_csv(DATA / "sample_courses.csv") if (DATA / "sample_courses.csv").exists() else pd.DataFrame()
+    fingerprint = data_fingerprint()
+    aggs, source = load_aggregates(fingerprint)
+    if source == "sample":
+        st.info("Using sample data from `data/`. Run `python etl/extract_load.py` to serve staged data, or connect to Snowflake for live data.")
+    if load_settings().get("backend") == "duckdb" and source != "warehouse":
+        st.info("No DuckDB warehouse built from the current data; run `python warehouse/duckdb_engine.py build`. Showing pandas aggregates.")
 
     sidebar = st.sidebar
     sidebar.header("Filters & Navigation")
@@ -50,72 +119,90 @@ def main():
         index=0,
     )
 
-    # Merge for analytics
-    enr = enrollments.merge(courses, on="course_id", how="left") if not enrollments.empty and not courses.empty else enrollments
+    if aggs is None:
+        st.warning("No enrollment data found.")
+        return
+    summary = aggs["summary"].iloc[0]
+    by_course = aggs["by_course"]
+    enrolled_courses = by_course[by_course["enrollments"] > 0] if "enrollments" in by_course.columns else by_course
+    settings = load_settings()
+    max_categories = int(settings.get("max_chart_categories", 25))
 
     if page == "Overview":
         c1, c2, c3, c4 = st.columns(4)
         with c1:
-            st.metric("Total Enrollments", len(enrollments))
+            st.metric("Total Enrollments", int(summary["total_enrollments"]))
         with c2:
-            completed = enrollments.get("certificate_issued", pd.Series(dtype=bool))
-            if completed.dtype == bool or completed.astype(str).str.lower().eq("true").any():
-                st.metric("Completed", enrollments["certificate_issued"].astype(str).str.lower().eq("true").sum())
-            else:
-                st.metric("Completed", (enrollments.get("progress_pct", 0) >= 100).sum() if "progress_pct" in enrollments.columns else 0)
+            st.metric("Completed", int(summary["completed"]))
         with c3:
-            st.metric("Unique Learners", enrollments["learner_id"].nunique() if "learner_id" in enrollments.columns else 0)
+            st.metric("Unique Learners", int(summary["unique_learners"]))
         with c4:
-            st.metric("Unique Courses", enrollments["course_id"].nunique() if "course_id" in enrollments.columns else 0)
+            st.metric("Unique Courses", int(summary["unique_courses"]))
 
-        if not enr.empty and "progress_pct" in enr.columns:
-            fig = px.histogram(enr, x="progress_pct", nbins=20, title="Distribution of Progress %")
+        hist = aggs["progress_hist"]
+        if hist["count"].sum() > 0:
+            fig = px.bar(hist, x="bin_start", y="count", title="Distribution of Progress %", labels={"bin_start": "progress_pct"})
+            fig.update_traces(width=hist["bin_end"] - hist["bin_start"], offset=0)
             st.plotly_chart(fig, use_container_width=True)
-        if not enr.empty and "course_name" in enr.columns:
-            agg = enr.groupby("course_name").agg(enrollments=("enrollment_id", "count"), avg_progress=("progress_pct", "mean")).reset_index()
-            fig = px.bar(agg, x="course_name", y="enrollments", color="avg_progress", title="Enrollments by Course (color = avg progress %)")
+        if "course_name" in enrolled_courses.columns:
+            top_courses = enrolled_courses.nlargest(max_categories, "enrollments")
+            fig = px.bar(top_courses, x="course_name", y="enrollments", color="avg_progress", title="Enrollments by Course (color = avg progress %)")
             st.plotly_chart(fig, use_container_width=True)
 
     elif page == "Enrollments":
         st.subheader("Enrollments Over Time & by Course")
-        if "enroll_date" in enrollments.columns:
-            enrollments["enroll_date"] = pd.to_datetime(enrollments["enroll_date"])
-            by_date = enrollments.groupby("enroll_date").size().reset_index(name="count")
-            fig = px.line(by_date, x="enroll_date", y="count", title="Enrollments by Date")
+        by_date = aggs["by_date"]
+        if not by_date.empty:
+            series, grain = resample_series(by_date, "enroll_date", ["count"], int(settings.get("max_chart_points", 366)))
+            fig = px.line(series, x="enroll_date", y="count", title=f"Enrollments by Date (per {grain})")
             st.plotly_chart(fig, use_container_width=True)
-        if not enr.empty:
-            by_course = enr.groupby("course_name").size().reset_index(name="enrollments")
-            fig = px.pie(by_course, values="enrollments", names="course_name", title="Share by Course")
+        if "course_name" in enrolled_courses.columns:
+            share = top_n(enrolled_courses[["course_name", "enrollments"]], "course_name", "enrollments", max_categories)
+            fig = px.pie(share, values="enrollments", names="course_name", title="Share by Course")
             st.plotly_chart(fig, use_container_width=True)
 
     elif page == "Courses & Categories":
         st.subheader("Courses and Categories")
-        if not courses.empty:
-            if "category_name" in courses.columns:
-                cat = courses.groupby("category_name").size().reset_index(name="courses")
-                fig = px.bar(cat, x="category_name", y="courses", title="Courses per Category")
-                st.plotly_chart(fig, use_container_width=True)
-            st.dataframe(courses, use_container_width=True)
+        by_category = aggs["by_category"]
+        if not by_category.empty:
+            fig = px.bar(by_category, x="category_name", y="courses", title="Courses per Category")
+            st.plotly_chart(fig, use_container_width=True)
+        paged_dataframe(by_course, "courses_page")
 
     elif page == "Learner Progress":
         st.subheader("Learner Progress")
+        enr = load_model(fingerprint)
         if not enr.empty and "learner_id" in enr.columns:
-            learner_id = st.selectbox("Select learner", enr["learner_id"].unique())
-            subset = enr[enr["learner_id"] == learner_id][["course_name", "progress_pct", "time_spent_minutes", "certificate_issued"]]
-            st.dataframe(subset, use_container_width=True)
-            fig = go.Figure(data=[go.Bar(x=subset["course_name"], y=subset["progress_pct"], name="Progress %")])
-            fig.update_layout(title=f"Progress for {learner_id}")
-            st.plotly_chart(fig, use_container_width=True)
+            index = load_learner_index(fingerprint)
+            page_size = int(load_settings().get("learner_page_size", 50))
+            c1, c2 = st.columns([3, 1])
+            with c1:
+                prefix = st.text_input("Search learner id", placeholder="Type a learner id prefix, e.g. L00")
+            _, total = index.search(prefix, page_size=page_size)
+            pages = max(1, -(-total // page_size))
+            with c2:
+                page_no = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+            matches, _ = index.search(prefix, page=int(page_no) - 1, page_size=page_size)
+            if not matches:
+                st.info("No learners match that prefix.")
+            else:
+                learner_id = st.selectbox(f"Select learner ({total:,} matches)", matches)
+                subset = index.rows(learner_id)[["course_name", "progress_pct", "time_spent_minutes", "certificate_issued"]]
+                st.dataframe(subset, use_container_width=True)
+                fig = go.Figure(data=[go.Bar(x=subset["course_name"], y=subset["progress_pct"], name="Progress %")])
+                fig.update_layout(title=f"Progress for {learner_id}")
+                st.plotly_chart(fig, use_container_width=True)
 
     elif page == "Data Tables":
         st.subheader("Raw Data Tables")
+        learners, enrollments, courses = load_data(fingerprint)
         tab1, tab2, tab3 = st.tabs(["Learners", "Enrollments", "Courses"])
         with tab1:
-            st.dataframe(learners, use_container_width=True)
+            paged_dataframe(learners, "learners_page")
         with tab2:
-            st.dataframe(enrollments, use_container_width=True)
+            paged_dataframe(enrollments, "enrollments_page")
         with tab3:
-            st.dataframe(courses, use_container_width=True)
+            paged_dataframe(courses, "courses_table_page")
 
     st.sidebar.markdown("---")
     st.sidebar.markdown("**Schema:** Star/Snowflake • **ETL:** Python • **Spark:** Batch + Streaming • **Security:** RBAC + Masking")
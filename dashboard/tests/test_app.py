@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+
+from analytics import serving  # noqa: E402
+from dashboard import app  # noqa: E402
+
+
+@pytest.fixture
+def aggregates(data_dir, monkeypatch):
+    """app.load_aggregates on the pandas backend, uncached."""
+    monkeypatch.setattr(app, "load_settings", lambda: {"backend": "pandas"})
+    app.load_aggregates.clear()
+    yield app.load_aggregates
+    app.load_aggregates.clear()
+
+
+def test_store_hit_does_not_read_the_sources(aggregates, data_dir, monkeypatch):
+    serving.build_serving_layer(data_dir / "serving")
+    serving._memo.clear()
+
+    def load(*args, **kwargs):
+        raise AssertionError("sources read despite a current serving store")
+
+    monkeypatch.setattr(serving.AnalyticsInput, "load", load)
+    aggs, source = aggregates(serving.sources_fingerprint())
+
+    assert source == "sample"
+    assert aggs["summary"]["total_enrollments"].iloc[0] == len(pd.read_csv(data_dir / "sample_enrollments.csv"))
+
+
+def test_no_enrollments_gives_no_aggregates(aggregates, data_dir):
+    path = data_dir / "sample_enrollments.csv"
+    header = pd.read_csv(path).head(0)
+    path.unlink()
+    assert aggregates(serving.sources_fingerprint()) == (None, "sample")
+
+    header.to_csv(path, index=False)
+    assert aggregates(serving.sources_fingerprint() + ("empty",)) == (None, "sample")
@@ -1,15 +1,24 @@
 """
 ETL/ELT: Extract and Load for Online Learning Platform Analytics.
-Reads from CSV/JSON (or DB), validates, and loads into Snowflake or local staging.
+Reads from CSV/JSON (or DB), validates against etl/validation.py contracts (quarantining
+failing rows), and loads into Snowflake or local staging.
 """
+import io
 import os
+import sys
 import json
+import time
 import hashlib
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from itertools import chain
 from pathlib import Path
 from datetime import datetime
-from typing import Iterator, Any
+from typing import Iterator, Any, Optional
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import yaml
 from dotenv import load_dotenv
 
@@ -22,6 +31,30 @@ try:
 except ImportError:
     HAS_SNOWFLAKE = False
 
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from etl.manifest import MANIFEST_NAME, load_manifest, make_entry, plan_input, save_manifest  # noqa: E402
+from snowflake.snowflake_ops import bulk_load_parquet, snowflake_pool  # noqa: E402
+from analytics.serving import build_serving_layer, serving_is_current  # noqa: E402
+from etl.star_schema import build_star_schema, star_is_current  # noqa: E402
+from etl.validation import (  # noqa: E402
+    QuarantineWriter, Validator, key_column, latest_per_key, quarantine_path, read_dtypes, supersede, to_staging_table,
+)
+
+STAGING = BASE / "data" / "staging"
+DEFAULT_CHUNK_ROWS = 100_000
+# Below this many unique emails a process pool costs more than it saves
+DEFAULT_HASH_PARALLEL_MIN = 200_000
+DEFAULT_EMAIL_HASH_CACHE_MAX = 1_000_000
+RAW_SUFFIXES = (".csv", ".ndjson", ".jsonl", ".json", ".parquet")
+# Facts reference dimension keys, so their dimensions are staged first
+ENTITY_DEPENDENCIES = {
+    "enrollments": ("learners", "courses"),
+    "events": ("learners", "courses"),
+}
+
 
 def load_config() -> dict:
     config_path = Path(__file__).resolve().parent.parent / "config" / "settings.yaml"
@@ -34,73 +67,588 @@ def load_config() -> dict:
     return yaml.safe_load(raw) or {}
 
 
-def extract_csv(path: str) -> pd.DataFrame:
-    return pd.read_csv(path)
+def extract_csv(path: str, dtype: Optional[dict] = None) -> pd.DataFrame:
+    return pd.read_csv(path, dtype=dtype)
 
 
-def extract_json(path: str) -> pd.DataFrame:
+def _astype(df: pd.DataFrame, dtype: Optional[dict]) -> pd.DataFrame:
+    """Apply read dtypes to the columns present (for readers without a dtype argument)."""
+    if not dtype:
+        return df
+    return df.astype({col: t for col, t in dtype.items() if col in df.columns})
+
+
+def extract_json(path: str, dtype: Optional[dict] = None) -> pd.DataFrame:
+    """A single JSON document (list of records, {"records": [...]} or one record) as a frame."""
     with open(path) as f:
         data = json.load(f)
     if isinstance(data, list):
-        return pd.DataFrame(data)
-    if isinstance(data, dict) and "records" in data:
-        return pd.DataFrame(data["records"])
-    return pd.DataFrame([data])
+        df = pd.DataFrame(data)
+    elif isinstance(data, dict) and "records" in data:
+        df = pd.DataFrame(data["records"])
+    else:
+        df = pd.DataFrame([data])
+    return _astype(df, dtype)
+
+
+def extract_file(path: str, dtype: Optional[dict] = None) -> pd.DataFrame:
+    """A whole raw file in one frame, parsed by suffix like iter_chunks (CSV, NDJSON, JSON or Parquet)."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        return _astype(pd.read_parquet(path), dtype)
+    if suffix in (".ndjson", ".jsonl"):
+        return pd.read_json(path, lines=True, dtype=dtype)
+    if suffix == ".json":
+        return extract_json(path, dtype)
+    return extract_csv(path, dtype)
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, end) of a file, used to parse only an appended tail."""
+
+    def __init__(self, path: str, start: int = 0, end: Optional[int] = None):
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._remaining = None if end is None else end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = len(b) if self._remaining is None else min(len(b), self._remaining)
+        data = self._f.read(n)
+        b[:len(data)] = data
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def is_line_delimited(path: str) -> bool:
+    """Formats whose byte offsets fall on record boundaries, so a tail can be read on its own."""
+    return Path(path).suffix.lower() in (".csv", ".ndjson", ".jsonl")
+
+
+def iter_csv_chunks(
+    path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, offset: int = 0, end: Optional[int] = None, dtype: Optional[dict] = None
+) -> Iterator[pd.DataFrame]:
+    if offset == 0 and end is None:
+        with pd.read_csv(path, chunksize=chunk_rows, dtype=dtype) as reader:
+            yield from reader
+        return
+    # Tail reads start mid-file, so take column names from the header line
+    names = pd.read_csv(path, nrows=0).columns.tolist()
+    with io.BufferedReader(_ByteRange(path, offset, end)) as f:
+        with pd.read_csv(
+            f, header=None if offset else "infer", names=names if offset else None, chunksize=chunk_rows, dtype=dtype
+        ) as reader:
+            yield from reader
+
+
+def iter_json_chunks(
+    path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, offset: int = 0, end: Optional[int] = None, dtype: Optional[dict] = None
+) -> Iterator[pd.DataFrame]:
+    """NDJSON (.ndjson/.jsonl) is read lazily; a single JSON document has to be parsed whole."""
+    if Path(path).suffix.lower() in (".ndjson", ".jsonl"):
+        with io.TextIOWrapper(io.BufferedReader(_ByteRange(path, offset, end)), encoding="utf-8") as f:
+            with pd.read_json(f, lines=True, chunksize=chunk_rows, dtype=dtype) as reader:
+                yield from reader
+        return
+    df = extract_json(path, dtype)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_parquet_chunks(path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, dtype: Optional[dict] = None) -> Iterator[pd.DataFrame]:
+    """Parquet raw files (e.g. generate_synthetic_data.py --format parquet), record batch by batch.
+    Not line-delimited, so a changed file is always restaged whole."""
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        yield _astype(batch.to_pandas(), dtype)
 
 
-def hash_email(email: str) -> str:
+def iter_chunks(
+    path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS, offset: int = 0, end: Optional[int] = None, dtype: Optional[dict] = None
+) -> Iterator[pd.DataFrame]:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".parquet":
+        return iter_parquet_chunks(path, chunk_rows, dtype)
+    if suffix in (".json", ".ndjson", ".jsonl"):
+        return iter_json_chunks(path, chunk_rows, offset, end, dtype)
+    return iter_csv_chunks(path, chunk_rows, offset, end, dtype)
+
+
+def hash_email(email: str) -> Optional[str]:
+    """sha256 hex of the trimmed, lower-cased address; None for a missing or blank email."""
     if pd.isna(email) or not str(email).strip():
-        return ""
+        return None
     return hashlib.sha256(str(email).strip().lower().encode()).hexdigest()
 
 
-def transform_learners(df: pd.DataFrame) -> pd.DataFrame:
+def _sha256_hex(values: list) -> list:
+    return [hashlib.sha256(v.encode()).hexdigest() for v in values]
+
+
+def load_email_hash_cache(path: Optional[Path]) -> dict:
+    """
+    Normalized email -> sha256 hex, persisted as Parquet between runs, in least- to most-recently
+    used order. Keyed by the address itself, so a hit can never return another address's hash;
+    the file therefore holds raw emails and belongs with the raw data, not in staging. A cache
+    in the earlier fingerprint-keyed format is ignored and replaced on save.
+    """
+    if not path or not Path(path).exists():
+        return {}
+    df = pd.read_parquet(path)
+    if "email" not in df.columns:
+        print(f"Ignoring email hash cache {path}: not keyed by email, rebuilding")
+        return {}
+    return dict(zip(df["email"].tolist(), df["email_hash"].tolist()))
+
+
+def save_email_hash_cache(cache: dict, path: Path, max_entries: int = DEFAULT_EMAIL_HASH_CACHE_MAX) -> None:
+    """Write the max_entries most recently used entries (temp file, then rename)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    keep = list(cache.items())[-max_entries:] if max_entries else list(cache.items())
+    df = pd.DataFrame({"email": [email for email, _ in keep], "email_hash": [digest for _, digest in keep]})
+    tmp = path.with_name(f".{path.name}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def hash_emails(
+    emails: pd.Series,
+    cache: Optional[dict] = None,
+    executor: Optional[Executor] = None,
+    workers: int = 1,
+    parallel_min: int = DEFAULT_HASH_PARALLEL_MIN,
+) -> pd.Series:
+    """
+    Vectorized equivalent of emails.apply(hash_email): normalizes with string ops, hashes each
+    distinct address once (skipping any already in cache) and broadcasts back via factorize codes.
+    Missing/blank emails map to None (null once staged). New hashes are added to cache when one
+    is given, and hits move to its most recently used end. workers is the executor's size, used
+    to batch its work.
+    """
+    normalized = emails.astype("string").str.strip().str.lower().fillna("")
+    codes, uniques = pd.factorize(normalized)
+    uniques = list(uniques)
+    hashes = np.empty(len(uniques), dtype=object)
+    missing_idx = []
+    for i, email in enumerate(uniques):
+        if not email:
+            hashes[i] = None
+        elif cache is not None and email in cache:
+            hashes[i] = cache[email] = cache.pop(email)
+        else:
+            missing_idx.append(i)
+
+    missing = [uniques[i] for i in missing_idx]
+    if executor is not None and len(missing) >= parallel_min:
+        size = -(-len(missing) // (max(1, workers) * 4))
+        batches = [missing[i:i + size] for i in range(0, len(missing), size)]
+        hashed = list(chain.from_iterable(executor.map(_sha256_hex, batches)))
+    else:
+        hashed = _sha256_hex(missing)
+    for i, digest in zip(missing_idx, hashed):
+        hashes[i] = digest
+        if cache is not None:
+            cache[uniques[i]] = digest
+    return pd.Series(hashes[codes], index=emails.index, dtype=object)
+
+
+def transform_learners(
+    df: pd.DataFrame, cache: Optional[dict] = None, executor: Optional[Executor] = None, workers: int = 1
+) -> pd.DataFrame:
     if "email" in df.columns:
-        df["email_hash"] = df["email"].astype(str).apply(hash_email)
+        df["email_hash"] = hash_emails(df["email"], cache=cache, executor=executor, workers=workers)
     return df
 
 
-def load_to_snowflake(df: pd.DataFrame, table: str, schema: str, conn_params: dict) -> None:
+def transform_chunk(
+    df: pd.DataFrame, entity: str, cache: Optional[dict] = None, executor: Optional[Executor] = None, workers: int = 1
+) -> pd.DataFrame:
+    if entity == "learners":
+        df = transform_learners(df, cache=cache, executor=executor, workers=workers)
+    return df
+
+
+def _email_hash_cache_path(config: dict) -> Optional[Path]:
+    path = (config.get("etl") or {}).get("email_hash_cache")
+    return BASE / path if path else None
+
+
+def _email_hash_cache_max(config: dict) -> int:
+    return int((config.get("etl") or {}).get("email_hash_cache_max_entries", DEFAULT_EMAIL_HASH_CACHE_MAX) or 0)
+
+
+def _hash_workers(config: dict) -> int:
+    return int((config.get("etl") or {}).get("hash_workers", 0) or 0)
+
+
+def _hash_executor(workers: int) -> Optional[Executor]:
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (MB); NaN where getrusage is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _snowflake_enabled(config: dict) -> bool:
+    return bool(config.get("snowflake") and config["snowflake"].get("account") and HAS_SNOWFLAKE)
+
+
+def _write_pandas(conn, df: pd.DataFrame, table: str, schema: str, overwrite: bool = False) -> None:
+    from snowflake.connector.pandas_tools import write_pandas
+    write_pandas(conn, df, table_name=table.upper(), schema=schema.upper(), auto_create_table=True, overwrite=overwrite)
+
+
+def _bulk_load_enabled(config: dict) -> bool:
+    return (config.get("etl") or {}).get("snowflake_load", "bulk") == "bulk"
+
+
+def load_to_snowflake(df: pd.DataFrame, table: str, config: dict, replace: bool = False) -> None:
     if not HAS_SNOWFLAKE:
         raise RuntimeError("snowflake-connector-python not installed")
-    conn = snowflake.connector.connect(**conn_params)
-    try:
+    schema = config["snowflake"]["schema"]
+    with snowflake_pool(config).connection() as conn:
         conn.cursor().execute(f"USE SCHEMA {schema}")
-        # Use write_pandas or INSERT; for large data use PUT + COPY
-        from snowflake.connector.pandas_tools import write_pandas
-        write_pandas(conn, df, table_name=table.upper(), schema=schema.upper(), auto_create_table=True)
-    finally:
-        conn.close()
+        # Small frames: write_pandas; staged files go through load_staged_to_snowflake (PUT + COPY)
+        _write_pandas(conn, df, table, schema, overwrite=replace)
+
+
+def load_staged_to_snowflake(files: list, table: str, config: dict, replace: bool = False) -> None:
+    """Bulk path: PUT the staged Parquet files and load them with one COPY INTO per entity.
+    replace=True when files are the entity's full contents (see bulk_load_parquet)."""
+    with snowflake_pool(config).connection() as conn:
+        conn.cursor().execute(f"USE SCHEMA {config['snowflake']['schema']}")
+        bulk_load_parquet(
+            conn, table, files, parallel=int((config.get("etl") or {}).get("put_parallel", 4)), replace=replace
+        )
+
+
+def _validation_enabled(config: dict) -> bool:
+    return bool((config.get("etl") or {}).get("validate", True))
+
+
+def print_validation_report(entity: str, report: dict, quarantine: Optional[Path]) -> None:
+    if not report["rejected"]:
+        return
+    checks = ", ".join(f"{check} {count:,}" for check, count in report["failures"].items())
+    print(f"Quarantined {report['rejected']:,} of {report['rows']:,} {entity} rows to {quarantine} ({checks})")
+
+
+def print_upsert_report(entity: str, superseded: int) -> None:
+    if superseded:
+        print(f"Upserted: {superseded:,} earlier {entity} rows replaced by later rows with the same {key_column(entity)}")
 
 
-def elt_pipeline_csv_to_dw(csv_path: str, entity: str, config: dict) -> None:
-    df = extract_csv(csv_path)
+def elt_pipeline_csv_to_dw(path: str, entity: str, config: dict) -> dict:
+    """
+    Batch mode: the whole raw file (CSV or JSON, by suffix) is loaded, transformed and staged as
+    the entity's only part, staging/<entity>/part-00000.parquet - the layout stream mode writes
+    and the serving layer, star build and warehouse read. Earlier parts are replaced. A key
+    repeated in the file keeps its last row (see etl.validation.key_column).
+    Returns run stats (rows, rejected, superseded, output).
+    """
+    df = extract_file(path, dtype=read_dtypes(entity))
+    out_path = STAGING / entity / "part-00000.parquet"
+    rejected_rows = 0
+    if _validation_enabled(config):
+        validator = Validator(entity, STAGING)
+        df, rejected = validator.validate(df)
+        quarantine = QuarantineWriter(quarantine_path(out_path, STAGING))
+        quarantine.write(rejected)
+        print_validation_report(entity, validator.report(), quarantine.close())
+        rejected_rows = validator.rejected
+    rows = len(df)
+    df = latest_per_key(df, key_column(entity))
+    superseded = rows - len(df)
+    print_upsert_report(entity, superseded)
     if entity == "learners":
-        df = transform_learners(df)
-    out_dir = Path(__file__).resolve().parent.parent / "data" / "staging"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / f"{entity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
-    df.to_parquet(out_path, index=False)
-    if config.get("snowflake") and config["snowflake"].get("account") and HAS_SNOWFLAKE:
-        conn_params = {
-            "account": config["snowflake"]["account"],
-            "user": config["snowflake"]["user"],
-            "password": config["snowflake"]["password"],
-            "warehouse": config["snowflake"].get("warehouse", "ANALYTICS_WH"),
-            "database": config["snowflake"].get("database", "LEARNING_PLATFORM_DW"),
-            "schema": config["snowflake"].get("schema", "ANALYTICS"),
-        }
-        load_to_snowflake(df, entity, config["snowflake"]["schema"], conn_params)
-    print(f"Staged: {out_path}")
+        cache_path = _email_hash_cache_path(config)
+        cache = load_email_hash_cache(cache_path) if cache_path else None
+        workers = _hash_workers(config)
+        executor = _hash_executor(workers)
+        try:
+            df = transform_learners(df, cache=cache, executor=executor, workers=workers)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if cache_path:
+            save_email_hash_cache(cache, cache_path, _email_hash_cache_max(config))
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(f".{out_path.name}.tmp")
+    pq.write_table(to_staging_table(df, entity), tmp)
+    for old in out_path.parent.glob("*.parquet"):
+        if old != out_path:
+            old.unlink()
+            quarantine_path(old, STAGING).unlink(missing_ok=True)
+    os.replace(tmp, out_path)
+    if _snowflake_enabled(config):
+        # The batch path always stages the whole file, so it replaces the table's rows
+        if _bulk_load_enabled(config):
+            load_staged_to_snowflake([out_path], entity, config, replace=True)
+        else:
+            load_to_snowflake(df, entity, config, replace=True)
+    print(f"Staged: {out_path} ({len(df)} rows)")
+    return {"entity": entity, "rows": len(df), "rejected": rejected_rows, "superseded": superseded, "output": str(out_path)}
+
+
+def elt_pipeline_stream_to_dw(
+    path: str,
+    entity: str,
+    config: dict,
+    chunk_rows: int = None,
+    out_path: Optional[Path] = None,
+    offset: int = 0,
+    end: Optional[int] = None,
+    existing: Optional[list] = None,
+) -> dict:
+    """
+    Chunked variant of elt_pipeline_csv_to_dw: each chunk is transformed and appended to the
+    staging Parquet file as its own row group, so peak memory is bounded by chunk_rows.
+    offset/end restrict the read to a byte range (used for appended tails). Every chunk is cast
+    to the entity's declared staging_schema rather than to whatever pandas inferred for it, so
+    all parts of an entity (including appended tails) read back together.
+    With etl.validate, each chunk is checked against its contract (etl/validation.py) first and
+    failing rows go to the quarantine file. existing lists the parts the output joins: once it
+    is written, rows there (or earlier in the output) with a key the output stages again are
+    removed (etl.validation.supersede), so the entity keeps one row per key. Without existing
+    parts the output is the entity's full contents, so a Snowflake load replaces the table's rows
+    instead of appending to them; once rows the table already holds were replaced it is reloaded
+    from all parts, since COPY and write_pandas can only add rows.
+    Returns run stats (rows, rejected, superseded, seconds, rows_per_sec, peak_rss_mb, output,
+    quarantine).
+    """
+    etl_cfg = config.get("etl") or {}
+    chunk_rows = chunk_rows or etl_cfg.get("chunk_rows", DEFAULT_CHUNK_ROWS)
+    if out_path is None:
+        out_path = STAGING / f"{entity}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    cache_path = _email_hash_cache_path(config) if entity == "learners" else None
+    cache = load_email_hash_cache(cache_path) if cache_path else None
+    cache_size = len(cache) if cache is not None else 0
+    hash_workers = _hash_workers(config)
+    executor = _hash_executor(hash_workers) if entity == "learners" else None
+
+    load = _snowflake_enabled(config)
+    replace = not existing
+
+    validator = quarantine = None
+    if _validation_enabled(config):
+        validator = Validator(entity, STAGING)
+        quarantine = QuarantineWriter(quarantine_path(out_path, STAGING))
+
+    writer = None
+    rows = 0
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        if executor is not None:
+            stack.callback(executor.shutdown)
+        conn = None
+        if load and not _bulk_load_enabled(config):
+            conn = stack.enter_context(snowflake_pool(config).connection())
+            conn.cursor().execute(f"USE SCHEMA {config['snowflake']['schema']}")
+        try:
+            for chunk in iter_chunks(path, chunk_rows, offset, end, dtype=read_dtypes(entity)):
+                if validator is not None:
+                    chunk, rejected = validator.validate(chunk)
+                    quarantine.write(rejected)
+                chunk = transform_chunk(chunk, entity, cache=cache, executor=executor, workers=hash_workers)
+                table = to_staging_table(chunk, entity, None if writer is None else writer.schema)
+                if writer is None:
+                    writer = pq.ParquetWriter(out_path, table.schema, compression=etl_cfg.get("compression", "snappy"))
+                writer.write_table(table)
+                if conn is not None:
+                    _write_pandas(conn, chunk, entity, config["snowflake"]["schema"], overwrite=replace and not rows)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+            quarantined = quarantine.close() if quarantine is not None else None
+    if cache is not None and len(cache) > cache_size:
+        save_email_hash_cache(cache, cache_path, _email_hash_cache_max(config))
+    superseded = 0
+    if writer is not None:
+        superseded = supersede(out_path, existing or (), key_column(entity), etl_cfg.get("compression", "snappy"))
+    if load and superseded and (existing or conn is not None):
+        # Rows the table already holds were replaced: reload it from every part
+        load_staged_to_snowflake([*(existing or ()), out_path], entity, config, replace=True)
+    elif load and conn is None and writer is not None:
+        load_staged_to_snowflake([out_path], entity, config, replace=replace)
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "entity": entity,
+        "rows": rows,
+        "rejected": validator.rejected if validator is not None else 0,
+        "superseded": superseded,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "output": str(out_path) if writer is not None else None,
+        "quarantine": str(quarantined) if quarantined else None,
+    }
+    print(
+        f"Staged: {stats['output']} ({rows} rows, {stats['rows_per_sec']:,.0f} rows/s, "
+        f"peak RSS {stats['peak_rss_mb']:.1f} MB)"
+    )
+    if validator is not None:
+        print_validation_report(entity, validator.report(), quarantined)
+    print_upsert_report(entity, superseded)
+    return stats
+
+
+def process_input(path: str, entity: str, config: dict, entry: Optional[dict] = None) -> tuple:
+    """
+    Incremental stream-mode run for one raw file against its manifest entry: unchanged files are
+    skipped, appended-to files stage only their new tail as the next part, anything else is
+    restaged from scratch. Outputs are staging/<entity>/part-NNNNN.parquet, so reruns overwrite
+    rather than accumulate. Returns (stats, new_entry).
+    """
+    action, offset = plan_input(path, entry, appendable=is_line_delimited(path))
+    if action == "skip":
+        print(f"Skipped (unchanged): {path}")
+        entry = dict(entry, mtime_ns=os.stat(path).st_mtime_ns)
+        return {"entity": entity, "rows": 0, "skipped": True}, entry
+
+    size = os.stat(path).st_size
+    outputs = list(entry["outputs"]) if action == "append" else []
+    if action == "full" and entry:
+        for old in entry["outputs"]:
+            Path(old).unlink(missing_ok=True)
+            quarantine_path(old, STAGING).unlink(missing_ok=True)
+    out_path = STAGING / entity / f"part-{len(outputs):05d}.parquet"
+    stats = elt_pipeline_stream_to_dw(path, entity, config, out_path=out_path, offset=offset, end=size, existing=outputs)
+    stats["action"] = action
+    if stats["output"]:
+        outputs.append(stats["output"])
+    row_count = (entry["row_count"] if action == "append" else 0) + stats["rows"] - stats["superseded"]
+    return stats, make_entry(path, size, row_count, outputs)
+
+
+def _run_entity(path: str, entity: str, config: dict, entry: Optional[dict]) -> tuple:
+    start = time.perf_counter()
+    if (config.get("etl") or {}).get("mode") == "batch":
+        size = os.stat(path).st_size
+        stats = elt_pipeline_csv_to_dw(path, entity, config)
+        stats["action"] = "batch"
+        # Recorded like a full stream-mode run, so a later stream run appends to or skips it
+        entry = make_entry(path, size, stats["rows"], [stats["output"]])
+    else:
+        stats, entry = process_input(path, entity, config, entry)
+    stats["wall_seconds"] = round(time.perf_counter() - start, 3)
+    return path, stats, entry
+
+
+def _etl_executor(config: dict) -> Executor:
+    etl_cfg = config.get("etl") or {}
+    workers = int(etl_cfg.get("max_workers", 0) or 0) or os.cpu_count() or 1
+    if etl_cfg.get("executor", "thread") == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def print_timing_report(results: list, wall_seconds: float) -> None:
+    print(f"{'entity':<16}{'action':<8}{'rows':>12}{'rejected':>10}{'seconds':>10}{'rows/s':>12}")
+    for stats in results:
+        rows = stats.get("rows", 0)
+        secs = stats["wall_seconds"]
+        rate = f"{rows / secs:,.0f}" if rows and secs else "-"
+        action = "skip" if stats.get("skipped") else stats.get("action", "")
+        print(f"{stats['entity']:<16}{action:<8}{rows:>12,}{stats.get('rejected', 0):>10,}{secs:>10.2f}{rate:>12}")
+    serial = sum(s["wall_seconds"] for s in results)
+    print(f"Wall clock {wall_seconds:.2f}s for {serial:.2f}s of entity work ({serial / wall_seconds if wall_seconds else 0:.1f}x)")
+
+
+def run_pipelines(data_dir: Path, config: dict) -> list:
+    """
+    Stage every raw file in data_dir on a worker pool (etl.executor thread|process, etl.max_workers).
+    Entities start as soon as the dimensions in ENTITY_DEPENDENCIES have finished; the manifest
+    is only touched from this thread and saved after each completed entity. The entity is the
+    file stem, and each entity owns staging/<entity>/, so two raw files with the same stem
+    (learners.csv and learners.json) are rejected before anything is staged.
+    """
+    files = sorted(f for f in Path(data_dir).iterdir() if f.is_file() and not f.name.startswith("."))
+    inputs = [f for f in files if f.suffix.lower() in RAW_SUFFIXES]
+    ignored = [f.name for f in files if f.suffix.lower() not in RAW_SUFFIXES]
+    if ignored:
+        print(f"Ignored raw files with no reader ({', '.join(RAW_SUFFIXES)}): {', '.join(ignored)}")
+    entity_of = {str(f): f.stem.lower() for f in inputs}
+    sources = {}
+    for f in inputs:
+        sources.setdefault(f.stem.lower(), []).append(f.name)
+    clashes = {entity: names for entity, names in sources.items() if len(names) > 1}
+    if clashes:
+        listed = "; ".join(f"{entity}: {', '.join(names)}" for entity, names in sorted(clashes.items()))
+        raise ValueError(f"More than one raw file per entity in {data_dir} ({listed}); keep one per entity")
+    manifest_path = STAGING / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+
+    pending = dict(entity_of)
+    unfinished = set(entity_of.values())
+    running = {}
+    results = []
+    start = time.perf_counter()
+    with _etl_executor(config) as pool:
+        while pending or running:
+            for path, entity in list(pending.items()):
+                deps = [d for d in ENTITY_DEPENDENCIES.get(entity, ()) if d in unfinished and d != entity]
+                if not deps:
+                    running[pool.submit(_run_entity, path, entity, config, manifest.get(path))] = path
+                    del pending[path]
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                path, stats, entry = future.result()
+                results.append(stats)
+                if entry is not None:
+                    manifest[path] = entry
+                    save_manifest(manifest, manifest_path)
+                remaining = set(pending) | set(running.values())
+                if not any(entity_of[p] == entity_of[path] for p in remaining):
+                    unfinished.discard(entity_of[path])
+    print_timing_report(results, time.perf_counter() - start)
+    return results
+
+
+def refresh_downstream(config: dict) -> list:
+    """
+    Rebuild the star schema and the serving layer (etl.build_star / etl.build_serving) unless
+    they are already stamped with the current staging, e.g. when every raw file was skipped as
+    unchanged. Returns the names of the layers rebuilt.
+    """
+    etl_cfg = config.get("etl") or {}
+    rebuilt = []
+    if etl_cfg.get("build_star", True) and not star_is_current():
+        build_star_schema()
+        rebuilt.append("star")
+    if etl_cfg.get("build_serving", True) and not serving_is_current():
+        build_serving_layer()
+        rebuilt.append("serving")
+    if not rebuilt:
+        print("Star schema and serving layer are current; nothing to rebuild")
+    return rebuilt
 
 
 if __name__ == "__main__":
     cfg = load_config()
-    data_dir = Path(__file__).resolve().parent.parent / "data" / "raw"
+    data_dir = BASE / "data" / "raw"
     if data_dir.exists():
-        for f in data_dir.glob("*.csv"):
-            entity = f.stem.lower()
-            elt_pipeline_csv_to_dw(str(f), entity, cfg)
+        run_pipelines(data_dir, cfg)
+        refresh_downstream(cfg)
     else:
         # Demo: create sample and run
         data_dir.mkdir(parents=True, exist_ok=True)
@@ -109,4 +657,4 @@ if __name__ == "__main__":
             "country_code": ["US", "IN"], "signup_date": ["2024-01-01", "2024-02-01"]
         })
         sample.to_csv(data_dir / "learners.csv", index=False)
-        elt_pipeline_csv_to_dw(str(data_dir / "learners.csv"), "learners", cfg)
+        run_pipelines(data_dir, cfg)
@@ -0,0 +1,84 @@
+"""
+ETL input manifest: records which raw files have been staged (size, mtime, content hash,
+row count, byte offset, output parts) so reruns only process new or appended data.
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Optional, Tuple
+
+MANIFEST_NAME = "_manifest.json"
+HASH_BLOCK_BYTES = 1 << 20
+
+
+def load_manifest(path: Path) -> dict:
+    if not Path(path).exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: Path) -> None:
+    """Write via a temp file + rename so an interrupted run never leaves a truncated manifest."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def hash_file(path: str, length: Optional[int] = None) -> str:
+    """sha256 of the first `length` bytes of path (whole file when None)."""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(HASH_BLOCK_BYTES if remaining is None else min(HASH_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _ends_with_newline(path: str, offset: int) -> bool:
+    if offset == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+
+def plan_input(path: str, entry: Optional[dict], appendable: bool = True) -> Tuple[str, int]:
+    """
+    Decide how to process path given its previous manifest entry.
+    Returns (action, offset): "skip", "append" (process bytes from offset on) or "full".
+    A file counts as appended-to only if its old prefix hashes the same and ends on a line break.
+    """
+    if not entry:
+        return "full", 0
+    stat = os.stat(path)
+    if stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]:
+        return "skip", entry["size"]
+    if stat.st_size < entry["size"] or hash_file(path, entry["size"]) != entry["content_hash"]:
+        return "full", 0
+    if stat.st_size == entry["size"]:
+        return "skip", entry["size"]
+    if appendable and _ends_with_newline(path, entry["size"]):
+        return "append", entry["size"]
+    return "full", 0
+
+
+def make_entry(path: str, size: int, row_count: int, outputs: list) -> dict:
+    """Entry for path as processed up to byte `size` (snapshot taken before reading)."""
+    return {
+        "path": str(path),
+        "size": size,
+        "mtime_ns": os.stat(path).st_mtime_ns,
+        "content_hash": hash_file(path, size),
+        "row_count": row_count,
+        "outputs": outputs,
+    }
@@ -0,0 +1,324 @@
+"""
+ETL stage: star schema with integer surrogate keys. Dimensions (dim_date, dim_course_category,
+dim_course, dim_learner, dim_instructor, dim_enrollment_status) and facts (fact_enrollment,
+fact_learning_event) are built from the staged entities and written as load-ready Parquet in
+data/star/, column names as in schema/ddl_star_schema.sql.
+Natural-key -> surrogate-key maps are persisted in data/star/_keys/, so a key never changes
+between runs and new ids get the next free key. Facts are resolved in chunks with vectorized
+hash lookups; date keys are the yyyymmdd integer, so they need no map. Fact rows whose learner
+or course is not in the dimensions point at the unknown member (key -1) and are counted as orphans.
+Run from project root (after etl/extract_load.py): python etl/star_schema.py
+"""
+import os
+import sys
+import json
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from analytics.serving import entity_paths, sources_fingerprint  # noqa: E402
+
+STAR = BASE / "data" / "star"
+KEYS_DIR_NAME = "_keys"
+STAMP_NAME = "_sources.json"
+FACT_CHUNK_ROWS = 500_000
+FISCAL_YEAR_START_MONTH = 7
+STAR_ENTITIES = ("learners", "courses", "enrollments", "events")
+# status_key, status_code, status_label
+ENROLLMENT_STATUSES = ((1, "not_started", "Not started"), (2, "in_progress", "In progress"), (3, "completed", "Completed"))
+DIMENSIONS = ("dim_date", "dim_course_category", "dim_course", "dim_learner", "dim_instructor", "dim_enrollment_status")
+FACTS = ("fact_enrollment", "fact_learning_event")
+# Unknown member of dim_course_category, dim_course and dim_learner; real keys start at 1
+UNKNOWN_KEY = -1
+UNKNOWN_ID = "(unknown)"
+
+
+class KeyMap:
+    """
+    Natural key -> integer surrogate key for one dimension, backed by a pandas Index so a whole
+    column is resolved with one hash lookup per row. Keys are 1-based and never reused.
+    """
+
+    def __init__(self, naturals=(), keys=()):
+        self.index = pd.Index(pd.Series(naturals, dtype="string"))
+        self.keys = np.asarray(keys, dtype="int64")
+
+    @classmethod
+    def load(cls, path: Path) -> "KeyMap":
+        if not Path(path).exists():
+            return cls()
+        df = pd.read_parquet(path)
+        return cls(df["natural_key"], df["surrogate_key"])
+
+    def save(self, path: Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        pd.DataFrame({"natural_key": self.index.astype(str), "surrogate_key": self.keys}).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def lookup(self, naturals: pd.Series) -> pd.Series:
+        """Surrogate keys for naturals (nullable Int64; <NA> for ids not in the map)."""
+        pos = self.index.get_indexer(naturals.astype("string"))
+        keys = pd.Series(self.keys[pos] if len(self.keys) else np.zeros(len(pos), dtype="int64"), index=naturals.index, dtype="Int64")
+        return keys.mask(pos < 0)
+
+    def assign(self, naturals: pd.Series) -> pd.Series:
+        """lookup(), first appending keys for ids not seen before (nulls stay <NA>)."""
+        values = naturals.astype("string")
+        new = pd.Index(values.dropna().unique()).difference(self.index)
+        if len(new):
+            start = int(self.keys.max()) + 1 if len(self.keys) else 1
+            self.index = self.index.append(pd.Index(new.astype("string")))
+            self.keys = np.concatenate([self.keys, np.arange(start, start + len(new), dtype="int64")])
+        return self.lookup(values)
+
+
+def date_keys(values: pd.Series) -> pd.Series:
+    """yyyymmdd integer date keys (nullable Int64)."""
+    dates = pd.to_datetime(values, errors="coerce")
+    return (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype("Int64")
+
+
+def build_dim_date(start, end, fiscal_year_start_month: int = FISCAL_YEAR_START_MONTH) -> pd.DataFrame:
+    """One row per day in [start, end]; fiscal years are named by the calendar year they end in."""
+    days = pd.Series(pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq="D"))
+    month = days.dt.month
+    fiscal_shift = (month >= fiscal_year_start_month) & (fiscal_year_start_month > 1)
+    return pd.DataFrame({
+        "date_key": date_keys(days).astype("int32"),
+        "full_date": days.dt.date,
+        "year": days.dt.year.astype("int16"),
+        "quarter": days.dt.quarter.astype("int16"),
+        "month": month.astype("int16"),
+        "week_of_year": days.dt.isocalendar().week.astype("int16").to_numpy(),
+        "day_of_week": (days.dt.dayofweek + 1).astype("int16"),
+        "day_name": days.dt.day_name(),
+        "month_name": days.dt.month_name(),
+        "is_weekend": days.dt.dayofweek >= 5,
+        "fiscal_year": (days.dt.year + fiscal_shift.astype(int)).astype("int16"),
+        "fiscal_quarter": (((month - fiscal_year_start_month + 12) % 12) // 3 + 1).astype("int16"),
+    })
+
+
+def iter_entity(entity: str, columns: Optional[list] = None, chunk_rows: int = FACT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Chunks of a staged entity (Parquet record batches), else of its sample CSV."""
+    staged, sample = entity_paths(entity)
+    parts = sorted(staged.glob("*.parquet")) if staged.is_dir() else []
+    if parts:
+        for part in parts:
+            pf = pq.ParquetFile(part)
+            cols = [c for c in columns if c in pf.schema_arrow.names] if columns else None
+            for batch in pf.iter_batches(batch_size=chunk_rows, columns=cols):
+                yield batch.to_pandas()
+    elif sample.exists():
+        yield from pd.read_csv(sample, usecols=lambda c: columns is None or c in columns, chunksize=chunk_rows)
+
+
+def read_entity(entity: str) -> pd.DataFrame:
+    chunks = list(iter_entity(entity))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def _column(frame: pd.DataFrame, col: str, dtype: str = "string") -> pd.Series:
+    """frame[col], or an all-null column of dtype when the optional column is missing."""
+    return frame[col] if col in frame.columns else pd.Series(pd.NA, index=frame.index, dtype=dtype)
+
+
+def _truthy(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.lower().eq("true")
+
+
+def _status_keys(progress: pd.Series) -> pd.Series:
+    progress = pd.to_numeric(progress, errors="coerce").fillna(0)
+    return pd.Series(np.select([progress >= 100, progress > 0], [3, 2], 1), index=progress.index, dtype="int32")
+
+
+def _write(df: pd.DataFrame, path: Path) -> None:
+    tmp = path.with_name(f".{path.name}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+class _FactWriter:
+    """Appends resolved fact chunks to one Parquet file (temp file, renamed on close)."""
+
+    def __init__(self, path: Path):
+        self.path, self.tmp = path, path.with_name(f".{path.name}.tmp")
+        self.writer, self.rows = None, 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.tmp, table.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            os.replace(self.tmp, self.path)
+        else:
+            self.path.unlink(missing_ok=True)
+
+
+def _with_unknown(dim: pd.DataFrame, **values) -> pd.DataFrame:
+    """dim with the unknown member as its first row (columns not given are null)."""
+    unknown = pd.DataFrame({c: pd.Series([values.get(c)], dtype=dim[c].dtype) for c in dim.columns})
+    return pd.concat([unknown, dim], ignore_index=True)
+
+
+def _resolve(chunk: pd.DataFrame, learners: KeyMap, courses: KeyMap) -> tuple:
+    """(chunk with learner_key/course_key, orphan rows - those whose learner or course id is unknown
+    and now point at the unknown member)."""
+    learner_keys, course_keys = learners.lookup(chunk["learner_id"]), courses.lookup(chunk["course_id"])
+    orphans = int((learner_keys.isna() | course_keys.isna()).sum())
+    return chunk.assign(learner_key=learner_keys.fillna(UNKNOWN_KEY), course_key=course_keys.fillna(UNKNOWN_KEY)), orphans
+
+
+def star_is_current(out_dir: Path = STAR) -> bool:
+    """True when out_dir holds a complete build from the current staged entities."""
+    stamp = Path(out_dir) / STAMP_NAME
+    if not stamp.exists() or not all((Path(out_dir) / f"{t}.parquet").exists() for t in DIMENSIONS + ("fact_enrollment",)):
+        return False
+    return json.loads(stamp.read_text()) == json.loads(json.dumps(sources_fingerprint(STAR_ENTITIES)))
+
+
+def build_star_schema(out_dir: Path = STAR, chunk_rows: int = FACT_CHUNK_ROWS) -> dict:
+    """
+    Build every dimension and fact table into out_dir; returns row counts per table (plus
+    orphan fact rows, kept against the unknown member, whose learner or course is not in the
+    dimensions).
+    """
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = out_dir / STAMP_NAME
+    stamp.unlink(missing_ok=True)
+    fingerprint = sources_fingerprint(STAR_ENTITIES)
+    keys_dir = out_dir / KEYS_DIR_NAME
+    maps = {name: KeyMap.load(keys_dir / f"{name}.parquet") for name in ("category", "course", "learner", "instructor")}
+    counts, date_range = {}, []
+
+    courses = read_entity("courses")
+    learners = read_entity("learners")
+    if courses.empty or learners.empty:
+        raise FileNotFoundError("learners and courses are required (data/staging or data/sample_*.csv)")
+
+    category_names = courses["category_name"].fillna("Unknown").astype("string")
+    categories = pd.Series(category_names.unique())
+    tables = {
+        "dim_course_category": _with_unknown(pd.DataFrame({
+            "category_key": maps["category"].assign(categories).astype("int32"),
+            "category_name": categories,
+            "parent_category_key": pd.array([pd.NA] * len(categories), dtype="Int32"),
+        }), category_key=UNKNOWN_KEY, category_name=UNKNOWN_ID),
+        "dim_course": _with_unknown(pd.DataFrame({
+            "course_key": maps["course"].assign(courses["course_id"]).astype("int32"),
+            "course_id": courses["course_id"].astype("string"),
+            "course_name": courses["course_name"],
+            "category_key": maps["category"].lookup(category_names).astype("int32"),
+            "level_code": _column(courses, "level_code"),
+            "duration_minutes": pd.to_numeric(_column(courses, "duration_minutes", "Int32"), errors="coerce").astype("Int32"),
+        }), course_key=UNKNOWN_KEY, course_id=UNKNOWN_ID, course_name=UNKNOWN_ID, category_key=UNKNOWN_KEY),
+    }
+    if "email_hash" not in learners.columns and "email" in learners.columns:
+        from etl.extract_load import hash_emails
+        learners["email_hash"] = hash_emails(learners["email"])
+    tables["dim_learner"] = _with_unknown(pd.DataFrame({
+        "learner_key": maps["learner"].assign(learners["learner_id"]).astype("int32"),
+        "learner_id": learners["learner_id"].astype("string"),
+        "email_hash": _column(learners, "email_hash"),
+        "country_code": _column(learners, "country_code"),
+        "signup_date_key": date_keys(learners["signup_date"]).astype("Int32"),
+        "is_active": True,
+    }), learner_key=UNKNOWN_KEY, learner_id=UNKNOWN_ID, is_active=False)
+    signups = pd.to_datetime(learners["signup_date"], errors="coerce")
+    date_range += [signups.min(), signups.max()]
+    tables["dim_enrollment_status"] = pd.DataFrame(ENROLLMENT_STATUSES, columns=["status_key", "status_code", "status_label"])
+
+    # Facts, chunk by chunk: instructors are assigned as they are seen; the dim is written after
+    writer, instructors, orphans = _FactWriter(out_dir / "fact_enrollment.parquet"), [], 0
+    try:
+        for chunk in iter_entity("enrollments", chunk_rows=chunk_rows):
+            chunk, unknown = _resolve(chunk, maps["learner"], maps["course"])
+            orphans += unknown
+            enrolled = pd.to_datetime(chunk["enroll_date"], errors="coerce")
+            date_range += [enrolled.min(), enrolled.max()]
+            instructor_ids = _column(chunk, "instructor_id")
+            instructors.append(instructor_ids.dropna().astype("string").unique())
+            writer.write(pd.DataFrame({
+                "enrollment_id": chunk["enrollment_id"].astype("string"),
+                "learner_key": chunk["learner_key"].astype("int32"),
+                "course_key": chunk["course_key"].astype("int32"),
+                "instructor_key": maps["instructor"].assign(instructor_ids).astype("Int32"),
+                "status_key": _status_keys(chunk["progress_pct"]),
+                "enroll_date_key": date_keys(enrolled).astype("Int32"),
+                "complete_date_key": pd.array([pd.NA] * len(chunk), dtype="Int32"),
+                "progress_pct": pd.to_numeric(chunk["progress_pct"], errors="coerce").astype("float64"),
+                "time_spent_minutes": pd.to_numeric(_column(chunk, "time_spent_minutes", "Int32"), errors="coerce").astype("Int32"),
+                "certificate_issued": _truthy(chunk["certificate_issued"]) if "certificate_issued" in chunk.columns else False,
+            }))
+    finally:
+        writer.close()
+    counts["fact_enrollment"] = writer.rows
+    counts["fact_enrollment_orphans"] = orphans
+
+    writer, orphans = _FactWriter(out_dir / "fact_learning_event.parquet"), 0
+    event_columns = ["event_id", "learner_id", "course_id", "event_type", "event_time", "duration_seconds", "score"]
+    try:
+        for chunk in iter_entity("events", event_columns, chunk_rows):
+            chunk, unknown = _resolve(chunk, maps["learner"], maps["course"])
+            orphans += unknown
+            event_time = pd.to_datetime(chunk["event_time"], errors="coerce")
+            date_range += [event_time.min(), event_time.max()]
+            writer.write(pd.DataFrame({
+                "event_id": chunk["event_id"].astype("string"),
+                "learner_key": chunk["learner_key"].astype("int32"),
+                "course_key": chunk["course_key"].astype("int32"),
+                "event_date_key": date_keys(event_time).astype("Int32"),
+                "event_time": event_time,
+                "event_type": _column(chunk, "event_type"),
+                "duration_seconds": pd.to_numeric(_column(chunk, "duration_seconds", "Int32"), errors="coerce").astype("Int32"),
+                "score": pd.to_numeric(_column(chunk, "score", "Float64"), errors="coerce").astype("float64"),
+            }))
+    finally:
+        writer.close()
+    counts["fact_learning_event"] = writer.rows
+    counts["fact_learning_event_orphans"] = orphans
+
+    instructor_ids = pd.Series(np.unique(np.concatenate(instructors)) if instructors else [], dtype="string")
+    tables["dim_instructor"] = pd.DataFrame({
+        "instructor_key": maps["instructor"].lookup(instructor_ids).astype("int32"),
+        "instructor_id": instructor_ids,
+        "display_name": instructor_ids,
+    })
+    known = [d for d in date_range if pd.notna(d)]
+    tables["dim_date"] = build_dim_date(min(known), max(known)) if known else build_dim_date("today", "today")
+
+    for name, df in tables.items():
+        _write(df, out_dir / f"{name}.parquet")
+        counts[name] = len(df)
+    for name, key_map in maps.items():
+        key_map.save(keys_dir / f"{name}.parquet")
+    stamp.write_text(json.dumps(fingerprint))
+    print(f"Star schema written to {out_dir} in {time.perf_counter() - start:.2f}s: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    build_star_schema()
@@ -0,0 +1,365 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from etl import extract_load as el
+
+
+@pytest.fixture
+def staging(tmp_path, monkeypatch):
+    staging = tmp_path / "staging"
+    monkeypatch.setattr(el, "STAGING", staging)
+    return staging
+
+
+def _config(**etl):
+    return {"etl": {"chunk_rows": 2, **etl}}
+
+
+@pytest.mark.parametrize("validate", [False, True])
+def test_stream_casts_mixed_type_chunks_to_declared_schema(tmp_path, staging, validate):
+    raw = tmp_path / "courses.csv"
+    # First chunk infers ints for course_id/notes, the second holds text and a float duration
+    raw.write_text("course_id,course_name,duration_minutes,notes\n1,Intro,60,10\n2,Stats,90,20\nC-3,SQL,45.0,hello\n")
+    out = staging / "courses" / "part-00000.parquet"
+
+    stats = el.elt_pipeline_stream_to_dw(str(raw), "courses", _config(validate=validate), out_path=out)
+
+    assert stats["rows"] == 3
+    table = pq.read_table(out)
+    assert table.schema.field("course_id").type == pa.string()
+    assert table.schema.field("duration_minutes").type == pa.int64()
+    assert table.schema.field("notes").type == pa.string()
+    assert table.column("course_id").to_pylist() == ["1", "2", "C-3"]
+    assert table.column("duration_minutes").to_pylist() == [60, 90, 45]
+    assert table.column("notes").to_pylist() == ["10", "20", "hello"]
+
+
+def test_stream_keeps_leading_zeros_and_stages_dates(tmp_path, staging):
+    raw = tmp_path / "learners.csv"
+    raw.write_text("learner_id,email,signup_date\n007,a@example.com,2024-01-05\n008,,2024-02-29\n")
+    out = staging / "learners" / "part-00000.parquet"
+
+    el.elt_pipeline_stream_to_dw(str(raw), "learners", _config(validate=False), out_path=out)
+
+    table = pq.read_table(out)
+    assert table.column("learner_id").to_pylist() == ["007", "008"]
+    assert table.schema.field("signup_date").type == pa.date32()
+    assert str(table.column("signup_date")[1]) == "2024-02-29"
+
+
+def test_stream_nulls_unparseable_values_without_validation(tmp_path, staging):
+    raw = tmp_path / "enrollments.ndjson"
+    raw.write_text(
+        '{"enrollment_id": 1, "learner_id": "L1", "course_id": "C1", "enroll_date": "2024-01-01", "progress_pct": 50}\n'
+        '{"enrollment_id": 2, "learner_id": "L1", "course_id": "C1", "enroll_date": "2024-01-02", "progress_pct": 75.5}\n'
+        '{"enrollment_id": "E3", "learner_id": "L2", "course_id": "C1", "enroll_date": "2024-01-03", "progress_pct": "hello"}\n'
+    )
+    out = staging / "enrollments" / "part-00000.parquet"
+
+    el.elt_pipeline_stream_to_dw(str(raw), "enrollments", _config(validate=False), out_path=out)
+
+    df = pd.read_parquet(out)
+    assert df["enrollment_id"].tolist() == ["1", "2", "E3"]
+    assert df["progress_pct"].tolist()[:2] == [50.0, 75.5]
+    assert pd.isna(df["progress_pct"].iloc[2])
+
+
+def test_appended_tail_uses_declared_schema(tmp_path, staging):
+    raw = tmp_path / "courses.csv"
+    raw.write_text("course_id,course_name,duration_minutes,notes\n1,Intro,60,10\n2,Stats,90,20\n")
+    config = _config(validate=True)
+    stats, entry = el.process_input(str(raw), "courses", config)
+    with open(raw, "a") as f:
+        # The tail alone would infer text ids, a float duration and a text note
+        f.write("C-3,SQL,45.5,hello\nC-4,ML,30,\n")
+
+    stats, entry = el.process_input(str(raw), "courses", config, entry)
+
+    assert stats["action"] == "append"
+    first, tail = (pq.read_schema(p) for p in entry["outputs"])
+    assert first == tail
+    df = pd.read_parquet(staging / "courses")
+    assert df["course_id"].tolist() == ["1", "2", "C-4"]
+    assert df["notes"].tolist()[:2] == ["10", "20"]
+    assert pq.read_table(el.quarantine_path(entry["outputs"][1], staging)).column("_errors").to_pylist() == [
+        "duration_minutes:type"
+    ]
+
+
+def test_resent_ids_replace_earlier_rows(tmp_path, staging):
+    raw = tmp_path / "enrollments.csv"
+    header = "enrollment_id,learner_id,course_id,enroll_date,progress_pct\n"
+    # E2 repeats across the first run's chunks; the later row wins
+    raw.write_text(header + "E1,L1,C1,2024-01-10,10\nE2,L2,C1,2024-02-10,20\nE2,L2,C1,2024-02-10,25\n")
+    config = _config(validate=True)
+    stats, entry = el.process_input(str(raw), "enrollments", config)
+    assert stats["superseded"] == 1 and entry["row_count"] == 2
+    with open(raw, "a") as f:
+        f.write("E1,L1,C1,2024-03-01,40\nE3,L3,C1,2024-03-02,5\n")
+
+    stats, entry = el.process_input(str(raw), "enrollments", config, entry)
+
+    assert stats["action"] == "append" and stats["rejected"] == 0 and stats["superseded"] == 1
+    df = pd.read_parquet(staging / "enrollments")
+    assert sorted(zip(df["enrollment_id"], df["progress_pct"])) == [("E1", 40.0), ("E2", 25.0), ("E3", 5.0)]
+    assert entry["row_count"] == 3
+
+    # Restaging the whole file from scratch gives the same rows as the append did
+    raw.write_text(raw.read_text() + "\n")
+    stats, _ = el.process_input(str(raw), "enrollments", config, dict(entry, content_hash=""))
+    assert stats["action"] == "full"
+    restaged = pd.read_parquet(staging / "enrollments")
+    assert sorted(zip(restaged["enrollment_id"], restaged["progress_pct"])) == [("E1", 40.0), ("E2", 25.0), ("E3", 5.0)]
+
+
+def test_batch_mode_keeps_the_last_row_per_key(tmp_path, staging):
+    raw = tmp_path / "courses.csv"
+    raw.write_text("course_id,course_name\nC1,Intro\nC2,Stats\nC1,Intro v2\n")
+
+    stats = el.elt_pipeline_csv_to_dw(str(raw), "courses", _config(mode="batch"))
+
+    assert stats["rows"] == 2 and stats["superseded"] == 1
+    assert pd.read_parquet(stats["output"])["course_name"].tolist() == ["Stats", "Intro v2"]
+
+
+@pytest.fixture
+def snowflake_conn(monkeypatch):
+    """Snowflake enabled, with every pooled connection being one RecordingConnection."""
+    from snowflake.snowflake_ops import ConnectionPool, RecordingConnection
+
+    conn = RecordingConnection()
+    pool = ConnectionPool(lambda: conn, max_size=1)
+    monkeypatch.setattr(el, "HAS_SNOWFLAKE", True)
+    monkeypatch.setattr(el, "snowflake_pool", lambda config: pool)
+    return conn
+
+
+def _snowflake_config(**etl):
+    return dict(_config(**etl), snowflake={"account": "acct", "schema": "ANALYTICS"})
+
+
+def _loads(conn) -> list:
+    return [sql.split(" ")[0] for sql, _ in conn.executed if sql.split(" ")[0] in ("DELETE", "COPY")]
+
+
+def test_bulk_load_replaces_on_full_restage_and_appends_tails(tmp_path, staging, snowflake_conn):
+    raw = tmp_path / "courses.csv"
+    raw.write_text("course_id,course_name\nC1,Intro\nC2,Stats\n")
+    config = _snowflake_config()
+
+    _, entry = el.process_input(str(raw), "courses", config)
+    assert _loads(snowflake_conn) == ["DELETE", "COPY"]
+
+    with open(raw, "a") as f:
+        f.write("C3,SQL\n")
+    _, entry = el.process_input(str(raw), "courses", config, entry)
+    assert _loads(snowflake_conn) == ["DELETE", "COPY", "COPY"]
+
+    # A tail re-sending a loaded id replaces its row, so the table is reloaded from every part
+    with open(raw, "a") as f:
+        f.write("C2,Stats v2\n")
+    _, entry = el.process_input(str(raw), "courses", config, entry)
+    assert _loads(snowflake_conn) == ["DELETE", "COPY", "COPY", "DELETE", "COPY"]
+
+    # A rewritten file is restaged from scratch, which must not duplicate the loaded rows
+    raw.write_text("course_id,course_name\nC1,Intro v2\n")
+    el.process_input(str(raw), "courses", config, entry)
+    assert _loads(snowflake_conn) == ["DELETE", "COPY", "COPY", "DELETE", "COPY", "DELETE", "COPY"]
+
+
+def test_write_pandas_path_overwrites_once_and_returns_connection(tmp_path, staging, snowflake_conn, monkeypatch):
+    raw = tmp_path / "courses.csv"
+    raw.write_text("course_id,course_name\nC1,Intro\nC2,Stats\nC3,SQL\n")
+    writes = []
+    monkeypatch.setattr(el, "_write_pandas", lambda conn, df, table, schema, overwrite=False: writes.append(overwrite))
+
+    el.elt_pipeline_stream_to_dw(str(raw), "courses", _snowflake_config(snowflake_load="write_pandas"))
+
+    assert writes == [True, False]
+    assert not snowflake_conn.closed
+
+
+def test_write_pandas_failure_drops_connection(tmp_path, staging, snowflake_conn, monkeypatch):
+    raw = tmp_path / "courses.csv"
+    raw.write_text("course_id,course_name\nC1,Intro\n")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("load failed")
+
+    monkeypatch.setattr(el, "_write_pandas", fail)
+    with pytest.raises(RuntimeError):
+        el.elt_pipeline_stream_to_dw(str(raw), "courses", _snowflake_config(snowflake_load="write_pandas"))
+    assert snowflake_conn.closed
+
+
+
+def test_write_pandas_load_shares_the_ops_pool_and_role(monkeypatch):
+    from snowflake import snowflake_ops as ops
+
+    config = {"snowflake": {"account": "acct", "user": "u", "password": "p", "schema": "ANALYTICS", "role": "ETL_ROLE", "pool_size": 2}}
+    assert ops.conn_params(config)["role"] == "ETL_ROLE"
+    opened = []
+    pool = ops.get_pool(ops.conn_params(config), connect=lambda **params: opened.append(params) or ops.RecordingConnection(), max_size=2)
+    try:
+        assert ops.snowflake_pool(config) is pool
+        monkeypatch.setattr(el, "HAS_SNOWFLAKE", True)
+        monkeypatch.setattr(el, "_write_pandas", lambda conn, df, table, schema, overwrite=False: None)
+
+        el.load_to_snowflake(pd.DataFrame({"course_id": ["C1"]}), "courses", config, replace=True)
+        with ops.pooled_conn(config):
+            pass
+
+        assert [params["role"] for params in opened] == ["ETL_ROLE"]
+    finally:
+        ops.close_pools()
+
+def test_hash_emails_matches_row_wise_hash():
+    emails = pd.Series([" A@Example.com", "a@example.com", None, "", "b@example.com"])
+
+    hashed = el.hash_emails(emails)
+
+    assert hashed.tolist() == [el.hash_email(e) for e in emails]
+    assert hashed[0] == hashed[1] and hashed[2] is None and hashed[3] is None
+
+
+def test_missing_and_blank_emails_stage_a_null_hash(tmp_path, staging):
+    raw = tmp_path / "learners.csv"
+    raw.write_text('learner_id,email\nL1,a@example.com\nL2,\nL3," "\n')
+    out = staging / "learners" / "part-00000.parquet"
+    cache = tmp_path / ".email_hash_cache.parquet"
+
+    el.elt_pipeline_stream_to_dw(str(raw), "learners", _config(email_hash_cache=str(cache)), out_path=out)
+
+    hashes = pq.read_table(out).column("email_hash").to_pylist()
+    assert hashes == [el.hash_email("a@example.com"), None, None]
+    assert el.load_email_hash_cache(cache) == {"a@example.com": hashes[0]}
+
+
+def test_hash_emails_batches_work_by_the_given_worker_count():
+    from concurrent.futures import ThreadPoolExecutor
+
+    emails = pd.Series([f"user{i}@example.com" for i in range(50)])
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        hashed = el.hash_emails(emails, executor=executor, workers=2, parallel_min=1)
+
+    assert hashed.tolist() == emails.apply(el.hash_email).tolist()
+
+
+def test_email_hash_cache_is_keyed_by_email_and_keeps_recent_entries(tmp_path):
+    path = tmp_path / ".email_hash_cache.parquet"
+    cache = {}
+    el.hash_emails(pd.Series(["old@example.com", "kept@example.com", "new@example.com"]), cache=cache)
+    # A hit makes kept@ the most recently used entry
+    el.hash_emails(pd.Series(["kept@example.com"]), cache=cache)
+
+    el.save_email_hash_cache(cache, path, max_entries=2)
+
+    loaded = el.load_email_hash_cache(path)
+    assert loaded == {e: el.hash_email(e) for e in ("new@example.com", "kept@example.com")}
+    assert list(loaded) == ["new@example.com", "kept@example.com"]
+    assert el.hash_emails(pd.Series([" Kept@Example.com"]), cache=loaded)[0] == el.hash_email("kept@example.com")
+
+
+def test_email_hash_cache_hits_return_the_cached_address_hash():
+    cache = {"a@example.com": "cached"}
+
+    hashed = el.hash_emails(pd.Series(["A@example.com", "b@example.com"]), cache=cache)
+
+    assert hashed.tolist() == ["cached", el.hash_email("b@example.com")]
+    assert list(cache) == ["a@example.com", "b@example.com"]
+
+
+def test_email_hash_cache_in_fingerprint_format_is_ignored(tmp_path):
+    path = tmp_path / ".email_hash_cache.parquet"
+    pd.DataFrame({"email_fp": [1], "email_hash": ["x"]}).to_parquet(path)
+
+    assert el.load_email_hash_cache(path) == {}
+
+
+def test_run_pipelines_rejects_two_raw_files_for_one_entity(tmp_path, staging):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "learners.csv").write_text("learner_id\nL1\n")
+    (raw / "Learners.json").write_text('[{"learner_id": "L2"}]')
+    (raw / "courses.csv").write_text("course_id,course_name\nC1,Intro\n")
+
+    with pytest.raises(ValueError, match="learners: Learners.json, learners.csv"):
+        el.run_pipelines(raw, _config())
+    assert not staging.exists()
+
+
+def test_run_pipelines_stages_dimensions_before_facts(tmp_path, staging):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "learners.csv").write_text("learner_id,email\nL1,a@example.com\n")
+    (raw / "courses.csv").write_text("course_id,course_name\nC1,Intro\n")
+    (raw / "enrollments.csv").write_text(
+        "enrollment_id,learner_id,course_id,enroll_date\nE1,L1,C1,2024-01-01\nE2,L9,C1,2024-01-02\n"
+    )
+
+    results = el.run_pipelines(raw, _config())
+
+    assert {r["entity"]: r["rows"] for r in results} == {"learners": 1, "courses": 1, "enrollments": 1}
+    # L9 is only known to be missing because learners were staged first
+    assert pd.read_parquet(staging / "_quarantine" / "enrollments")["_errors"].tolist() == ["learner_id:references"]
+
+
+
+@pytest.mark.parametrize("name, text", [
+    ("courses.csv", "course_id,course_name\nC1,Intro\nC2,SQL\n"),
+    ("courses.jsonl", '{"course_id": "C1", "course_name": "Intro"}\n{"course_id": "C2", "course_name": "SQL"}\n'),
+    ("courses.json", '{"records": [{"course_id": "C1", "course_name": "Intro"}, {"course_id": "C2", "course_name": "SQL"}]}'),
+])
+def test_batch_mode_parses_by_suffix_into_the_canonical_layout(tmp_path, staging, name, text):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / name).write_text(text)
+    # Parts left by an earlier stream run are replaced, not read alongside the batch output
+    (staging / "courses").mkdir(parents=True)
+    for part in ("part-00000.parquet", "part-00001.parquet"):
+        pd.DataFrame({"course_id": ["OLD"], "course_name": ["Old"]}).to_parquet(staging / "courses" / part)
+
+    results = el.run_pipelines(raw, _config(mode="batch"))
+
+    assert [(r["action"], r["rows"]) for r in results] == [("batch", 2)]
+    assert sorted(p.name for p in (staging / "courses").iterdir()) == ["part-00000.parquet"]
+    assert pd.read_parquet(staging / "courses")["course_id"].tolist() == ["C1", "C2"]
+    # Recorded in the manifest, so an unchanged file is skipped by the next run
+    assert el.run_pipelines(raw, _config())[0].get("skipped")
+
+def test_downstream_is_rebuilt_only_when_staging_changed(tmp_path, data_dir, monkeypatch):
+    from analytics import serving
+    from etl import star_schema
+
+    star = tmp_path / "star"
+    monkeypatch.setattr(el, "star_is_current", lambda: star_schema.star_is_current(star))
+    monkeypatch.setattr(el, "build_star_schema", lambda: star_schema.build_star_schema(star))
+    monkeypatch.setattr(el, "build_serving_layer", lambda: serving.build_serving_layer(data_dir / "serving"))
+
+    assert el.refresh_downstream({}) == ["star", "serving"]
+    assert el.refresh_downstream({}) == []
+    assert el.refresh_downstream({"etl": {"build_star": False}}) == []
+
+    path = data_dir / "sample_enrollments.csv"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert el.refresh_downstream({"etl": {"build_serving": False}}) == ["star"]
+    assert el.refresh_downstream({}) == ["serving"]
+
+
+def test_parquet_raw_files_are_staged_and_unknown_files_reported(tmp_path, staging, capsys):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    pd.DataFrame({"course_id": ["C1", "C2", "C3"], "course_name": ["Intro", "SQL", "Stats"]}).to_parquet(raw / "courses.parquet")
+    (raw / "learners.xlsx").write_bytes(b"")
+
+    results = el.run_pipelines(raw, _config())
+
+    assert [(r["entity"], r["rows"]) for r in results] == [("courses", 3)]
+    assert pd.read_parquet(staging / "courses")["course_id"].tolist() == ["C1", "C2", "C3"]
+    assert "Ignored raw files with no reader" in capsys.readouterr().out
+    assert el.extract_file(str(raw / "courses.parquet"))["course_name"].tolist() == ["Intro", "SQL", "Stats"]
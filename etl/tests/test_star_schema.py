@@ -0,0 +1,76 @@
+import pandas as pd
+
+from etl import star_schema as ss
+
+
+def _keys(star, table, natural, key):
+    df = pd.read_parquet(star / f"{table}.parquet")
+    return dict(zip(df[natural].astype(str), df[key]))
+
+
+def test_keymap_keeps_keys_and_appends_new_ids(tmp_path):
+    path = tmp_path / "learner.parquet"
+    first = ss.KeyMap()
+    assert first.assign(pd.Series(["L2", "L1", "L2", None])).tolist() == [1, 2, 1, pd.NA]
+    first.save(path)
+
+    again = ss.KeyMap.load(path)
+    assert again.assign(pd.Series(["L3", "L1"])).tolist() == [3, 2]
+    assert again.lookup(pd.Series(["L2", "missing"])).tolist() == [1, pd.NA]
+    assert len(again) == 3
+
+
+def test_surrogate_keys_are_stable_across_runs(tmp_path, data_dir):
+    star = tmp_path / "star"
+    ss.build_star_schema(star)
+    learners = _keys(star, "dim_learner", "learner_id", "learner_key")
+    courses = _keys(star, "dim_course", "course_id", "course_key")
+
+    # A new learner sorting first must not shift anyone else's key
+    path = data_dir / "sample_learners.csv"
+    df = pd.read_csv(path)
+    pd.concat([df.head(1).assign(learner_id="L000", email="new@example.com"), df]).to_csv(path, index=False)
+    ss.build_star_schema(star)
+
+    rebuilt = _keys(star, "dim_learner", "learner_id", "learner_key")
+    assert {k: rebuilt[k] for k in learners} == learners
+    assert rebuilt["L000"] == max(learners.values()) + 1
+    assert _keys(star, "dim_course", "course_id", "course_key") == courses
+
+
+def test_orphan_facts_point_at_the_unknown_member(tmp_path, data_dir):
+    path = data_dir / "sample_enrollments.csv"
+    df = pd.read_csv(path)
+    orphans = pd.concat([df.head(1).assign(enrollment_id="E901", learner_id="L999"), df.head(1).assign(enrollment_id="E902", course_id="C999")])
+    pd.concat([df, orphans]).to_csv(path, index=False)
+
+    counts = ss.build_star_schema(tmp_path / "star")
+
+    assert counts["fact_enrollment"] == len(df) + 2
+    assert counts["fact_enrollment_orphans"] == 2
+    facts = pd.read_parquet(tmp_path / "star" / "fact_enrollment.parquet").set_index("enrollment_id")
+    assert facts.loc["E901", "learner_key"] == ss.UNKNOWN_KEY
+    assert facts.loc["E902", "course_key"] == ss.UNKNOWN_KEY
+    for table, key in (("dim_learner", "learner_key"), ("dim_course", "course_key"), ("dim_course_category", "category_key")):
+        assert (pd.read_parquet(tmp_path / "star" / f"{table}.parquet")[key] == ss.UNKNOWN_KEY).sum() == 1
+
+
+def test_missing_optional_columns_load_as_typed_nulls(tmp_path, data_dir):
+    for entity, column in (("courses", "duration_minutes"), ("courses", "level_code"), ("enrollments", "time_spent_minutes"), ("learners", "country_code")):
+        path = data_dir / f"sample_{entity}.csv"
+        pd.read_csv(path).drop(columns=[column]).to_csv(path, index=False)
+    pd.DataFrame({
+        "event_id": ["V1"], "learner_id": ["L001"], "course_id": ["C101"], "event_time": ["2024-03-01 10:00:00"],
+    }).to_csv(data_dir / "sample_events.csv", index=False)
+
+    counts = ss.build_star_schema(tmp_path / "star")
+
+    assert counts["fact_enrollment_orphans"] == 0
+    courses = pd.read_parquet(tmp_path / "star" / "dim_course.parquet")
+    assert str(courses["duration_minutes"].dtype) == "Int32" and courses["duration_minutes"].isna().all()
+    assert courses["level_code"].isna().all()
+    facts = pd.read_parquet(tmp_path / "star" / "fact_enrollment.parquet")
+    assert str(facts["time_spent_minutes"].dtype) == "Int32" and facts["time_spent_minutes"].isna().all()
+    assert pd.read_parquet(tmp_path / "star" / "dim_learner.parquet")["country_code"].isna().all()
+    events = pd.read_parquet(tmp_path / "star" / "fact_learning_event.parquet")
+    assert len(events) == 1 and events[["event_type", "duration_seconds", "score"]].isna().all().all()
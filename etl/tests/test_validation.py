@@ -0,0 +1,158 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from etl.validation import (
+    ERRORS_COLUMN, QuarantineWriter, Validator, key_column, latest_per_key, quarantine_path, supersede, to_staging_table,
+)
+
+
+def _errors(rejected: pd.DataFrame) -> list:
+    return rejected[ERRORS_COLUMN].tolist()
+
+
+@pytest.fixture
+def dimensions(tmp_path):
+    """Staging with learners L1/L2 and course C1 already staged."""
+    staging = tmp_path / "staging"
+    (staging / "learners").mkdir(parents=True)
+    (staging / "courses").mkdir()
+    pd.DataFrame({"learner_id": ["L1", "L2"]}).to_parquet(staging / "learners" / "part-00000.parquet")
+    pd.DataFrame({"course_id": ["C1"]}).to_parquet(staging / "courses" / "part-00000.parquet")
+    return staging
+
+
+def _enrollments(**overrides) -> pd.DataFrame:
+    row = {
+        "enrollment_id": "E1", "learner_id": "L1", "course_id": "C1", "enroll_date": "2024-03-01",
+        "progress_pct": "50", "time_spent_minutes": "30", "certificate_issued": "yes",
+    }
+    return pd.DataFrame([dict(row, **overrides)])
+
+
+def test_valid_rows_get_contract_types(dimensions):
+    valid, rejected = Validator("enrollments", dimensions).validate(_enrollments())
+
+    assert rejected.empty
+    assert valid.dtypes.astype(str).to_dict() == {
+        "enrollment_id": "string", "learner_id": "string", "course_id": "string", "enroll_date": "datetime64[us]",
+        "progress_pct": "float64", "time_spent_minutes": "Int64", "certificate_issued": "boolean",
+    }
+    table = to_staging_table(valid, "enrollments")
+    assert str(table.schema.field("enroll_date").type) == "date32[day]"
+    assert str(table.schema.field("certificate_issued").type) == "bool"
+
+
+@pytest.mark.parametrize("column, value, error", [
+    ("progress_pct", "half", "progress_pct:type"),
+    ("time_spent_minutes", "1.5", "time_spent_minutes:type"),
+    ("certificate_issued", "maybe", "certificate_issued:type"),
+    ("enroll_date", "not a date", "enroll_date:type"),
+    ("enrollment_id", " ", "enrollment_id:required"),
+    ("enroll_date", None, "enroll_date:required"),
+    ("progress_pct", "-1", "progress_pct:min"),
+    ("progress_pct", "100.5", "progress_pct:max"),
+    ("instructor_id", "I" * 51, "instructor_id:max_length"),
+    ("learner_id", "L9", "learner_id:references"),
+    ("course_id", "C9", "course_id:references"),
+])
+def test_each_check_rejects(dimensions, column, value, error):
+    validator = Validator("enrollments", dimensions)
+
+    valid, rejected = validator.validate(_enrollments(**{column: value}))
+
+    assert valid.empty
+    assert _errors(rejected) == [error]
+    assert validator.report() == {"rows": 1, "rejected": 1, "failures": {error: 1}}
+
+
+def test_missing_required_column(dimensions):
+    _, rejected = Validator("enrollments", dimensions).validate(_enrollments().drop(columns="course_id"))
+
+    assert _errors(rejected) == ["course_id:missing"]
+
+
+def test_failed_checks_are_all_listed(dimensions):
+    _, rejected = Validator("enrollments", dimensions).validate(_enrollments(progress_pct="101", learner_id="L9"))
+
+    assert _errors(rejected) == ["learner_id:references;progress_pct:max"]
+
+
+def test_repeated_keys_are_accepted_for_upsert(dimensions):
+    validator = Validator("enrollments", dimensions)
+
+    first, rejected = validator.validate(pd.concat([_enrollments(), _enrollments(progress_pct="60")], ignore_index=True))
+    assert len(first) == 2 and rejected.empty
+
+    second, rejected = validator.validate(_enrollments())
+    assert len(second) == 1 and rejected.empty
+
+
+def test_latest_per_key_keeps_last_row_and_rows_without_key():
+    frame = pd.DataFrame({"enrollment_id": ["E1", "E2", None, "E1", None], "n": [1, 2, 3, 4, 5]})
+
+    assert latest_per_key(frame, key_column("enrollments"))["n"].tolist() == [2, 3, 4, 5]
+    assert latest_per_key(frame, None) is frame
+
+
+def _write_part(path, ids, row_group_size=None):
+    table = pa.table({"enrollment_id": pa.array(ids, pa.string()), "n": pa.array(range(len(ids)), pa.int64())})
+    pq.write_table(table, path, row_group_size=row_group_size)
+    return path
+
+
+def test_supersede_removes_earlier_rows_for_restaged_keys(tmp_path):
+    first = _write_part(tmp_path / "part-00000.parquet", ["E1", "E2", "E3", None], row_group_size=2)
+    untouched = _write_part(tmp_path / "part-00001.parquet", ["E4"])
+    before = untouched.stat().st_mtime_ns
+    output = _write_part(tmp_path / "part-00002.parquet", ["E3", "E5", "E3", "E2"])
+
+    removed = supersede(output, [first, untouched], "enrollment_id")
+
+    assert removed == 3
+    assert pq.read_table(first).column("enrollment_id").to_pylist() == ["E1", None]
+    assert pq.read_table(first).schema == pq.read_schema(output)
+    assert pq.read_table(output).to_pydict() == {"enrollment_id": ["E5", "E3", "E2"], "n": [1, 2, 3]}
+    assert untouched.stat().st_mtime_ns == before
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["part-00000.parquet", "part-00001.parquet", "part-00002.parquet"]
+
+
+def test_supersede_can_empty_a_part(tmp_path):
+    first = _write_part(tmp_path / "part-00000.parquet", ["E1"])
+    output = _write_part(tmp_path / "part-00001.parquet", ["E1"])
+
+    assert supersede(output, [first], "enrollment_id") == 1
+    assert pq.read_table(first).num_rows == 0
+    assert supersede(output, [first], None) == 0
+
+
+def test_references_skipped_when_dimension_not_staged(tmp_path):
+    valid, rejected = Validator("enrollments", tmp_path).validate(_enrollments(learner_id="L9"))
+
+    assert len(valid) == 1 and rejected.empty
+
+
+def test_quarantine_writes_rejected_rows(dimensions):
+    staged = dimensions / "enrollments" / "part-00000.parquet"
+    path = quarantine_path(staged, dimensions)
+    validator = Validator("enrollments", dimensions)
+    writer = QuarantineWriter(path)
+    for chunk in (_enrollments(progress_pct="x"), _enrollments(enrollment_id="E2"), _enrollments(enrollment_id="E3", course_id="C9")):
+        writer.write(validator.validate(chunk)[1])
+
+    assert writer.close() == path == dimensions / "_quarantine" / "enrollments" / "part-00000.parquet"
+    quarantined = pq.read_table(path).to_pandas()
+    assert quarantined["enrollment_id"].tolist() == ["E1", "E3"]
+    # Original values are kept as text next to the failed checks
+    assert quarantined["progress_pct"].tolist() == ["x", "50"]
+    assert _errors(quarantined) == ["progress_pct:type", "course_id:references"]
+
+
+def test_quarantine_removes_stale_file_when_nothing_rejected(tmp_path):
+    path = tmp_path / "_quarantine" / "learners" / "part-00000.parquet"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"stale")
+
+    assert QuarantineWriter(path).close() is None
+    assert not path.exists()
@@ -0,0 +1,347 @@
+"""
+ETL data-quality stage: a declarative contract per entity (type, required, range, length,
+references to a dimension's staged ids) checked with column-wise pandas operations on each chunk
+before it is staged. Failing rows go to a quarantine Parquet next to staging (original values as
+strings plus an _errors column naming the failed checks); passing rows are cast to the contract's
+types, and staged through the matching Arrow types, so every staged part of an entity has the
+same schema.
+Each entity's key column is upserted, not checked for uniqueness: a later row with a key already
+staged (further down the same file, or in an appended tail) replaces the earlier one, which is
+also how the Spark incremental job treats a re-sent enrollment_id.
+"""
+import os
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+QUARANTINE_DIR_NAME = "_quarantine"
+ERRORS_COLUMN = "_errors"
+TRUE_VALUES = ("true", "1", "yes", "y", "t")
+FALSE_VALUES = ("false", "0", "no", "n", "f")
+# Staged Arrow type per contract type; columns without a contract are staged as string
+ARROW_TYPES = {
+    "string": pa.string(),
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "bool": pa.bool_(),
+    "date": pa.date32(),
+    "datetime": pa.timestamp("us"),
+}
+# pandas dtype passing rows are cast to per contract type
+PANDAS_DTYPES = {
+    "string": "string",
+    "int": "Int64",
+    "float": "float64",
+    "bool": "boolean",
+    "date": "datetime64[us]",
+    "datetime": "datetime64[us]",
+}
+
+# column -> checks. type: string | int | float | bool | date | datetime; references: "<entity>.<column>";
+# key: the upsert key (see key_column)
+CONTRACTS = {
+    "learners": {
+        "learner_id": {"type": "string", "required": True, "key": True, "max_length": 50},
+        "email": {"type": "string"},
+        "country_code": {"type": "string", "max_length": 3},
+        "signup_date": {"type": "date"},
+    },
+    "courses": {
+        "course_id": {"type": "string", "required": True, "key": True, "max_length": 50},
+        "course_name": {"type": "string", "required": True, "max_length": 255},
+        "category_name": {"type": "string", "max_length": 100},
+        "level_code": {"type": "string", "max_length": 20},
+        "duration_minutes": {"type": "int", "min": 0},
+    },
+    "enrollments": {
+        "enrollment_id": {"type": "string", "required": True, "key": True, "max_length": 50},
+        "learner_id": {"type": "string", "required": True, "references": "learners.learner_id"},
+        "course_id": {"type": "string", "required": True, "references": "courses.course_id"},
+        "instructor_id": {"type": "string", "max_length": 50},
+        "enroll_date": {"type": "date", "required": True},
+        "progress_pct": {"type": "float", "min": 0, "max": 100},
+        "time_spent_minutes": {"type": "int", "min": 0},
+        "certificate_issued": {"type": "bool"},
+    },
+    "events": {
+        "event_id": {"type": "string", "required": True, "key": True, "max_length": 50},
+        "learner_id": {"type": "string", "required": True, "references": "learners.learner_id"},
+        "course_id": {"type": "string", "required": True, "references": "courses.course_id"},
+        "event_time": {"type": "datetime", "required": True},
+        "event_type": {"type": "string", "max_length": 50},
+        "duration_seconds": {"type": "int", "min": 0},
+        "score": {"type": "float", "min": 0, "max": 100},
+    },
+}
+
+
+def quarantine_path(staged_path, staging: Path) -> Path:
+    """Side file for rows rejected from staged_path: staging/_quarantine/<same relative path>."""
+    staged_path, staging = Path(staged_path), Path(staging)
+    try:
+        relative = staged_path.relative_to(staging)
+    except ValueError:
+        relative = Path(staged_path.name)
+    return staging / QUARANTINE_DIR_NAME / relative
+
+
+def staged_values(staging: Path, entity: str, column: str) -> pd.Index:
+    """Distinct values of column over an entity's staged Parquet (stream parts and batch files)."""
+    staging = Path(staging)
+    parts = sorted((staging / entity).glob("*.parquet")) + sorted(staging.glob(f"{entity}_*.parquet"))
+    return _distinct(parts, column)
+
+
+def _distinct(parts: Iterable[Path], column: str) -> pd.Index:
+    values = [
+        pq.read_table(p, columns=[column]).column(0).to_pandas()
+        for p in parts
+        if column in pq.read_schema(p).names
+    ]
+    if not values:
+        return pd.Index([], dtype="string")
+    return pd.Index(pd.concat(values, ignore_index=True).dropna().astype("string").unique())
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    return values if pd.api.types.is_string_dtype(values) and values.dtype != object else values.astype("string")
+
+
+def _parse_bool(values: pd.Series) -> pd.Series:
+    text = values.astype("string").str.strip().str.lower()
+    return pd.Series(
+        np.select([text.isin(TRUE_VALUES).fillna(False), text.isin(FALSE_VALUES).fillna(False)], [True, False], None),
+        index=values.index, dtype="boolean",
+    )
+
+
+def _coerce(values: pd.Series, col_type: str) -> pd.Series:
+    """values in the contract type; entries that do not parse become <NA>/NaN/NaT. Columns already
+    of the type (e.g. validated rows on their way to staging) are returned as they are."""
+    if col_type == "int":
+        if pd.api.types.is_integer_dtype(values):
+            return values
+        numbers = pd.to_numeric(values, errors="coerce")
+        return numbers.where(numbers % 1 == 0)
+    if col_type == "float":
+        return pd.to_numeric(values, errors="coerce")
+    if col_type == "bool":
+        return values if pd.api.types.is_bool_dtype(values) else _parse_bool(values)
+    if col_type in ("date", "datetime"):
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind == "M":
+            return values
+        # Offsets are converted to UTC and dropped so every part holds the same naive timestamps
+        return pd.to_datetime(values, errors="coerce", utc=True).dt.tz_localize(None)
+    return values
+
+
+def key_column(entity: str) -> Optional[str]:
+    """The entity's upsert key: staging holds one row per key, the one staged last."""
+    return next((col for col, rule in CONTRACTS.get(entity, {}).items() if rule.get("key")), None)
+
+
+def latest_per_key(frame: pd.DataFrame, column: Optional[str]) -> pd.DataFrame:
+    """frame without the rows whose key occurs again further down (rows without a key are kept)."""
+    if column is None or column not in frame.columns:
+        return frame
+    keys = frame[column]
+    return frame[~(keys.duplicated(keep="last") & keys.notna()).to_numpy()]
+
+
+def _rewrite_without(path: Path, drop: np.ndarray, compression: str = "snappy") -> None:
+    """Rewrite the Parquet file at path without the rows flagged in drop, one row group at a time."""
+    source = pq.ParquetFile(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    offset = 0
+    with pq.ParquetWriter(tmp, source.schema_arrow, compression=compression) as writer:
+        for i in range(source.num_row_groups):
+            group = source.read_row_group(i)
+            keep = ~drop[offset:offset + group.num_rows]
+            offset += group.num_rows
+            if keep.any():
+                writer.write_table(group.filter(pa.array(keep)))
+    source.close()
+    os.replace(tmp, path)
+
+
+def supersede(output, existing_parts: Iterable, column: Optional[str], compression: str = "snappy") -> int:
+    """
+    Upsert a freshly staged output into the parts it joins: rows of output whose key repeats
+    further down output, and rows of existing_parts whose key is in output, are removed (each
+    affected file is rewritten in place). Only key columns are read to find them, and untouched
+    parts are left alone. Returns the number of rows removed.
+    """
+    output = Path(output)
+    if column is None or column not in pq.read_schema(output).names:
+        return 0
+    keys = pq.read_table(output, columns=[column]).column(0)
+    key_values = keys.to_pandas()
+    repeated = (key_values.duplicated(keep="last") & key_values.notna()).to_numpy()
+    removed = int(repeated.sum())
+    if removed:
+        _rewrite_without(output, repeated, compression)
+    value_set = pc.drop_null(pc.unique(keys.combine_chunks()))
+    for part in map(Path, existing_parts):
+        if not len(value_set) or not part.exists() or column not in pq.read_schema(part).names:
+            continue
+        part_keys = pq.read_table(part, columns=[column]).column(0)
+        hit = pc.is_in(part_keys, value_set=value_set.cast(part_keys.type)).to_numpy(zero_copy_only=False)
+        if hit.any():
+            _rewrite_without(part, hit, compression)
+            removed += int(hit.sum())
+    return removed
+
+
+def read_dtypes(entity: str) -> dict:
+    """dtype map for reading raw files: string contract columns are read as text, so an id column
+    never infers as a number in one chunk and as text in the next (and keeps leading zeros)."""
+    return {col: "string" for col, rule in CONTRACTS.get(entity, {}).items() if rule.get("type", "string") == "string"}
+
+
+def staging_schema(entity: str, columns: Iterable[str]) -> pa.Schema:
+    """Declared Arrow schema for an entity's columns: contract types, anything undeclared as string."""
+    contract = CONTRACTS.get(entity, {})
+    return pa.schema([(col, ARROW_TYPES[contract.get(col, {}).get("type", "string")]) for col in columns])
+
+
+def _arrow_array(values: pd.Series, arrow_type: pa.DataType) -> pa.Array:
+    if pa.types.is_integer(arrow_type):
+        values = _coerce(values, "int").astype("Int64")
+    elif pa.types.is_floating(arrow_type):
+        values = _coerce(values, "float").astype("float64")
+    elif pa.types.is_boolean(arrow_type):
+        values = _coerce(values, "bool")
+    elif pa.types.is_date(arrow_type) or pa.types.is_timestamp(arrow_type):
+        values = _coerce(values, "datetime")
+    else:
+        values = _as_text(values)
+    return pa.array(values, from_pandas=True).cast(arrow_type, safe=False)
+
+
+def to_staging_table(chunk: pd.DataFrame, entity: str, schema: Optional[pa.Schema] = None) -> pa.Table:
+    """
+    chunk as an Arrow table in schema (default: staging_schema of its columns), so every chunk and
+    part of an entity is written with the same types whatever pandas inferred for it. Values that
+    do not parse as their type become null (with etl.validate they are quarantined before this);
+    schema columns missing from the chunk are null and columns outside the schema are dropped.
+    """
+    schema = staging_schema(entity, chunk.columns) if schema is None else schema
+    arrays = [
+        _arrow_array(chunk[field.name], field.type) if field.name in chunk.columns else pa.nulls(len(chunk), field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+class Validator:
+    """
+    Checks chunks of one entity against its contract. Referenced ids are read once from staging
+    (run_pipelines stages dimensions before their facts) and probed with Arrow's is_in. Repeated
+    keys are not rejected here: supersede/latest_per_key keep the last accepted row per key.
+    """
+
+    def __init__(self, entity: str, staging: Path, contract: Optional[dict] = None):
+        self.entity = entity
+        self.contract = CONTRACTS.get(entity, {}) if contract is None else contract
+        self.rows = 0
+        self.rejected = 0
+        self.failures = {}
+        self.references = {}
+        for col, rule in self.contract.items():
+            if rule.get("references"):
+                ref_entity, ref_col = rule["references"].split(".")
+                ref = staged_values(staging, ref_entity, ref_col)
+                if len(ref):
+                    self.references[col] = pa.array(ref.astype(str).to_numpy(dtype=object), type=pa.string())
+                else:
+                    print(f"Validation: {ref_entity} not staged, {entity}.{col} references not checked")
+
+    def _fail(self, errors: pd.Series, mask: pd.Series, check: str) -> pd.Series:
+        mask = mask.fillna(False).to_numpy(dtype=bool)
+        count = int(mask.sum())
+        if count:
+            self.failures[check] = self.failures.get(check, 0) + count
+            errors = errors.where(~mask, errors + check + ";")
+        return errors
+
+    def validate(self, chunk: pd.DataFrame) -> tuple:
+        """(valid rows with contract types applied, rejected rows with an _errors column)."""
+        errors = pd.Series("", index=chunk.index, dtype=object)
+        typed = {}
+        for col, rule in self.contract.items():
+            if col not in chunk.columns:
+                if rule.get("required"):
+                    errors = self._fail(errors, pd.Series(True, index=chunk.index), f"{col}:missing")
+                continue
+            raw = chunk[col]
+            # Only text columns can hold blanks; numeric/boolean columns skip the string conversion
+            text = None if pd.api.types.is_numeric_dtype(raw) or pd.api.types.is_bool_dtype(raw) else _as_text(raw)
+            present = raw.notna() if text is None else raw.notna() & text.str.strip().ne("")
+            col_type = rule.get("type", "string")
+            values = _coerce(raw, col_type) if col_type != "string" else (_as_text(raw) if text is None else text)
+            if rule.get("required"):
+                errors = self._fail(errors, ~present, f"{col}:required")
+            errors = self._fail(errors, present & values.isna(), f"{col}:type")
+            if "min" in rule:
+                errors = self._fail(errors, values < rule["min"], f"{col}:min")
+            if "max" in rule:
+                errors = self._fail(errors, values > rule["max"], f"{col}:max")
+            if "max_length" in rule and text is not None:
+                errors = self._fail(errors, text.str.len() > rule["max_length"], f"{col}:max_length")
+            if col in self.references:
+                keys = pa.array(_as_text(raw) if text is None else text, type=pa.string(), from_pandas=True)
+                known = pc.is_in(keys, value_set=self.references[col]).to_numpy(zero_copy_only=False)
+                errors = self._fail(errors, present & ~known, f"{col}:references")
+            typed[col] = values
+
+        bad = errors.ne("").to_numpy()
+        valid = chunk[~bad].copy()
+        for col, values in typed.items():
+            col_type = self.contract[col].get("type", "string")
+            values = values[~bad].astype(PANDAS_DTYPES[col_type])
+            valid[col] = values.dt.normalize() if col_type == "date" else values
+        rejected = chunk[bad].astype("string")
+        rejected[ERRORS_COLUMN] = errors[bad].str.rstrip(";").astype("string")
+        self.rows += len(chunk)
+        self.rejected += int(bad.sum())
+        return valid, rejected
+
+    def report(self) -> dict:
+        return {"rows": self.rows, "rejected": self.rejected, "failures": dict(sorted(self.failures.items()))}
+
+
+class QuarantineWriter:
+    """Rejected rows for one staged output, appended chunk by chunk; the file is only created
+    when a row is rejected (temp file, renamed on close)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(f".{self.path.name}.tmp")
+        self.writer = None
+        self.rows = 0
+
+    def write(self, rejected: pd.DataFrame) -> None:
+        if not len(rejected):
+            return
+        if self.writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            table = pa.Table.from_pandas(rejected, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.tmp, table.schema)
+        else:
+            table = pa.Table.from_pandas(rejected, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+        self.rows += len(rejected)
+
+    def close(self) -> Optional[Path]:
+        """Finish the file (or remove a stale one from an earlier run); returns its path if written."""
+        if self.writer is None:
+            self.path.unlink(missing_ok=True)
+            return None
+        self.writer.close()
+        os.replace(self.tmp, self.path)
+        return self.path
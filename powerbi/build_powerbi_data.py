@@ -1,64 +1,165 @@
 """
 Build Power BI data source: same data as localhost dashboard (Streamlit).
-Output: powerbi/LearningPlatform_Data.xlsx (and CSVs in powerbi/data/).
-Run from project root: python powerbi/build_powerbi_data.py
+Sources and aggregates come from analytics/serving.py, so both consumers share one
+computation per data refresh (ETL staging output when present, else data/sample_*.csv).
+Output: powerbi/data/ as Parquet (read natively by Power BI) or CSV, plus
+powerbi/LearningPlatform_Data.xlsx with the small pre-aggregated sheets.
+Only tables whose source files changed since the last export are rebuilt (state in
+powerbi/data/_export_state.json); --force rebuilds everything.
+Run from project root: python powerbi/build_powerbi_data.py [--format parquet|csv] [--excel aggregates|full|none]
 """
+import os
+import sys
+import json
+import argparse
 from pathlib import Path
+
 import pandas as pd
+import yaml
 
 BASE = Path(__file__).resolve().parent.parent
-DATA = BASE / "data"
 OUT = Path(__file__).resolve().parent
 OUT_DATA = OUT / "data"
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from analytics import serving  # noqa: E402
+
+STATE_NAME = "_export_state.json"
+EXCEL_NAME = "LearningPlatform_Data.xlsx"
+# output table -> source entities it is computed from
+OUTPUTS = {
+    "Learners": ("learners",),
+    "Enrollments": ("enrollments",),
+    "Courses": ("courses",),
+    "EnrollmentsWithCourses": ("enrollments", "courses"),
+    "EnrollmentsByDate": ("enrollments",),
+    "EnrollmentsByCourse": ("enrollments", "courses"),
+    "CoursesByCategory": ("courses",),
+    "EnrollmentsByCourseWithProgress": ("enrollments", "courses"),
+}
+AGGREGATE_SHEETS = ("EnrollmentsByDate", "EnrollmentsByCourse", "CoursesByCategory", "EnrollmentsByCourseWithProgress")
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def load_settings() -> dict:
+    config_path = BASE / "config" / "settings.yaml"
+    if not config_path.exists():
+        return {}
+    with open(config_path) as f:
+        return (yaml.safe_load(f) or {}).get("powerbi") or {}
+
+
+def _fingerprint(entities: tuple) -> list:
+    return [list(f) for f in serving.sources_fingerprint(entities)]
+
+
+def load_state(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
 
+def write_state(state: dict, path: Path) -> None:
+    """Temp file + rename, so an interrupted run never leaves a truncated state file."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, path)
 
-def main():
+
+def build_tables(names: set) -> dict:
+    """
+    The requested output tables. Base tables read each source at most once; the aggregate
+    tables are the shared serving aggregates (memoized / stored by source fingerprint).
+    """
+    needed = {e for name in names if name not in AGGREGATE_SHEETS for e in OUTPUTS[name]}
+    frames = {e: serving.read_entity(e) for e in needed}
+    tables = {}
+    if "learners" in frames:
+        tables["Learners"] = frames["learners"]
+    if "courses" in frames:
+        tables["Courses"] = frames["courses"]
+    if "enrollments" in frames:
+        enrollments = frames["enrollments"]
+        enrollments["enroll_date"] = pd.to_datetime(enrollments["enroll_date"])
+        tables["Enrollments"] = enrollments
+        if "courses" in frames:
+            # Merged table for charts that need course_name, category, etc.
+            tables["EnrollmentsWithCourses"] = enrollments.merge(frames["courses"], on="course_id", how="left")
+    if names & set(AGGREGATE_SHEETS):
+        aggs = serving.get_aggregates()
+        tables["EnrollmentsByDate"] = aggs["by_date"][["enroll_date", "count"]]
+        tables["EnrollmentsByCourse"] = aggs["by_course_name"][["course_name", "enrollments"]]
+        tables["CoursesByCategory"] = aggs["by_category"][["category_name", "courses"]]
+        tables["EnrollmentsByCourseWithProgress"] = aggs["by_course_name"]
+    return {name: tables[name] for name in names}
+
+
+def write_table(df: pd.DataFrame, path: Path, fmt: str) -> None:
+    """Temp file + rename, so Power BI never refreshes from a half-written file."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def write_excel(path: Path, out_data: Path, fmt: str, sheets: tuple) -> None:
+    """Workbook of the given tables (read back from the export); tables over Excel's row limit are skipped."""
+    with pd.ExcelWriter(path, engine="openpyxl") as w:
+        for name in sheets:
+            table_path = out_data / f"{name}.{fmt}"
+            df = pd.read_parquet(table_path) if fmt == "parquet" else pd.read_csv(table_path)
+            if len(df) > EXCEL_MAX_ROWS:
+                print(f"Excel: skipped {name} ({len(df):,} rows exceeds the sheet limit)")
+                continue
+            df.to_excel(w, sheet_name=name, index=False)
+
+
+def export(fmt: str = "csv", excel: str = "aggregates", force: bool = False) -> list:
+    """Rebuild stale outputs in OUT_DATA (and the workbook); returns the names rebuilt."""
     OUT_DATA.mkdir(parents=True, exist_ok=True)
+    state_path = OUT_DATA / STATE_NAME
+    state = {} if force else load_state(state_path)
+    stale = {
+        name for name, entities in OUTPUTS.items()
+        if state.get(name, {}).get("sources") != _fingerprint(entities)
+        or state.get(name, {}).get("format") != fmt
+        or not (OUT_DATA / f"{name}.{fmt}").exists()
+    }
+    for name, df in build_tables(stale).items():
+        write_table(df, OUT_DATA / f"{name}.{fmt}", fmt)
+        state[name] = {"sources": _fingerprint(OUTPUTS[name]), "format": fmt}
+    excel_changed = state.get("_excel") != excel
+    state["_excel"] = excel
+    write_state(state, state_path)
+    print(f"{fmt.upper()} in: {OUT_DATA} (rebuilt {len(stale)} of {len(OUTPUTS)}: {', '.join(sorted(stale)) or 'none'})")
+
+    if excel != "none":
+        sheets = tuple(OUTPUTS) if excel == "full" else AGGREGATE_SHEETS
+        excel_path = OUT / EXCEL_NAME
+        if stale & set(sheets) or excel_changed or not excel_path.exists():
+            try:
+                write_excel(excel_path, OUT_DATA, fmt, sheets)
+                print(f"Excel written: {excel_path}")
+            except ImportError:
+                print("Install openpyxl for Excel output: pip install openpyxl")
+    return sorted(stale)
+
 
-    learners = pd.read_csv(DATA / "sample_learners.csv")
-    enrollments = pd.read_csv(DATA / "sample_enrollments.csv")
-    courses = pd.read_csv(DATA / "sample_courses.csv")
-
-    # Merged table for charts that need course_name, category, etc.
-    enr = enrollments.merge(courses, on="course_id", how="left")
-
-    # Pre-aggregated for specific charts (optional; Power BI can aggregate from base tables)
-    enrollments["enroll_date"] = pd.to_datetime(enrollments["enroll_date"])
-    by_date = enrollments.groupby("enroll_date").size().reset_index(name="count")
-    by_course = enr.groupby("course_name").size().reset_index(name="enrollments")
-    by_category = courses.groupby("category_name").size().reset_index(name="courses")
-    agg_course = enr.groupby("course_name").agg(
-        enrollments=("enrollment_id", "count"),
-        avg_progress=("progress_pct", "mean"),
-    ).reset_index()
-
-    # Write CSVs (Power BI can connect to folder)
-    learners.to_csv(OUT_DATA / "Learners.csv", index=False)
-    enrollments.to_csv(OUT_DATA / "Enrollments.csv", index=False)
-    courses.to_csv(OUT_DATA / "Courses.csv", index=False)
-    enr.to_csv(OUT_DATA / "EnrollmentsWithCourses.csv", index=False)
-    by_date.to_csv(OUT_DATA / "EnrollmentsByDate.csv", index=False)
-    by_course.to_csv(OUT_DATA / "EnrollmentsByCourse.csv", index=False)
-    by_category.to_csv(OUT_DATA / "CoursesByCategory.csv", index=False)
-    agg_course.to_csv(OUT_DATA / "EnrollmentsByCourseWithProgress.csv", index=False)
-
-    # Write Excel (one workbook, multiple sheets) if openpyxl available
-    try:
-        excel_path = OUT / "LearningPlatform_Data.xlsx"
-        with pd.ExcelWriter(excel_path, engine="openpyxl") as w:
-            learners.to_excel(w, sheet_name="Learners", index=False)
-            enrollments.to_excel(w, sheet_name="Enrollments", index=False)
-            courses.to_excel(w, sheet_name="Courses", index=False)
-            enr.to_excel(w, sheet_name="EnrollmentsWithCourses", index=False)
-            by_date.to_excel(w, sheet_name="EnrollmentsByDate", index=False)
-            by_course.to_excel(w, sheet_name="EnrollmentsByCourse", index=False)
-            by_category.to_excel(w, sheet_name="CoursesByCategory", index=False)
-            agg_course.to_excel(w, sheet_name="EnrollmentsByCourseWithProgress", index=False)
-        print(f"Excel written: {excel_path}")
-    except ImportError:
-        print("Install openpyxl for Excel output: pip install openpyxl")
-
-    print(f"CSVs in: {OUT_DATA}")
+def main(argv=None):
+    settings = load_settings()
+    parser = argparse.ArgumentParser(description="Export dashboard data for Power BI")
+    parser.add_argument("--format", choices=["parquet", "csv"], default=settings.get("format", "csv"))
+    parser.add_argument(
+        "--excel", choices=["aggregates", "full", "none"], default=settings.get("excel", "aggregates"),
+        help="aggregates: only the small pre-aggregated sheets; full: every table (slow, 1M-row sheet limit)",
+    )
+    parser.add_argument("--force", action="store_true", help="rebuild every output")
+    args = parser.parse_args(argv)
+    export(args.format, args.excel, args.force)
 
 
 if __name__ == "__main__":
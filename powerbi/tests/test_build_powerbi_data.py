@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from powerbi import build_powerbi_data as bp
+
+
+@pytest.fixture
+def export_dirs(data_dir, tmp_path, monkeypatch):
+    """Sample sources in a scratch data dir, exporting into a scratch powerbi dir."""
+    monkeypatch.setattr(bp, "OUT", tmp_path / "powerbi")
+    monkeypatch.setattr(bp, "OUT_DATA", tmp_path / "powerbi" / "data")
+    return data_dir
+
+
+def test_second_export_rebuilds_nothing(export_dirs):
+    assert bp.export("csv", "none") == sorted(bp.OUTPUTS)
+    assert bp.export("csv", "none") == []
+
+    state = json.loads((bp.OUT_DATA / bp.STATE_NAME).read_text())
+    assert set(state) == set(bp.OUTPUTS) | {"_excel"}
+    assert not list(bp.OUT_DATA.glob(".*.tmp"))
+
+
+def test_interrupted_state_write_keeps_previous_state(export_dirs, monkeypatch):
+    bp.export("csv", "none")
+    state_path = bp.OUT_DATA / bp.STATE_NAME
+    before = state_path.read_text()
+
+    def interrupted(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(bp.os, "replace", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        bp.write_state({"Learners": {"sources": [], "format": "csv"}}, state_path)
+
+    assert state_path.read_text() == before
+    assert json.loads(before)["_excel"] == "none"
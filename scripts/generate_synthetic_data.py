@@ -0,0 +1,338 @@
+"""
+Synthetic learners, courses, enrollments and learning events for load and scale testing.
+Rows are generated and written chunk by chunk (memory stays at one chunk whatever the scale);
+course popularity and learner activity follow a Zipf-like power law, so joins and group-bys see
+realistic skew. Batch files go to data/raw/<entity>.<ext>, the layout etl/extract_load.py reads in
+every format; Parquet also feeds the Spark jobs directly (e.g. --events-input data/raw/events.parquet).
+--stream writes EVENT_SCHEMA-shaped NDJSON files into data/stream_input at --rate events/sec.
+
+Run from project root:
+  python scripts/generate_synthetic_data.py --learners 100000 --courses 500 --enrollments 1000000 --events 5000000
+  python scripts/generate_synthetic_data.py --format parquet --enrollments 50000000 --events 0
+  python scripts/generate_synthetic_data.py --stream --rate 2000 --stream-seconds 600
+"""
+import os
+import json
+import math
+import time
+import argparse
+from pathlib import Path
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BASE = Path(__file__).resolve().parent.parent
+RAW = BASE / "data" / "raw"
+STREAM_INPUT = BASE / "data" / "stream_input"
+EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "ndjson": ".ndjson"}
+DEFAULT_CHUNK_ROWS = 250_000
+
+CATEGORIES = ["Data Science", "Data Engineering", "Web Development", "Cloud", "Business", "Design", "Security"]
+LEVELS = ["Beginner", "Intermediate", "Advanced"]
+TOPICS = ["Python", "SQL", "Spark", "Snowflake", "Power BI", "Kafka", "React", "AWS", "Statistics", "Excel", "Docker"]
+COURSE_KINDS = ["Fundamentals", "Basics", "in Practice", "Deep Dive", "for Analysts", "Masterclass", "Optimization"]
+COUNTRIES = ["US", "IN", "UK", "CA", "AU", "DE", "BR", "FR", "NG", "JP"]
+EVENT_TYPES = ["page_view", "video_play", "video_complete", "quiz_submit", "assignment_submit"]
+EVENT_TYPE_WEIGHTS = [0.4, 0.3, 0.15, 0.1, 0.05]
+SCORED_EVENTS = ("quiz_submit", "assignment_submit")
+
+
+def zipf_ranks(rng: np.random.Generator, n: int, size: int, a: float) -> np.ndarray:
+    """
+    0-based ranks in [0, n) with P(rank k) ~ 1/(k+1)^a, drawn by inverting the continuous bounded
+    power law, so no n-sized weight table is needed (works for hundreds of millions of ids).
+    """
+    u = rng.random(size)
+    if abs(a - 1.0) < 1e-9:
+        x = np.power(n + 1.0, u)
+    else:
+        x = np.power(1.0 + u * ((n + 1.0) ** (1.0 - a) - 1.0), 1.0 / (1.0 - a))
+    return np.minimum(np.floor(x).astype(np.int64) - 1, n - 1)
+
+
+def scatter(ranks: np.ndarray, n: int) -> np.ndarray:
+    """Bijective rank -> id index shuffle (multiplicative, stride coprime to n) so popular ids are spread out."""
+    stride = max(1, int(n * 0.6180339887))
+    while math.gcd(stride, n) != 1:
+        stride += 1
+    return (ranks * stride + n // 3) % n
+
+
+def learner_ids(idx: np.ndarray) -> np.ndarray:
+    return np.char.add("L", np.char.zfill(idx.astype(str), 8))
+
+
+def course_ids(idx: np.ndarray) -> np.ndarray:
+    return np.char.add("C", np.char.zfill(idx.astype(str), 5))
+
+
+def chunk_bounds(total: int, chunk_rows: int) -> Iterator[tuple]:
+    for start in range(0, total, chunk_rows):
+        yield start, min(start + chunk_rows, total)
+
+
+def iter_learners(n: int, chunk_rows: int, seed: int, start_date: pd.Timestamp, days: int) -> Iterator[pd.DataFrame]:
+    for start, end in chunk_bounds(n, chunk_rows):
+        rng = np.random.default_rng([seed, 1, start])
+        idx = np.arange(start, end)
+        yield pd.DataFrame({
+            "learner_id": learner_ids(idx),
+            "email": np.char.add(np.char.add("learner", idx.astype(str)), "@example.com"),
+            "country_code": rng.choice(COUNTRIES, size=len(idx), p=_power_weights(len(COUNTRIES), 1.0)),
+            "signup_date": (start_date + pd.to_timedelta(rng.integers(0, days, len(idx)), unit="D")).strftime("%Y-%m-%d"),
+        })
+
+
+def iter_courses(n: int, chunk_rows: int, seed: int) -> Iterator[pd.DataFrame]:
+    for start, end in chunk_bounds(n, chunk_rows):
+        rng = np.random.default_rng([seed, 2, start])
+        idx = np.arange(start, end)
+        topics = np.asarray(TOPICS)[idx % len(TOPICS)]
+        kinds = np.asarray(COURSE_KINDS)[(idx // len(TOPICS)) % len(COURSE_KINDS)]
+        edition = (idx // (len(TOPICS) * len(COURSE_KINDS))) + 1
+        names = np.char.add(np.char.add(topics, " "), kinds)
+        names = np.where(edition > 1, np.char.add(np.char.add(names, " "), edition.astype(str)), names)
+        yield pd.DataFrame({
+            "course_id": course_ids(idx),
+            "course_name": names,
+            "category_name": rng.choice(CATEGORIES, size=len(idx)),
+            "level_code": rng.choice(LEVELS, size=len(idx), p=[0.45, 0.35, 0.2]),
+            "duration_minutes": rng.integers(4, 41, len(idx)) * 30,
+        })
+
+
+def _power_weights(n: int, a: float) -> np.ndarray:
+    w = 1.0 / np.power(np.arange(1, n + 1), a)
+    return w / w.sum()
+
+
+def iter_enrollments(
+    n: int,
+    n_learners: int,
+    n_courses: int,
+    chunk_rows: int,
+    seed: int,
+    start_date: pd.Timestamp,
+    days: int,
+    skew: float,
+) -> Iterator[pd.DataFrame]:
+    """Learners and courses are drawn with Zipf skew; progress is biased toward dropping out early."""
+    n_instructors = max(1, n_courses // 5)
+    for start, end in chunk_bounds(n, chunk_rows):
+        rng = np.random.default_rng([seed, 3, start])
+        size = end - start
+        learner = scatter(zipf_ranks(rng, n_learners, size, skew), n_learners)
+        course = scatter(zipf_ranks(rng, n_courses, size, skew), n_courses)
+        progress = np.where(rng.random(size) < 0.25, 100, np.round(rng.beta(0.8, 1.6, size) * 100)).astype(np.int64)
+        yield pd.DataFrame({
+            "enrollment_id": np.char.add("E", np.char.zfill(np.arange(start, end).astype(str), 10)),
+            "learner_id": learner_ids(learner),
+            "course_id": course_ids(course),
+            "instructor_id": np.char.add("I", np.char.zfill((course % n_instructors).astype(str), 4)),
+            "enroll_date": (start_date + pd.to_timedelta(rng.integers(0, days, size), unit="D")).strftime("%Y-%m-%d"),
+            "progress_pct": progress,
+            "time_spent_minutes": (progress * rng.uniform(2.0, 8.0, size)).astype(np.int64),
+            "certificate_issued": (progress == 100) & (rng.random(size) < 0.9),
+        })
+
+
+def events_frame(rng: np.random.Generator, learners: np.ndarray, courses: np.ndarray, times: pd.DatetimeIndex, first_id: int) -> pd.DataFrame:
+    size = len(learners)
+    event_type = rng.choice(EVENT_TYPES, size=size, p=EVENT_TYPE_WEIGHTS)
+    scored = np.isin(event_type, SCORED_EVENTS)
+    return pd.DataFrame({
+        "event_id": np.char.add("EV", np.char.zfill(np.arange(first_id, first_id + size).astype(str), 12)),
+        "learner_id": learners,
+        "course_id": courses,
+        "event_time": times,
+        "event_type": event_type,
+        "duration_seconds": np.maximum(rng.lognormal(4.5, 1.0, size), 1).astype(np.int64),
+        "score": np.where(scored, np.round(np.clip(rng.normal(72, 15, size), 0, 100), 1), np.nan),
+    })
+
+
+def iter_events(
+    n: int,
+    n_learners: int,
+    n_courses: int,
+    chunk_rows: int,
+    seed: int,
+    start_date: pd.Timestamp,
+    days: int,
+    skew: float,
+) -> Iterator[pd.DataFrame]:
+    """Events over the same skewed learner/course popularity as enrollments, spread across the date range."""
+    for start, end in chunk_bounds(n, chunk_rows):
+        rng = np.random.default_rng([seed, 4, start])
+        size = end - start
+        learner = learner_ids(scatter(zipf_ranks(rng, n_learners, size, skew), n_learners))
+        course = course_ids(scatter(zipf_ranks(rng, n_courses, size, skew), n_courses))
+        times = start_date + pd.to_timedelta(np.sort(rng.integers(0, days * 86_400, size)), unit="s")
+        yield events_frame(rng, learner, course, times, start)
+
+
+class ChunkWriter:
+    """Appends DataFrame chunks to one CSV, NDJSON or Parquet file (one row group per chunk)."""
+
+    def __init__(self, path: Path, fmt: str):
+        self.path = Path(path)
+        self.fmt = fmt
+        self.rows = 0
+        self._parquet: Optional[pq.ParquetWriter] = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == "parquet":
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.path, table.schema, compression="snappy")
+            self._parquet.write_table(table.cast(self._parquet.schema))
+        elif self.fmt == "csv":
+            df.to_csv(self.path, mode="a", header=self.rows == 0, index=False)
+        else:
+            with open(self.path, "a") as f:
+                df.to_json(f, orient="records", lines=True, date_format="iso")
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+class Pacer:
+    """Sleeps so that rows are emitted at no more than `rate` rows/sec (unlimited when rate is falsy)."""
+
+    def __init__(self, rate: Optional[float]):
+        self.rate = rate
+        self.start = time.perf_counter()
+        self.rows = 0
+
+    def wait(self, rows: int) -> None:
+        self.rows += rows
+        if self.rate:
+            ahead = self.rows / self.rate - (time.perf_counter() - self.start)
+            if ahead > 0:
+                time.sleep(ahead)
+
+
+def write_entity(name: str, chunks: Iterator[pd.DataFrame], out_dir: Path, fmt: str, rate: Optional[float] = None) -> dict:
+    path = Path(out_dir) / f"{name}{EXTENSIONS[fmt]}"
+    writer, pacer = ChunkWriter(path, fmt), Pacer(rate)
+    start = time.perf_counter()
+    try:
+        for df in chunks:
+            writer.write(df)
+            pacer.wait(len(df))
+    finally:
+        writer.close()
+    seconds = time.perf_counter() - start
+    stats = {"entity": name, "rows": writer.rows, "seconds": round(seconds, 2),
+             "rows_per_sec": round(writer.rows / seconds) if seconds else None, "path": str(path)}
+    print(f"{name}: {writer.rows} rows -> {path} ({stats['seconds']}s)")
+    return stats
+
+
+def skip_entity(name: str, out_dir: Path, fmt: str) -> None:
+    """A zero count writes no file; one left by an earlier run is removed so out_dir stays one dataset."""
+    path = Path(out_dir) / f"{name}{EXTENSIONS[fmt]}"
+    stale = path.exists()
+    path.unlink(missing_ok=True)
+    print(f"{name}: 0 rows, skipped" + (f" (removed stale {path})" if stale else ""))
+
+
+def stream_events(
+    out_dir: Path,
+    rate: float,
+    n_learners: int,
+    n_courses: int,
+    seed: int,
+    skew: float,
+    file_rows: int = 1_000,
+    seconds: Optional[float] = None,
+    max_events: Optional[int] = None,
+    late_fraction: float = 0.02,
+    late_minutes: float = 30,
+) -> int:
+    """
+    Drop NDJSON event files into out_dir at about `rate` events/sec until seconds or max_events is
+    reached. event_time is close to now; late_fraction of events are up to late_minutes old, to
+    exercise watermarks and late-event handling. Files are written under a dot-prefixed name and
+    renamed, since the Spark file source ignores hidden files.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pacer, started, sent, file_no = Pacer(rate), time.time(), 0, 0
+    while (seconds is None or time.time() - started < seconds) and (max_events is None or sent < max_events):
+        size = file_rows if max_events is None else min(file_rows, max_events - sent)
+        learner = learner_ids(scatter(zipf_ranks(rng, n_learners, size, skew), n_learners))
+        course = course_ids(scatter(zipf_ranks(rng, n_courses, size, skew), n_courses))
+        lag_s = np.where(rng.random(size) < late_fraction, rng.uniform(0, late_minutes * 60, size), rng.exponential(2.0, size))
+        times = pd.Timestamp.now() - pd.to_timedelta(lag_s, unit="s")
+        df = events_frame(rng, learner, course, times, int(started) * 1_000_000 + sent)
+        name = f"events_{int(started)}_{file_no:06d}.json"
+        tmp = out_dir / f".{name}.tmp"
+        df.to_json(tmp, orient="records", lines=True, date_format="iso")
+        os.replace(tmp, out_dir / name)
+        sent += size
+        file_no += 1
+        pacer.wait(size)
+    print(f"Streamed {sent} events in {file_no} files to {out_dir} ({time.time() - started:.1f}s)")
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic learning-platform data at scale")
+    parser.add_argument("--learners", type=int, default=10_000)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--enrollments", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--format", choices=sorted(EXTENSIONS), default="csv", help="batch output format")
+    parser.add_argument("--out", default=str(RAW), help="batch output directory (default data/raw)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for course/learner popularity")
+    parser.add_argument("--start-date", default="2024-01-01")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", type=float, help="max rows/sec (batch, per entity) or events/sec (--stream)")
+    parser.add_argument("--stream", action="store_true", help="write event files into data/stream_input instead")
+    parser.add_argument("--stream-dir", default=str(STREAM_INPUT))
+    parser.add_argument("--stream-file-rows", type=int, default=1_000)
+    parser.add_argument("--stream-seconds", type=float, help="stop streaming after this many seconds")
+    args = parser.parse_args()
+
+    if args.stream:
+        max_events = args.events if args.stream_seconds is None else None
+        stream_events(args.stream_dir, args.rate or 1_000, args.learners, args.courses, args.seed, args.skew,
+                      args.stream_file_rows, args.stream_seconds, max_events)
+        return
+
+    if (args.enrollments > 0 or args.events > 0) and (args.learners <= 0 or args.courses <= 0):
+        parser.error("--enrollments and --events need --learners and --courses above 0")
+    start_date = pd.Timestamp(args.start_date)
+    counts = {"learners": args.learners, "courses": args.courses, "enrollments": args.enrollments, "events": args.events}
+    common = dict(chunk_rows=args.chunk_rows, seed=args.seed)
+    entities = [
+        ("learners", iter_learners(args.learners, start_date=start_date, days=args.days, **common)),
+        ("courses", iter_courses(args.courses, **common)),
+        ("enrollments", iter_enrollments(args.enrollments, args.learners, args.courses, start_date=start_date,
+                                         days=args.days, skew=args.skew, **common)),
+        ("events", iter_events(args.events, args.learners, args.courses, start_date=start_date,
+                               days=args.days, skew=args.skew, **common)),
+    ]
+    stats = []
+    for name, chunks in entities:
+        if counts[name] > 0:
+            stats.append(write_entity(name, chunks, args.out, args.format, args.rate))
+        else:
+            skip_entity(name, args.out, args.format)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
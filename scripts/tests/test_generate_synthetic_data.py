@@ -0,0 +1,35 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from scripts import generate_synthetic_data as gen
+
+
+def _run(monkeypatch, out, *args):
+    monkeypatch.setattr(sys, "argv", ["generate_synthetic_data.py", "--out", str(out), "--chunk-rows", "40", *args])
+    gen.main()
+
+
+def test_generates_each_entity_in_chunks(tmp_path, monkeypatch):
+    _run(monkeypatch, tmp_path, "--learners", "50", "--courses", "5", "--enrollments", "100", "--events", "90")
+
+    assert {p.name for p in tmp_path.iterdir()} == {"learners.csv", "courses.csv", "enrollments.csv", "events.csv"}
+    enrollments = pd.read_csv(tmp_path / "enrollments.csv")
+    assert len(enrollments) == 100 and enrollments["enrollment_id"].is_unique
+    assert set(enrollments["learner_id"]) <= set(pd.read_csv(tmp_path / "learners.csv")["learner_id"])
+    assert len(pd.read_csv(tmp_path / "events.csv")) == 90
+
+
+@pytest.mark.parametrize("fmt, ext", [("csv", ".csv"), ("parquet", ".parquet"), ("ndjson", ".ndjson")])
+def test_zero_counts_write_no_file_and_remove_stale_ones(tmp_path, monkeypatch, fmt, ext):
+    (tmp_path / f"events{ext}").write_text("stale")
+
+    _run(monkeypatch, tmp_path, "--format", fmt, "--learners", "20", "--courses", "3", "--enrollments", "0", "--events", "0")
+
+    assert {p.name for p in tmp_path.iterdir()} == {f"learners{ext}", f"courses{ext}"}
+
+
+def test_facts_need_dimensions(tmp_path, monkeypatch):
+    with pytest.raises(SystemExit):
+        _run(monkeypatch, tmp_path, "--learners", "0", "--enrollments", "10")
@@ -3,8 +3,16 @@ Snowflake: Clustering, Time Travel, Semi-structured (VARIANT) handling.
 Requires: snowflake-connector-python, env vars SNOWFLAKE_ACCOUNT, USER, PASSWORD.
 """
 import os
+import re
+import gzip
+import json
+import time
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterable, Iterator, Optional, Sequence
 
 import yaml
 from dotenv import load_dotenv
@@ -29,20 +37,175 @@ def load_config() -> dict:
     return yaml.safe_load(raw) or {}
 
 
+def conn_params(config: Optional[dict] = None) -> dict:
+    cfg = config or load_config()
+    sf = cfg.get("snowflake") or {}
+    return {
+        "account": sf.get("account") or os.environ.get("SNOWFLAKE_ACCOUNT"),
+        "user": sf.get("user") or os.environ.get("SNOWFLAKE_USER"),
+        "password": sf.get("password") or os.environ.get("SNOWFLAKE_PASSWORD"),
+        "warehouse": sf.get("warehouse", "ANALYTICS_WH"),
+        "database": sf.get("database", "LEARNING_PLATFORM_DW"),
+        "schema": sf.get("schema", "ANALYTICS"),
+        "role": sf.get("role", "ANALYTICS_ROLE"),
+    }
+
+
 def get_conn(config: Optional[dict] = None):
     if not HAS_SNOWFLAKE:
         raise RuntimeError("snowflake-connector-python not installed")
+    return snowflake.connector.connect(**conn_params(config))
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of reusable connections. At most max_size connections are open at once;
+    idle ones are handed out again instead of paying the login handshake per operation.
+    """
+
+    def __init__(self, connect: Callable[[], object], max_size: int = 4):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        ok = False
+        try:
+            if conn is None:
+                conn = self._connect()
+            yield conn
+            ok = True
+        finally:
+            # A connection that raised mid-use may be in an unknown state: drop it
+            if conn is not None:
+                if ok and not _is_closed(conn):
+                    self._idle.put(conn)
+                else:
+                    _close_quietly(conn)
+            self._slots.release()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                _close_quietly(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _is_closed(conn) -> bool:
+    is_closed = getattr(conn, "is_closed", None)
+    return bool(is_closed()) if callable(is_closed) else False
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(params: dict, connect: Optional[Callable] = None, max_size: int = 4) -> ConnectionPool:
+    """
+    Shared pool for one set of connection params (one pool per account/user/db/schema...).
+    connect(**params) opens a connection; defaults to snowflake.connector.connect. Pass a
+    stand-in such as RecordingConnection on first use to exercise callers without Snowflake.
+    """
+    key = tuple(sorted((k, str(v)) for k, v in params.items()))
+    with _POOLS_LOCK:
+        if key not in _POOLS:
+            if connect is None:
+                if not HAS_SNOWFLAKE:
+                    raise RuntimeError("snowflake-connector-python not installed")
+                connect = snowflake.connector.connect
+            _POOLS[key] = ConnectionPool(lambda: connect(**params), max_size=max_size)
+        return _POOLS[key]
+
+
+def snowflake_pool(config: Optional[dict] = None) -> ConnectionPool:
+    """The shared pool for config's connection params, sized by snowflake.pool_size. Every
+    caller (this module, etl/extract_load.py) goes through here, so they share one pool."""
     cfg = config or load_config()
-    sf = cfg.get("snowflake") or {}
-    return snowflake.connector.connect(
-        account=sf.get("account") or os.environ.get("SNOWFLAKE_ACCOUNT"),
-        user=sf.get("user") or os.environ.get("SNOWFLAKE_USER"),
-        password=sf.get("password") or os.environ.get("SNOWFLAKE_PASSWORD"),
-        warehouse=sf.get("warehouse", "ANALYTICS_WH"),
-        database=sf.get("database", "LEARNING_PLATFORM_DW"),
-        schema=sf.get("schema", "ANALYTICS"),
-        role=sf.get("role", "ANALYTICS_ROLE"),
-    )
+    max_size = int((cfg.get("snowflake") or {}).get("pool_size", 4))
+    return get_pool(conn_params(cfg), max_size=max_size)
+
+
+def pooled_conn(config: Optional[dict] = None):
+    """Context manager yielding a pooled connection for config (see snowflake_pool)."""
+    return snowflake_pool(config).connection()
+
+
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close_all()
+        _POOLS.clear()
+
+
+class RecordingCursor:
+    description = None
+
+    def __init__(self, conn: "RecordingConnection"):
+        self._conn = conn
+        self._rows = []
+
+    def execute(self, sql: str, params=None):
+        self._conn.executed.append((sql, params))
+        self._rows = list(self._conn.results.pop(0)) if self._conn.results else []
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        for params in seq_of_params:
+            self._conn.executed.append((sql, params))
+        return self
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size: int = 1) -> list:
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self) -> list:
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingConnection:
+    """
+    Local stand-in for a snowflake.connector connection: records every (sql, params) sent
+    through its cursors in .executed and answers queries from .results (one row list per
+    execute, in order). Accepts and ignores connect() keyword arguments.
+    """
+
+    def __init__(self, **_params):
+        self.executed = []
+        self.results = []
+        self.closed = False
+
+    def cursor(self) -> RecordingCursor:
+        return RecordingCursor(self)
+
+    def commit(self) -> None:
+        pass
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def close(self) -> None:
+        self.closed = True
 
 
 def enable_clustering(conn, table: str, cluster_keys: list) -> None:
@@ -50,15 +213,193 @@ def enable_clustering(conn, table: str, cluster_keys: list) -> None:
     conn.cursor().execute(f"ALTER TABLE {table} CLUSTER BY ({keys})")
 
 
-def query_time_travel(conn, table: str, offset_seconds: int = -3600) -> list:
-    """Query table state as of offset_seconds ago (e.g. -3600 = 1 hour)."""
+def bulk_load_parquet(
+    conn,
+    table: str,
+    files: Iterable[str],
+    stage: str = "etl_stage",
+    file_format: str = "etl_parquet",
+    parallel: int = 4,
+    replace: bool = False,
+) -> None:
+    """
+    Bulk-load local Parquet files into table: PUT each file to an internal stage, create the
+    table from the files' inferred schema if missing, then load them with a single COPY INTO.
+    Files are already compressed internally, so PUT skips gzip (AUTO_COMPRESS = FALSE).
+    replace=True makes files the table's full contents (a full restage): existing rows are
+    deleted in the same transaction as the COPY, which is forced so files whose content was
+    loaded before are not skipped by COPY's load history.
+    """
+    files = [Path(f).resolve() for f in files]
+    if not files:
+        return
+    location = f"@{stage}/{table.lower()}"
     cur = conn.cursor()
-    cur.execute(f"SELECT * FROM {table} AT(OFFSET => {offset_seconds})")
-    return cur.fetchall()
+    cur.execute(f"CREATE FILE FORMAT IF NOT EXISTS {file_format} TYPE = PARQUET")
+    cur.execute(f"CREATE STAGE IF NOT EXISTS {stage} FILE_FORMAT = (FORMAT_NAME = '{file_format}')")
+    for f in files:
+        cur.execute(f"PUT 'file://{f.as_posix()}' {location} PARALLEL = {parallel} AUTO_COMPRESS = FALSE OVERWRITE = TRUE")
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {table} USING TEMPLATE ("
+        f"SELECT ARRAY_AGG(OBJECT_CONSTRUCT(*)) WITHIN GROUP (ORDER BY order_id) "
+        f"FROM TABLE(INFER_SCHEMA(LOCATION => '{location}', FILE_FORMAT => '{file_format}')))"
+    )
+    # COPY accepts at most 1000 explicit file names; fall back to a pattern beyond that
+    if len(files) <= 1000:
+        selector = "FILES = (" + ", ".join(f"'{f.name}'" for f in files) + ")"
+    else:
+        selector = "PATTERN = '.*[.]parquet'"
+    copy = (
+        f"COPY INTO {table} FROM {location} {selector} "
+        f"FILE_FORMAT = (FORMAT_NAME = '{file_format}') MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE PURGE = TRUE"
+    )
+    if not replace:
+        cur.execute(copy)
+        return
+    cur.execute("BEGIN")
+    try:
+        cur.execute(f"DELETE FROM {table}")
+        cur.execute(copy + " FORCE = TRUE")
+        cur.execute("COMMIT")
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+
+
+# Column, VARIANT path (payload:a.b, payload['k']), optional ::cast and AS alias
+_COLUMN_EXPR = re.compile(
+    r"^[A-Za-z_][\w$]*(?::[\w$.]+|\['[\w$ ]+'\])*(?:::\w+)?(?:\s+AS\s+[A-Za-z_][\w$]*)?$",
+    re.IGNORECASE,
+)
+DEFAULT_FETCH_ROWS = 10_000
+
+
+def build_select(
+    table: str,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    at_offset: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> str:
+    """
+    SELECT with column projection and predicate pushed into Snowflake, so only the needed
+    columns/rows leave the warehouse. where is raw SQL and should use %s placeholders for values.
+    """
+    for col in columns or ():
+        if not _COLUMN_EXPR.match(col.strip()):
+            raise ValueError(f"Unsupported column expression: {col!r}")
+    sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table}"
+    if at_offset is not None:
+        sql += f" AT(OFFSET => {int(at_offset)})"
+    if where:
+        sql += f" WHERE {where}"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return sql
+
+
+def iter_query(conn, sql: str, params=None, batch_size: int = DEFAULT_FETCH_ROWS) -> Iterator[tuple]:
+    """Yield result rows while holding at most batch_size of them in memory (fetchmany)."""
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _rebatch(tables: Iterable, batch_size: int) -> Iterator:
+    """Re-chunk pyarrow Tables of any size into batch_size rows (the last may be shorter)."""
+    import pyarrow as pa
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    buffered, size = [], 0
+    for table in tables:
+        if not table.num_rows:
+            continue
+        buffered.append(table)
+        size += table.num_rows
+        while size >= batch_size:
+            combined = buffered[0] if len(buffered) == 1 else pa.concat_tables(buffered)
+            yield combined.slice(0, batch_size)
+            rest = combined.slice(batch_size)
+            buffered, size = ([rest] if rest.num_rows else []), rest.num_rows
+    if buffered:
+        yield buffered[0] if len(buffered) == 1 else pa.concat_tables(buffered)
+
+
+def iter_query_batches(conn, sql: str, params=None, batch_size: int = DEFAULT_FETCH_ROWS, as_: str = "pandas") -> Iterator:
+    """
+    Yield results as pandas DataFrames (as_="pandas") or pyarrow Tables (as_="arrow") of
+    batch_size rows (the last may be shorter). Uses the connector's Arrow result batches when
+    available, re-chunked from Snowflake's result-chunk sizes; otherwise fetchmany(batch_size).
+    """
+    if as_ not in ("pandas", "arrow"):
+        raise ValueError("as_ must be 'pandas' or 'arrow'")
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    native = getattr(cur, "fetch_arrow_batches", None)
+    if native is not None:
+        for table in _rebatch(native(), batch_size):
+            yield table if as_ == "arrow" else table.to_pandas()
+        return
+    import pandas as pd
+    columns = [d[0] for d in cur.description] if cur.description else None
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        if as_ == "arrow":
+            import pyarrow as pa
+            yield pa.Table.from_pandas(df, preserve_index=False)
+        else:
+            yield df
+
+
+def iter_time_travel(
+    conn,
+    table: str,
+    offset_seconds: int = -3600,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    params=None,
+    batch_size: int = DEFAULT_FETCH_ROWS,
+) -> Iterator[tuple]:
+    """Stream table state as of offset_seconds ago, row by row with bounded memory."""
+    return iter_query(conn, build_select(table, columns, where, at_offset=offset_seconds), params, batch_size)
+
+
+def iter_time_travel_batches(
+    conn,
+    table: str,
+    offset_seconds: int = -3600,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    params=None,
+    batch_size: int = DEFAULT_FETCH_ROWS,
+    as_: str = "pandas",
+) -> Iterator:
+    """Stream table state as of offset_seconds ago as DataFrame/Arrow batches."""
+    sql = build_select(table, columns, where, at_offset=offset_seconds)
+    return iter_query_batches(conn, sql, params, batch_size, as_)
+
+
+def query_time_travel(
+    conn,
+    table: str,
+    offset_seconds: int = -3600,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    params=None,
+) -> list:
+    """Query table state as of offset_seconds ago (e.g. -3600 = 1 hour). Loads all rows; use
+    iter_time_travel / iter_time_travel_batches for large tables."""
+    return list(iter_time_travel(conn, table, offset_seconds, columns, where, params))
 
 
 def insert_semi_structured(conn, table: str, payload: dict, id_val: str = None, source_file: str = None) -> None:
-    import json
     cur = conn.cursor()
     cur.execute(
         f"INSERT INTO {table} (id, payload, source_file) SELECT %s, PARSE_JSON(%s), %s",
@@ -66,11 +407,146 @@ def insert_semi_structured(conn, table: str, payload: dict, id_val: str = None,
     )
 
 
-def query_variant(conn, table: str, limit: int = 10) -> list:
-    """Query VARIANT column (e.g. payload:event_type, payload['key'])."""
+def _events_stats(events: int, batches: int, start: float) -> dict:
+    elapsed = time.perf_counter() - start
+    return {
+        "events": events,
+        "batches": batches,
+        "seconds": round(elapsed, 3),
+        "events_per_sec": round(events / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def insert_semi_structured_batch(
+    conn,
+    table: str,
+    payloads: Iterable[dict],
+    id_key: str = "event_id",
+    source_file: str = None,
+    max_rows: int = 1000,
+    max_bytes: int = 900_000,
+) -> dict:
+    """
+    Batched insert_semi_structured: payloads are grouped into multi-row
+    INSERT ... SELECT column1, PARSE_JSON(column2), column3 FROM VALUES (...), (...)
+    statements of at most max_rows rows / max_bytes of JSON (Snowflake caps statement text
+    at 1 MB), so a backfill costs one round-trip per batch instead of per event.
+    Returns stats: events, batches, seconds, events_per_sec.
+    """
     cur = conn.cursor()
-    cur.execute(f"SELECT id, payload, payload:event_type AS event_type FROM {table} LIMIT {limit}")
-    return cur.fetchall()
+    start = time.perf_counter()
+    events = batches = 0
+    rows, params, size = 0, [], 0
+
+    def flush():
+        values = ", ".join(["(%s, %s, %s)"] * rows)
+        cur.execute(
+            f"INSERT INTO {table} (id, payload, source_file) "
+            f"SELECT column1, PARSE_JSON(column2), column3 FROM VALUES {values}",
+            tuple(params),
+        )
+
+    for payload in payloads:
+        doc = json.dumps(payload)
+        if rows and (rows >= max_rows or size + len(doc) > max_bytes):
+            flush()
+            batches += 1
+            rows, params, size = 0, [], 0
+        params.extend((payload.get(id_key), doc, source_file))
+        rows += 1
+        size += len(doc)
+        events += 1
+    if rows:
+        flush()
+        batches += 1
+    return _events_stats(events, batches, start)
+
+
+def stage_semi_structured_ndjson(
+    conn,
+    table: str,
+    payloads: Iterable[dict],
+    id_key: str = "event_id",
+    stage: str = "events_stage",
+    max_file_bytes: int = 64 * 1024 * 1024,
+    source_file: str = None,
+) -> dict:
+    """
+    File-based alternative to insert_semi_structured_batch for large backfills: payloads are
+    written to gzipped NDJSON files of about max_file_bytes (uncompressed), PUT to an internal
+    stage and loaded with one COPY INTO. source_file defaults to the staged file name.
+    """
+    start = time.perf_counter()
+    events = 0
+    prefix = f"{table.lower()}/{int(time.time() * 1000)}"
+    location = f"@{stage}/{prefix}"
+    cur = conn.cursor()
+    cur.execute(f"CREATE STAGE IF NOT EXISTS {stage} FILE_FORMAT = (TYPE = JSON)")
+    with tempfile.TemporaryDirectory() as tmp:
+        files = []
+        out, size = None, 0
+        for payload in payloads:
+            if out is None or size >= max_file_bytes:
+                if out is not None:
+                    out.close()
+                files.append(Path(tmp) / f"events_{len(files):05d}.ndjson.gz")
+                out, size = gzip.open(files[-1], "wt", encoding="utf-8"), 0
+            line = json.dumps(payload) + "\n"
+            out.write(line)
+            size += len(line)
+            events += 1
+        if out is not None:
+            out.close()
+        for f in files:
+            cur.execute(f"PUT 'file://{f.as_posix()}' {location} AUTO_COMPRESS = FALSE SOURCE_COMPRESSION = GZIP")
+    if files:
+        source = "METADATA$FILENAME" if source_file is None else "%s"
+        cur.execute(
+            f"COPY INTO {table} (id, payload, source_file) "
+            f"FROM (SELECT $1:{id_key}::VARCHAR, $1, {source} FROM {location}) "
+            f"FILE_FORMAT = (TYPE = JSON) PURGE = TRUE",
+            None if source_file is None else (source_file,),
+        )
+    return _events_stats(events, len(files), start)
+
+
+VARIANT_COLUMNS = ("id", "payload", "payload:event_type AS event_type")
+
+
+def iter_variant(
+    conn,
+    table: str,
+    columns: Sequence[str] = VARIANT_COLUMNS,
+    where: Optional[str] = None,
+    params=None,
+    batch_size: int = DEFAULT_FETCH_ROWS,
+) -> Iterator[tuple]:
+    """Stream a VARIANT scan; project paths (payload:learner_id) instead of whole payloads where possible."""
+    return iter_query(conn, build_select(table, columns, where), params, batch_size)
+
+
+def iter_variant_batches(
+    conn,
+    table: str,
+    columns: Sequence[str] = VARIANT_COLUMNS,
+    where: Optional[str] = None,
+    params=None,
+    batch_size: int = DEFAULT_FETCH_ROWS,
+    as_: str = "pandas",
+) -> Iterator:
+    return iter_query_batches(conn, build_select(table, columns, where), params, batch_size, as_)
+
+
+def query_variant(
+    conn,
+    table: str,
+    limit: int = 10,
+    columns: Sequence[str] = VARIANT_COLUMNS,
+    where: Optional[str] = None,
+    params=None,
+) -> list:
+    """Query VARIANT column (e.g. payload:event_type, payload['key'])."""
+    return list(iter_query(conn, build_select(table, columns, where, limit=limit), params))
 
 
 if __name__ == "__main__":
@@ -78,10 +554,8 @@ if __name__ == "__main__":
     if not config.get("snowflake") or not config["snowflake"].get("account"):
         print("Set SNOWFLAKE_ACCOUNT, SNOWFLAKE_USER, SNOWFLAKE_PASSWORD to run Snowflake ops.")
     else:
-        conn = get_conn(config)
-        try:
+        with pooled_conn(config) as conn:
             # Example: enable clustering on fact_enrollment
             # enable_clustering(conn, "fact_enrollment", ["enroll_date_key", "course_key"])
             print("Snowflake connection OK.")
-        finally:
-            conn.close()
+        close_pools()
@@ -0,0 +1,204 @@
+import pytest
+
+from snowflake.snowflake_ops import (
+    ConnectionPool, RecordingConnection, _rebatch, bulk_load_parquet, iter_query, iter_query_batches, iter_time_travel,
+)
+
+
+def _statements(conn: RecordingConnection) -> list:
+    return [sql.split(" ")[0] if not sql.startswith("DELETE") else sql for sql, _ in conn.executed]
+
+
+def test_bulk_load_appends_with_one_copy(tmp_path):
+    conn = RecordingConnection()
+    files = [tmp_path / "part-00000.parquet", tmp_path / "part-00001.parquet"]
+
+    bulk_load_parquet(conn, "enrollments", files)
+
+    sqls = [sql for sql, _ in conn.executed]
+    assert [s.split(" ")[0] for s in sqls] == ["CREATE", "CREATE", "PUT", "PUT", "CREATE", "COPY"]
+    assert "FILES = ('part-00000.parquet', 'part-00001.parquet')" in sqls[-1]
+    assert "FORCE" not in sqls[-1]
+
+
+def test_bulk_load_replace_deletes_and_copies_in_one_transaction(tmp_path):
+    conn = RecordingConnection()
+
+    bulk_load_parquet(conn, "enrollments", [tmp_path / "part-00000.parquet"], replace=True)
+
+    assert _statements(conn)[-4:] == ["BEGIN", "DELETE FROM enrollments", "COPY", "COMMIT"]
+    assert conn.executed[-2][0].endswith("FORCE = TRUE")
+
+
+def test_bulk_load_replace_rolls_back_failed_copy(tmp_path):
+    class FailingCopy(RecordingConnection):
+        def cursor(self):
+            cur = super().cursor()
+            execute = cur.execute
+
+            def fail_copy(sql, params=None):
+                execute(sql, params)
+                if sql.startswith("COPY"):
+                    raise RuntimeError("copy failed")
+                return cur
+
+            cur.execute = fail_copy
+            return cur
+
+    conn = FailingCopy()
+    with pytest.raises(RuntimeError):
+        bulk_load_parquet(conn, "enrollments", [tmp_path / "part-00000.parquet"], replace=True)
+
+    assert _statements(conn)[-4:] == ["BEGIN", "DELETE FROM enrollments", "COPY", "ROLLBACK"]
+
+
+def test_bulk_load_without_files_does_nothing():
+    conn = RecordingConnection()
+    bulk_load_parquet(conn, "enrollments", [], replace=True)
+    assert conn.executed == []
+
+
+def test_pool_reuses_healthy_connections_and_drops_failed_ones():
+    opened = []
+
+    def connect():
+        opened.append(RecordingConnection())
+        return opened[-1]
+
+    pool = ConnectionPool(connect, max_size=2)
+    with pool.connection() as conn:
+        pass
+    with pool.connection() as again:
+        assert again is conn
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("mid-use failure")
+
+    assert conn.closed
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert len(opened) == 2
+
+
+class _NativeBatches(RecordingConnection):
+    """Connection whose cursors expose the connector's native batch fetchers."""
+
+    def __init__(self, chunks):
+        super().__init__()
+        self.chunks = chunks
+
+    def cursor(self):
+        import pyarrow as pa
+
+        cur = super().cursor()
+        cur.fetch_arrow_batches = lambda: (pa.table({"id": pa.array(ids, pa.int64())}) for ids in self.chunks)
+        return cur
+
+
+@pytest.mark.parametrize("as_", ["pandas", "arrow"])
+def test_iter_query_batches_rechunks_native_batches(as_):
+    conn = _NativeBatches([list(range(0, 7)), [], list(range(7, 9)), list(range(9, 25))])
+
+    batches = list(iter_query_batches(conn, "SELECT id FROM t", batch_size=5, as_=as_))
+
+    assert [len(b) for b in batches] == [5, 5, 5, 5, 5]
+    ids = [b["id"].tolist() if as_ == "pandas" else b.column("id").to_pylist() for b in batches]
+    assert sum(ids, []) == list(range(25))
+
+
+def test_iter_query_batches_falls_back_to_fetchmany():
+    conn = RecordingConnection()
+    conn.results = [[(i,) for i in range(7)]]
+
+    batches = list(iter_query_batches(conn, "SELECT id FROM t", batch_size=3))
+
+    assert [len(b) for b in batches] == [3, 3, 1]
+
+
+class _CountingCursorConnection(RecordingConnection):
+    """Connection whose cursors record the size of every fetchmany call."""
+
+    def __init__(self):
+        super().__init__()
+        self.fetches = []
+
+    def cursor(self):
+        cur = super().cursor()
+        fetchmany = cur.fetchmany
+        cur.fetchmany = lambda size=1: self.fetches.append(size) or fetchmany(size)
+        return cur
+
+
+def test_iter_query_streams_rows_in_batch_size_fetches():
+    conn = _CountingCursorConnection()
+    conn.results = [[(i,) for i in range(5)]]
+
+    rows = iter_query(conn, "SELECT id FROM t WHERE x = %s", ("y",), batch_size=2)
+
+    assert conn.executed == []
+    assert list(rows) == [(i,) for i in range(5)]
+    assert conn.executed == [("SELECT id FROM t WHERE x = %s", ("y",))]
+    assert conn.fetches == [2, 2, 2, 2]
+
+
+def test_iter_time_travel_selects_at_offset():
+    conn = RecordingConnection()
+    conn.results = [[("L1",)]]
+
+    assert list(iter_time_travel(conn, "dim_learner", -60, columns=["learner_id"])) == [("L1",)]
+    sql = conn.executed[0][0]
+    assert "learner_id" in sql and "dim_learner" in sql and "AT(OFFSET => -60)" in sql
+
+
+def _tables(*sizes):
+    import pyarrow as pa
+
+    start = 0
+    for size in sizes:
+        yield pa.table({"id": pa.array(range(start, start + size), pa.int64())})
+        start += size
+
+
+@pytest.mark.parametrize("sizes, batch_size, expected", [
+    ((), 3, []),
+    ((0, 0), 3, []),
+    ((2,), 5, [2]),
+    ((6,), 3, [3, 3]),
+    ((3, 3), 3, [3, 3]),
+    ((1, 1, 1, 1), 2, [2, 2]),
+    ((7,), 1, [1] * 7),
+    ((4, 0, 5), 3, [3, 3, 3]),
+    ((10,), 4, [4, 4, 2]),
+])
+def test_rebatch_boundaries(sizes, batch_size, expected):
+    batches = list(_rebatch(_tables(*sizes), batch_size))
+
+    assert [b.num_rows for b in batches] == expected
+    assert sum((b.column("id").to_pylist() for b in batches), []) == list(range(sum(sizes)))
+
+
+def test_rebatch_rejects_empty_batches():
+    with pytest.raises(ValueError):
+        list(_rebatch(_tables(3), 0))
+
+
+def test_iter_query_batches_fallback_names_columns_and_builds_arrow():
+    conn = RecordingConnection()
+    conn.results = [[(1, "a"), (2, "b"), (3, "c")]]
+    cursor = conn.cursor
+    conn.cursor = lambda: _described(cursor(), [("ID",), ("NAME",)])
+
+    batches = list(iter_query_batches(conn, "SELECT id, name FROM t", batch_size=2, as_="arrow"))
+
+    assert [b.num_rows for b in batches] == [2, 1]
+    assert batches[0].column_names == ["ID", "NAME"]
+
+
+def _described(cur, description):
+    cur.description = description
+    return cur
+
+
+def test_iter_query_batches_rejects_unknown_output():
+    with pytest.raises(ValueError):
+        next(iter_query_batches(RecordingConnection(), "SELECT 1", as_="polars"))
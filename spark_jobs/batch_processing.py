@@ -2,44 +2,256 @@
 Apache Spark: Batch processing for learning platform data.
 Reads from files/DB, applies transformations, writes to DW (or Parquet).
 """
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
 from pathlib import Path
-from pyspark.sql import SparkSession
+from pyspark.sql import DataFrame, SparkSession
 from pyspark.sql import functions as F
 from pyspark.sql.window import Window
 
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
 
-def get_spark(app_name: str = "LearningPlatformAnalytics", master: str = "local[*]") -> SparkSession:
+from spark_jobs.schemas import ENROLLMENT_SCHEMA, EVENT_SCHEMA, conform  # noqa: E402
+from spark_jobs import session  # noqa: E402
+
+CHECKPOINT_NAME = "_incremental_checkpoint.json"
+# Rough compressed Parquet size of one output row, used to turn a target file size into a row cap
+DEFAULT_BYTES_PER_ROW = 64
+# Directory value Spark writes for a null partition column
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def get_spark(job: str = None, profile: str = None) -> SparkSession:
+    """Session tuned by the spark: profile in config/settings.yaml (see spark_jobs/session.py)."""
+    return session.get_spark(job, profile)
+
+
+def list_input_files(input_path: str, pattern: str = "*.csv") -> dict:
+    """{path: [size, mtime_ns]} for input_path (a file, or files matching pattern in a directory tree)."""
+    p = Path(input_path)
+    files = [p] if p.is_file() else sorted(p.rglob(pattern))
+    return {str(f): [os.stat(f).st_size, os.stat(f).st_mtime_ns] for f in files}
+
+
+def load_checkpoint(path: Path) -> dict:
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_enrollments(spark: SparkSession, paths: list, input_format: str = "csv") -> DataFrame:
+    """Typed enrollment rows from CSV (parsed with ENROLLMENT_SCHEMA, no inference) or Parquet."""
+    if input_format == "parquet":
+        return conform(spark.read.parquet(*paths), ENROLLMENT_SCHEMA)
+    return spark.read.schema(ENROLLMENT_SCHEMA).option("header", "true").csv(paths)
+
+
+def compact_csv_to_parquet(spark: SparkSession, input_path: str, output_path: str, pattern: str = "enrollments*.csv") -> None:
+    """One-time conversion of raw enrollment CSVs to typed Parquet, so later runs read columnar input."""
+    files = sorted(list_input_files(input_path, pattern))
+    if not files:
+        print(f"No files matching {pattern} in {input_path}.")
+        return
+    read_enrollments(spark, files, "csv").write.mode("overwrite").parquet(output_path)
+    print(f"Compacted {len(files)} CSV file(s) into {output_path}")
+
+
+def latest_per_enrollment(df: DataFrame) -> DataFrame:
+    """
+    One row per enrollment_id: the one read last, taking input files in path order and rows in
+    file order - the upsert rule the pandas ETL stages with (etl/validation.py key_column).
+    Rows without an enrollment_id are kept.
+    """
+    ordered = (
+        df.withColumn("_file", F.input_file_name())
+        .withColumn("_block", F.input_file_block_start())
+        .withColumn("_row", F.monotonically_increasing_id())
+    )
+    w = Window.partitionBy("enrollment_id").orderBy(F.col("_file").desc(), F.col("_block").desc(), F.col("_row").desc())
     return (
-        SparkSession.builder
-        .appName(app_name)
-        .master(master)
-        .config("spark.sql.adaptive.enabled", "true")
-        .config("spark.sql.adaptive.coalescePartitions.enabled", "true")
-        .getOrCreate()
+        ordered
+        .withColumn("_rank", F.when(F.col("enrollment_id").isNull(), F.lit(1)).otherwise(F.row_number().over(w)))
+        .filter(F.col("_rank") == 1)
+        .drop("_file", "_block", "_row", "_rank")
     )
 
 
-def batch_enrollments(spark: SparkSession, input_path: str, output_path: str) -> None:
-    df = spark.read.option("header", "true").csv(input_path)
-    df = (
+def _transform_enrollments(df):
+    return (
         df
-        .withColumn("enroll_date", F.to_date(F.col("enroll_date")))
         .withColumn("year", F.year(F.col("enroll_date")))
         .withColumn("month", F.month(F.col("enroll_date")))
-        .withColumn("progress_pct", F.col("progress_pct").cast("double"))
     )
-    # Partitioning: partition by year, month for efficient reads and partition pruning
-    df.write.mode("overwrite").partitionBy("year", "month").parquet(output_path)
 
 
-def batch_events_aggregate(spark: SparkSession, input_path: str, output_path: str) -> None:
-    df = spark.read.parquet(input_path)
-    w = Window.partitionBy("learner_id", "course_id").orderBy(F.col("event_time"))
-    df = (
-        df
-        .withColumn("rn", F.row_number().over(w))
-        .withColumn("event_date", F.to_date(F.col("event_time")))
+def write_partitioned(
+    df: DataFrame,
+    output_path: str,
+    target_file_mb: int = None,
+    bytes_per_row: int = DEFAULT_BYTES_PER_ROW,
+    partition_cols: tuple = ("year", "month"),
+) -> None:
+    """
+    Overwrite-write df partitioned by partition_cols. With target_file_mb, rows are first
+    shuffled by the partition columns so each partition is written by one task, and
+    maxRecordsPerFile splits it into files of roughly target_file_mb - instead of one small file
+    per task per partition.
+    """
+    writer_df = df
+    options = {}
+    if target_file_mb:
+        writer_df = df.repartition(*partition_cols)
+        options["maxRecordsPerFile"] = max(1, int(target_file_mb * 1024 * 1024 // bytes_per_row))
+    writer_df.write.mode("overwrite").options(**options).partitionBy(*partition_cols).parquet(output_path)
+
+
+def batch_enrollments(
+    spark: SparkSession,
+    input_path: str,
+    output_path: str,
+    incremental: bool = False,
+    pattern: str = "*.csv",
+    input_format: str = "csv",
+    target_file_mb: int = None,
+) -> None:
+    """
+    Full mode rewrites the whole output. Incremental mode reads only input files that are new or
+    changed since the last checkpoint and rewrites just the year/month partitions they touch
+    (dynamic partition overwrite), merging with the rows already stored there; rows from the new
+    files replace stored rows with the same enrollment_id. Partitions holding the stored copy of
+    a re-sent enrollment are rewritten too, so a row whose enroll_date moved it to another
+    partition is not left behind in the old one (an old partition left empty is deleted).
+    In both modes an enrollment_id repeated within the files read keeps its last row
+    (latest_per_enrollment).
+    """
+    checkpoint_path = Path(output_path) / CHECKPOINT_NAME
+    current = list_input_files(input_path, pattern)
+    seen = load_checkpoint(checkpoint_path) if incremental else {}
+    has_output = any(Path(output_path).glob("year=*"))
+    new_files = [f for f, sig in current.items() if seen.get(f) != sig]
+    if not new_files:
+        print("No new input files since last checkpoint.")
+        return
+
+    if not incremental or not has_output or set(seen) - set(current):
+        # First run, forced rebuild, or an input was removed: rebuild everything
+        df = _transform_enrollments(latest_per_enrollment(read_enrollments(spark, sorted(current), input_format)))
+        # Partitioning: partition by year, month for efficient reads and partition pruning
+        write_partitioned(df, output_path, target_file_mb)
+    else:
+        new = _transform_enrollments(latest_per_enrollment(read_enrollments(spark, sorted(new_files), input_format)))
+        stored = spark.read.parquet(output_path)
+        ids = new.select("enrollment_id")
+        moved_from = stored.join(ids, "enrollment_id", "left_semi").select("year", "month")
+        touched = [(r.year, r.month) for r in new.select("year", "month").union(moved_from).distinct().collect()]
+        touched_df = F.broadcast(spark.createDataFrame(touched, "year int, month int"))
+        # Null-safe, so rows without an enroll_date are kept when their partition is rewritten
+        in_touched = stored["year"].eqNullSafe(touched_df["year"]) & stored["month"].eqNullSafe(touched_df["month"])
+        existing = stored.join(touched_df, in_touched, "left_semi").join(ids, "enrollment_id", "left_anti")
+        merged = existing.unionByName(new.select(*existing.columns)).persist()
+        written = {(r.year, r.month) for r in merged.select("year", "month").distinct().collect()}
+        # Dynamic mode replaces only partitions present in merged, and only at job commit,
+        # so reading the old rows of those partitions in the same job is safe
+        mode_key = "spark.sql.sources.partitionOverwriteMode"
+        previous = spark.conf.get(mode_key, "static")
+        spark.conf.set(mode_key, "dynamic")
+        try:
+            write_partitioned(merged, output_path, target_file_mb)
+        finally:
+            spark.conf.set(mode_key, previous)
+            merged.unpersist()
+        # Dynamic overwrite never clears a partition it writes no rows to
+        for year, month in set(touched) - written:
+            year, month = (NULL_PARTITION if v is None else v for v in (year, month))
+            shutil.rmtree(Path(output_path) / f"year={year}" / f"month={month}", ignore_errors=True)
+    save_checkpoint(current, checkpoint_path)
+
+
+class StageTimer:
+    """Wall time plus Spark job/stage counts per named phase (via job groups), to check shuffle savings."""
+
+    def __init__(self, spark: SparkSession, prefix: str):
+        self.sc = spark.sparkContext
+        self.prefix = prefix
+        self.timings = {}
+
+    def run(self, name: str, action) -> None:
+        group = f"{self.prefix}:{name}"
+        self.sc.setJobGroup(group, name)
+        start = time.perf_counter()
+        try:
+            action()
+        finally:
+            tracker = self.sc.statusTracker()
+            job_ids = tracker.getJobIdsForGroup(group)
+            stages = sum(len(info.stageIds) for info in (tracker.getJobInfo(j) for j in job_ids) if info)
+            self.timings[name] = {"seconds": round(time.perf_counter() - start, 3), "jobs": len(job_ids), "stages": stages}
+            self.sc.setLocalProperty("spark.jobGroup.id", None)
+            print(f"[{self.prefix}] {name}: {self.timings[name]}")
+
+
+def _sessionize(events: DataFrame, gap_minutes: int) -> DataFrame:
+    """Gap-based learner sessions: a new session starts after gap_minutes without events."""
+    w = Window.partitionBy("learner_id").orderBy("event_time")
+    gap = F.col("event_time").cast("long") - F.lag("event_time").over(w).cast("long")
+    numbered = (
+        events
+        .withColumn("new_session", F.when(gap.isNull() | (gap > gap_minutes * 60), 1).otherwise(0))
+        .withColumn("session_seq", F.sum("new_session").over(w.rowsBetween(Window.unboundedPreceding, Window.currentRow)))
     )
+    return (
+        numbered
+        .groupBy("learner_id", "session_seq")
+        .agg(
+            F.min("event_time").alias("session_start"),
+            F.max("event_time").alias("session_end"),
+            F.count("*").alias("event_count"),
+            F.countDistinct("course_id").alias("course_count"),
+            F.sum("duration_seconds").alias("total_duration_seconds"),
+        )
+        .withColumn("session_id", F.concat_ws("-", "learner_id", "session_seq"))
+        .withColumn("engagement_minutes", F.coalesce(F.col("total_duration_seconds"), F.lit(0)) / 60.0)
+        .withColumn("span_minutes", (F.col("session_end").cast("long") - F.col("session_start").cast("long")) / 60.0)
+        .withColumn("session_date", F.to_date("session_start"))
+        .withColumn("year", F.year("session_date"))
+        .withColumn("month", F.month("session_date"))
+    )
+
+
+def batch_events_aggregate(
+    spark: SparkSession,
+    input_path: str,
+    output_path: str,
+    sessions_output_path: str = None,
+    session_gap_minutes: int = 30,
+    target_file_mb: int = None,
+) -> dict:
+    """
+    Daily learner/course rollup in a single shuffle (the groupBy exchange). With
+    sessions_output_path, events are hash-partitioned by learner_id once and cached; the daily
+    rollup and the learner-session window/aggregation both reuse that partitioning, so the
+    optional sessions cost a sort rather than another shuffle. Returns per-phase timings.
+    """
+    timer = StageTimer(spark, "events")
+    columns = ["learner_id", "course_id", "event_time", "duration_seconds"]
+    df = conform(spark.read.parquet(input_path), EVENT_SCHEMA, columns).withColumn("event_date", F.to_date("event_time"))
+    if sessions_output_path:
+        df = df.repartition("learner_id").persist()
     daily = (
         df
         .groupBy("learner_id", "course_id", "event_date")
@@ -50,15 +262,54 @@ def batch_events_aggregate(spark: SparkSession, input_path: str, output_path: st
     )
     # Partitioning: by date for efficient range queries
     daily = daily.withColumn("year", F.year(F.col("event_date"))).withColumn("month", F.month(F.col("event_date")))
-    daily.write.mode("overwrite").partitionBy("year", "month").parquet(output_path)
+    timer.run("daily_rollup", lambda: write_partitioned(daily, output_path, target_file_mb))
+    if sessions_output_path:
+        sessions = _sessionize(df, session_gap_minutes)
+        timer.run("sessions", lambda: write_partitioned(sessions, sessions_output_path, target_file_mb))
+        df.unpersist()
+    return timer.timings
 
 
 if __name__ == "__main__":
     base = Path(__file__).resolve().parent.parent
-    spark = get_spark()
-    raw = str(base / "data" / "raw")
+    parser = argparse.ArgumentParser(description="Spark batch jobs for learning platform data")
+    parser.add_argument("--full-refresh", action="store_true", help="rebuild all partitions instead of only new input files")
+    parser.add_argument(
+        "--input-format", choices=["auto", "csv", "parquet"], default="auto",
+        help="auto prefers ETL staging Parquet, then compacted Parquet, then raw CSV",
+    )
+    parser.add_argument("--compact-csv", action="store_true", help="convert raw enrollment CSVs to Parquet (data/raw_parquet) and exit")
+    parser.add_argument("--events-input", help="Parquet learning events to roll up into processed/events_daily")
+    parser.add_argument("--sessions", action="store_true", help="also build processed/learner_sessions from --events-input")
+    parser.add_argument("--session-gap-minutes", type=int, default=30)
+    parser.add_argument("--target-file-mb", type=int, help="aim for output Parquet files of about this size")
+    parser.add_argument("--profile", help="spark.profiles entry in config/settings.yaml (default: spark.profile)")
+    args = parser.parse_args()
+    spark = get_spark(profile=args.profile)
+    raw = base / "data" / "raw"
+    staged = base / "data" / "staging" / "enrollments"
+    compacted = base / "data" / "raw_parquet" / "enrollments"
     out = str(base / "data" / "processed")
     Path(out).mkdir(parents=True, exist_ok=True)
-    if Path(raw).exists():
-        batch_enrollments(spark, raw, out + "/enrollments")
+    if args.compact_csv:
+        compact_csv_to_parquet(spark, str(raw), str(compacted))
+    else:
+        sources = [(staged, "parquet", "*.parquet"), (compacted, "parquet", "*.parquet"), (raw, "csv", "enrollments*.csv")]
+        if args.input_format != "auto":
+            sources = [s for s in sources if s[1] == args.input_format]
+        for path, fmt, pattern in sources:
+            if path.exists() and list_input_files(str(path), pattern):
+                batch_enrollments(
+                    spark, str(path), out + "/enrollments",
+                    incremental=not args.full_refresh, pattern=pattern, input_format=fmt,
+                    target_file_mb=args.target_file_mb,
+                )
+                break
+        if args.events_input:
+            batch_events_aggregate(
+                spark, args.events_input, out + "/events_daily",
+                sessions_output_path=out + "/learner_sessions" if args.sessions else None,
+                session_gap_minutes=args.session_gap_minutes,
+                target_file_mb=args.target_file_mb,
+            )
     spark.stop()
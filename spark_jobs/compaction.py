@@ -0,0 +1,130 @@
+"""
+Apache Spark: Small-file compaction for partitioned Parquet output (data/processed, data/stream_output).
+Each leaf partition holding many small files is rewritten as ceil(bytes / target) files and
+swapped in with two directory renames. That is not atomic: a reader listing the table between
+the renames misses the partition, and a crash between them leaves it renamed away, which the
+next run repairs (recover) before compacting.
+Run: python spark_jobs/compaction.py data/processed/enrollments [--target-file-mb 128]
+"""
+import os
+import sys
+import math
+import shutil
+import argparse
+from pathlib import Path
+from pyspark.sql import SparkSession
+
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from spark_jobs.batch_processing import get_spark  # noqa: E402
+
+STREAM_METADATA = "_spark_metadata"
+OLD_SUFFIX = ".old"
+COMPACTING_SUFFIX = ".compacting"
+
+
+def _visible(p: Path) -> bool:
+    return not p.name.startswith(("_", "."))
+
+
+def leaf_partitions(root: Path) -> list:
+    """Directories under root that directly contain Parquet data files."""
+    leaves = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(("_", "."))]
+        if any(f.endswith(".parquet") and not f.startswith(("_", ".")) for f in filenames):
+            leaves.append(Path(dirpath))
+    return sorted(leaves)
+
+
+def partition_files(partition: Path) -> list:
+    return [f for f in partition.iterdir() if f.is_file() and f.suffix == ".parquet" and _visible(f)]
+
+
+def recover(root: Path) -> int:
+    """
+    Repair in-place swaps interrupted by a crash under root. A partition renamed away (.<name>.old
+    with no <name>) is renamed back, a leftover .old next to a swapped-in partition is deleted,
+    and unfinished .<name>.compacting copies are deleted. Returns the number of repairs.
+    """
+    old_dirs, compacting_dirs = [], []
+    for dirpath, dirnames, _ in os.walk(root):
+        for name in dirnames:
+            if name.startswith(".") and name.endswith(OLD_SUFFIX):
+                old_dirs.append(Path(dirpath) / name)
+            elif name.startswith(".") and name.endswith(COMPACTING_SUFFIX):
+                compacting_dirs.append(Path(dirpath) / name)
+        dirnames[:] = [d for d in dirnames if not d.startswith(("_", "."))]
+    for old in old_dirs:
+        partition = old.with_name(old.name[1:-len(OLD_SUFFIX)])
+        if partition.exists():
+            shutil.rmtree(old)
+        else:
+            # The compacted copy may be complete, but the old files are the known-good set
+            os.replace(old, partition)
+            print(f"Restored {partition} from an interrupted compaction")
+    for dest in compacting_dirs:
+        shutil.rmtree(dest)
+    return len(old_dirs) + len(compacting_dirs)
+
+
+def compact_partition(spark: SparkSession, partition: Path, target_bytes: int, output: Path = None) -> tuple:
+    """
+    Rewrite one partition into about target_bytes files. In place (output None), the new files are
+    written to a hidden sibling directory, then the old directory is renamed away and the new one
+    renamed into its place (see recover for a crash in between). Returns (files_before, files_after).
+    """
+    files = partition_files(partition)
+    total = sum(f.stat().st_size for f in files)
+    n_out = max(1, math.ceil(total / target_bytes))
+    if output is None and len(files) <= n_out:
+        return len(files), len(files)
+
+    df = spark.read.parquet(str(partition))
+    dest = output if output is not None else partition.with_name(f".{partition.name}{COMPACTING_SUFFIX}")
+    df.repartition(n_out).write.mode("overwrite").parquet(str(dest))
+    if output is None:
+        old = partition.with_name(f".{partition.name}{OLD_SUFFIX}")
+        os.replace(partition, old)
+        os.replace(dest, partition)
+        shutil.rmtree(old)
+    return len(files), len(partition_files(output if output is not None else partition))
+
+
+def compact(spark: SparkSession, path: str, target_file_mb: int = 128, output_path: str = None) -> dict:
+    """
+    Compact every leaf partition under path; returns {"files_before", "files_after", "partitions"}.
+    Streaming sink output (with _spark_metadata) is only listed through that log, so it must be
+    compacted into a separate output_path rather than in place. Swaps interrupted by an earlier
+    run are repaired first.
+    """
+    root = Path(path)
+    if output_path is None and (root / STREAM_METADATA).exists():
+        raise ValueError(f"{path} is a streaming sink ({STREAM_METADATA}); pass output_path to compact into a copy")
+    if output_path is None:
+        recover(root)
+    target_bytes = target_file_mb * 1024 * 1024
+    before = after = 0
+    leaves = leaf_partitions(root)
+    for partition in leaves:
+        output = Path(output_path) / partition.relative_to(root) if output_path else None
+        b, a = compact_partition(spark, partition, target_bytes, output)
+        before += b
+        after += a
+    report = {"partitions": len(leaves), "files_before": before, "files_after": after}
+    print(f"Compacted {path}: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge small Parquet files within each partition")
+    parser.add_argument("path", help="partitioned Parquet directory, e.g. data/processed/enrollments")
+    parser.add_argument("--target-file-mb", type=int, default=128)
+    parser.add_argument("--output", help="write the compacted copy here instead of compacting in place")
+    parser.add_argument("--profile", help="spark.profiles entry in config/settings.yaml")
+    args = parser.parse_args()
+    spark = get_spark("compaction", profile=args.profile)
+    compact(spark, args.path, args.target_file_mb, args.output)
+    spark.stop()
@@ -0,0 +1,183 @@
+"""
+Apache Spark: Per-micro-batch metrics for the streaming jobs. A StreamingQueryListener records
+input and processed rows/sec, batch duration, state-store memory and watermark delay for every
+progress event to a JSON-lines file (rotated by size, keeping a few backups), and optionally
+serves the latest values in Prometheus text format, so trigger sizing and falling-behind can be
+seen before latency SLAs are missed.
+"""
+import os
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+from pyspark.sql import SparkSession
+from pyspark.sql.streaming import StreamingQueryListener
+
+BASE = Path(__file__).resolve().parent.parent
+DEFAULT_METRICS_PATH = BASE / "data" / "metrics" / "streaming_metrics.jsonl"
+DEFAULT_METRICS_MAX_MB = 50
+DEFAULT_METRICS_BACKUPS = 3
+
+# metric name -> help text, exported per query as learning_stream_<name>{query="..."}
+GAUGES = {
+    "input_rows_per_second": "Rate at which rows arrived at the source",
+    "processed_rows_per_second": "Rate at which the query processed rows",
+    "num_input_rows": "Rows read in the last micro-batch",
+    "batch_duration_ms": "Wall time of the last micro-batch trigger",
+    "state_memory_bytes": "Memory used by all state stores of the query",
+    "state_rows": "Rows held in state stores",
+    "rows_dropped_by_watermark": "Rows dropped as late by the watermark in the last micro-batch",
+    "watermark_delay_seconds": "Batch timestamp minus the event-time watermark",
+}
+
+
+def _parse_ts(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def progress_metrics(progress: dict) -> dict:
+    """Flatten one StreamingQueryProgress (its JSON form) into the values we track."""
+    state_ops = progress.get("stateOperators") or []
+    batch_ts = _parse_ts(progress.get("timestamp"))
+    watermark = _parse_ts((progress.get("eventTime") or {}).get("watermark"))
+    delay = (batch_ts - watermark).total_seconds() if batch_ts and watermark and watermark.year > 1970 else None
+    return {
+        "query": progress.get("name") or progress.get("id"),
+        "batch_id": progress.get("batchId"),
+        "timestamp": progress.get("timestamp"),
+        "num_input_rows": progress.get("numInputRows", 0),
+        "input_rows_per_second": progress.get("inputRowsPerSecond") or 0.0,
+        "processed_rows_per_second": progress.get("processedRowsPerSecond") or 0.0,
+        "batch_duration_ms": (progress.get("durationMs") or {}).get("triggerExecution"),
+        "state_memory_bytes": sum(op.get("memoryUsedBytes", 0) for op in state_ops),
+        "state_rows": sum(op.get("numRowsTotal", 0) for op in state_ops),
+        "rows_dropped_by_watermark": sum(op.get("numRowsDroppedByWatermark", 0) for op in state_ops),
+        "watermark_delay_seconds": delay,
+    }
+
+
+def prometheus_text(latest: dict) -> str:
+    """Latest metrics per query in the Prometheus text exposition format."""
+    lines = []
+    for name, help_text in GAUGES.items():
+        lines.append(f"# HELP learning_stream_{name} {help_text}")
+        lines.append(f"# TYPE learning_stream_{name} gauge")
+        for query, metrics in sorted(latest.items()):
+            if metrics.get(name) is not None:
+                lines.append(f'learning_stream_{name}{{query="{query}"}} {metrics[name]}')
+    return "\n".join(lines) + "\n"
+
+
+def rotate(path: Path, backups: int) -> None:
+    """Shift path to path.1 (path.1 to path.2, ...), keeping at most backups old files."""
+    if backups <= 0:
+        path.unlink(missing_ok=True)
+        return
+    for i in range(backups - 1, 0, -1):
+        older = path.with_name(f"{path.name}.{i}")
+        if older.exists():
+            os.replace(older, path.with_name(f"{path.name}.{i + 1}"))
+    os.replace(path, path.with_name(f"{path.name}.1"))
+
+
+def append_line(path: Path, line: str, max_bytes: Optional[int] = None, backups: int = DEFAULT_METRICS_BACKUPS) -> None:
+    """Append line to path, rotating it first when the line would take it past max_bytes."""
+    if max_bytes and path.exists() and path.stat().st_size + len(line) > max_bytes:
+        rotate(path, backups)
+    with open(path, "a") as f:
+        f.write(line)
+
+
+class StreamingMetricsListener(StreamingQueryListener):
+    """
+    Appends one JSON line per progress event to metrics_path, rotated to metrics_path.1..backups
+    once it would exceed max_mb (None/0: unbounded). With trigger_interval_ms set, a batch that
+    takes longer than the interval, or processes rows slower than they arrive, prints a
+    falling-behind warning.
+    """
+
+    def __init__(
+        self,
+        metrics_path=DEFAULT_METRICS_PATH,
+        trigger_interval_ms: Optional[int] = None,
+        max_mb: Optional[float] = DEFAULT_METRICS_MAX_MB,
+        backups: int = DEFAULT_METRICS_BACKUPS,
+    ):
+        self.metrics_path = Path(metrics_path) if Path(metrics_path).is_absolute() else BASE / metrics_path
+        self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+        self.trigger_interval_ms = trigger_interval_ms
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+        self.backups = backups
+        self.latest = {}
+        self._lock = threading.Lock()
+
+    def onQueryStarted(self, event):
+        print(f"Streaming query started: {event.name or event.id}")
+
+    def onQueryProgress(self, event):
+        metrics = progress_metrics(json.loads(event.progress.json))
+        with self._lock:
+            self.latest[str(metrics["query"])] = metrics
+            append_line(self.metrics_path, json.dumps(metrics) + "\n", self.max_bytes, self.backups)
+        duration = metrics["batch_duration_ms"] or 0
+        behind = self.trigger_interval_ms and duration > self.trigger_interval_ms
+        lagging = metrics["num_input_rows"] and metrics["processed_rows_per_second"] < metrics["input_rows_per_second"]
+        if behind or lagging:
+            print(
+                f"Stream {metrics['query']} falling behind at batch {metrics['batch_id']}: "
+                f"{duration} ms per batch, {metrics['input_rows_per_second']:.0f} rows/s in, "
+                f"{metrics['processed_rows_per_second']:.0f} rows/s processed"
+            )
+
+    def onQueryIdle(self, event):
+        pass
+
+    def onQueryTerminated(self, event):
+        if event.exception:
+            print(f"Streaming query {event.id} failed: {event.exception}")
+
+
+def serve_prometheus(listener: StreamingMetricsListener, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve listener.latest at http://host:port/metrics from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            with listener._lock:
+                body = prometheus_text(listener.latest).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Streaming metrics at http://{host}:{port}/metrics")
+    return server
+
+
+def attach_metrics(
+    spark: SparkSession,
+    metrics_path=DEFAULT_METRICS_PATH,
+    prometheus_port: Optional[int] = None,
+    trigger_interval_ms: Optional[int] = None,
+    max_mb: Optional[float] = DEFAULT_METRICS_MAX_MB,
+    backups: int = DEFAULT_METRICS_BACKUPS,
+) -> StreamingMetricsListener:
+    """Register the listener on spark (before starting queries) and optionally the Prometheus endpoint."""
+    listener = StreamingMetricsListener(metrics_path, trigger_interval_ms, max_mb, backups)
+    spark.streams.addListener(listener)
+    if prometheus_port:
+        serve_prometheus(listener, int(prometheus_port))
+    return listener
@@ -0,0 +1,61 @@
+"""
+Apache Spark: state function for the running mode of spark_jobs/streaming_processing.py. Plain
+pandas (state and event frames in, one row per key out) and free of pyspark imports, so it can be
+exercised without a Spark session.
+"""
+from typing import Iterator
+
+import pandas as pd
+
+RUNNING_STATE_SCHEMA = (
+    "event_count long, total_duration_seconds long, score_sum double, score_count long, max_event_ms long"
+)
+RUNNING_OUTPUT_SCHEMA = (
+    "learner_id string, course_id string, event_count long, total_duration_seconds long, "
+    "avg_score double, last_event_time timestamp, late_events long"
+)
+
+
+def running_state_updater(state_ttl_minutes: float, allowed_lateness_minutes: float):
+    """
+    applyInPandasWithState function keeping fixed-size running totals per (learner_id, course_id).
+    An event older than the key's latest event_time minus allowed lateness (as of earlier batches)
+    is counted in late_events instead of being applied. Keys idle for state_ttl_minutes time out
+    and their state is dropped, which bounds state to recently active learner/course pairs.
+    """
+    ttl_ms = int(state_ttl_minutes * 60_000)
+    lateness_ms = int(allowed_lateness_minutes * 60_000)
+
+    def update(key: tuple, batches: Iterator[pd.DataFrame], state) -> Iterator[pd.DataFrame]:
+        if state.hasTimedOut:
+            state.remove()
+            return
+        count, duration, score_sum, score_count, max_ms = state.get if state.exists else (0, 0, 0.0, 0, None)
+        late = 0
+        batch_max = max_ms
+        for pdf in batches:
+            event_ms = (pd.to_datetime(pdf["event_time"]) - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+            on_time = event_ms >= max_ms - lateness_ms if max_ms is not None else pd.Series(True, index=pdf.index)
+            late += int((~on_time).sum())
+            kept = pdf[on_time]
+            if kept.empty:
+                continue
+            count += len(kept)
+            duration += int(kept["duration_seconds"].fillna(0).sum())
+            score_sum += float(kept["score"].sum())
+            score_count += int(kept["score"].count())
+            kept_max = int(event_ms[on_time].max())
+            batch_max = kept_max if batch_max is None else max(batch_max, kept_max)
+        state.update((count, duration, score_sum, score_count, batch_max))
+        state.setTimeoutDuration(ttl_ms)
+        yield pd.DataFrame({
+            "learner_id": [key[0]],
+            "course_id": [key[1]],
+            "event_count": [count],
+            "total_duration_seconds": [duration],
+            "avg_score": [score_sum / score_count if score_count else None],
+            "last_event_time": [pd.to_datetime(batch_max, unit="ms") if batch_max is not None else pd.NaT],
+            "late_events": [late],
+        })
+
+    return update
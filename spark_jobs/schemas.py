@@ -0,0 +1,51 @@
+"""
+Declared schemas shared by the Spark jobs, so inputs are parsed once into typed columns
+instead of inferred or read as strings and cast later.
+"""
+from pyspark.sql import DataFrame
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    BooleanType,
+    DateType,
+    DoubleType,
+    IntegerType,
+    StringType,
+    StructField,
+    StructType,
+    TimestampType,
+)
+
+
+ENROLLMENT_SCHEMA = StructType([
+    StructField("enrollment_id", StringType()),
+    StructField("learner_id", StringType()),
+    StructField("course_id", StringType()),
+    StructField("instructor_id", StringType()),
+    StructField("enroll_date", DateType()),
+    StructField("progress_pct", DoubleType()),
+    StructField("time_spent_minutes", IntegerType()),
+    StructField("certificate_issued", BooleanType()),
+])
+
+EVENT_SCHEMA = StructType([
+    StructField("event_id", StringType()),
+    StructField("learner_id", StringType()),
+    StructField("course_id", StringType()),
+    StructField("event_time", TimestampType()),
+    StructField("event_type", StringType()),
+    StructField("duration_seconds", IntegerType()),
+    StructField("score", DoubleType()),
+])
+
+
+def conform(df: DataFrame, schema: StructType, columns: list = None) -> DataFrame:
+    """
+    Select (and cast to) the schema's columns, or just `columns` of it. Parquet written by pandas
+    may carry e.g. int64 progress or string dates; selecting only what a job needs also lets the
+    Parquet reader prune the remaining columns.
+    """
+    fields = [f for f in schema.fields if columns is None or f.name in columns]
+    return df.select([
+        (F.col(f.name) if f.name in df.columns else F.lit(None)).cast(f.dataType).alias(f.name)
+        for f in fields
+    ])
@@ -0,0 +1,100 @@
+"""
+Apache Spark: SparkSession factory driven by the spark: section of config/settings.yaml.
+Named profiles (local-dev, single-node-large, cluster) set shuffle partitions, broadcast-join
+threshold, Arrow conversion, Kryo, memory fractions and the streaming checkpoint location.
+Profile: explicit argument, else SPARK_PROFILE env var, else spark.profile in config.
+The application is named spark.app_name, suffixed with the job name (e.g. -streaming).
+"""
+import os
+from pathlib import Path
+from typing import Optional
+
+import yaml
+
+# Optional: pyspark (pip install pyspark); profiles resolve without it
+try:
+    from pyspark.sql import SparkSession
+    HAS_PYSPARK = True
+except ImportError:
+    HAS_PYSPARK = False
+
+BASE = Path(__file__).resolve().parent.parent
+DEFAULT_PROFILE = "local-dev"
+DEFAULT_APP_NAME = "LearningPlatformAnalytics"
+
+# profile key -> (spark conf key, value converter)
+PROFILE_CONF = {
+    "shuffle_partitions": ("spark.sql.shuffle.partitions", str),
+    "broadcast_threshold_mb": ("spark.sql.autoBroadcastJoinThreshold", lambda mb: str(int(mb) * 1024 * 1024)),
+    "arrow_enabled": ("spark.sql.execution.arrow.pyspark.enabled", lambda v: str(bool(v)).lower()),
+    "memory_fraction": ("spark.memory.fraction", str),
+    "storage_fraction": ("spark.memory.storageFraction", str),
+    "driver_memory": ("spark.driver.memory", str),
+    "executor_memory": ("spark.executor.memory", str),
+    "executor_cores": ("spark.executor.cores", str),
+}
+
+
+def load_config() -> dict:
+    config_path = BASE / "config" / "settings.yaml"
+    if not config_path.exists():
+        return {}
+    with open(config_path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def resolve_profile(profile: Optional[str] = None, config: Optional[dict] = None) -> dict:
+    """Base spark: settings overlaid with the selected profile (plus its name under "profile")."""
+    spark_cfg = dict((config if config is not None else load_config()).get("spark") or {})
+    profiles = spark_cfg.pop("profiles", None) or {}
+    name = profile or os.environ.get("SPARK_PROFILE") or spark_cfg.get("profile") or DEFAULT_PROFILE
+    if profiles and name not in profiles:
+        raise ValueError(f"Unknown Spark profile {name!r}; configured: {', '.join(profiles)}")
+    settings = {**spark_cfg, **(profiles.get(name) or {})}
+    settings["profile"] = name
+    return settings
+
+
+def checkpoint_location(settings: dict, query_name: str) -> str:
+    """Per-query checkpoint dir under the profile's checkpoint_location (relative paths are under the repo)."""
+    root = settings.get("checkpoint_location", "data/checkpoints")
+    if "://" not in root and not Path(root).is_absolute():
+        root = str(BASE / root)
+    return f"{root.rstrip('/')}/{query_name}"
+
+
+def app_name(settings: dict, job: Optional[str] = None) -> str:
+    """spark.app_name, suffixed with the job name when one is given."""
+    base = settings.get("app_name") or DEFAULT_APP_NAME
+    return f"{base}-{job}" if job else base
+
+
+def spark_conf(settings: dict) -> dict:
+    """Spark conf for resolved profile settings (everything but the app name and master)."""
+    conf = {
+        "spark.sql.adaptive.enabled": "true",
+        "spark.sql.adaptive.coalescePartitions.enabled": "true",
+    }
+    for key, (conf_key, convert) in PROFILE_CONF.items():
+        if settings.get(key) is not None:
+            conf[conf_key] = convert(settings[key])
+    if settings.get("arrow_enabled"):
+        conf["spark.sql.execution.arrow.pyspark.fallback.enabled"] = "true"
+    if settings.get("kryo"):
+        conf["spark.serializer"] = "org.apache.spark.serializer.KryoSerializer"
+    conf["spark.sql.streaming.checkpointLocation"] = checkpoint_location(settings, "default")
+    for conf_key, value in (settings.get("conf") or {}).items():
+        conf[conf_key] = str(value)
+    return conf
+
+
+def get_spark(job: Optional[str] = None, profile: Optional[str] = None, config: Optional[dict] = None) -> "SparkSession":
+    if not HAS_PYSPARK:
+        raise ImportError("pyspark is not installed: pip install pyspark")
+    settings = resolve_profile(profile, config)
+    builder = SparkSession.builder.appName(app_name(settings, job)).master(settings.get("master", "local[*]"))
+    for conf_key, value in spark_conf(settings).items():
+        builder = builder.config(conf_key, value)
+    spark = builder.getOrCreate()
+    spark.sparkContext.setLogLevel(settings.get("log_level", "WARN"))
+    return spark
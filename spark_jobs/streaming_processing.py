@@ -1,40 +1,116 @@
 """
 Apache Spark: Streaming processing for learning events (e.g. Kafka or file stream).
 Micro-batch: read from a directory or Kafka, aggregate, write to sink.
+Two modes (spark.streaming.mode or --mode):
+  windowed - closed 5-minute windows per learner/course, appended once the watermark passes.
+             Events behind the watermark are dropped without a per-event count; only Spark's
+             rows_dropped_by_watermark metric (spark_jobs/metrics.py) shows them.
+  running  - per learner/course running totals updated every trigger, with TTL-bounded state
+             and a side output of late events that were not applied.
 """
+import sys
+import argparse
 from pathlib import Path
-from pyspark.sql import SparkSession
+from typing import Optional
+
+from pyspark.sql import DataFrame, SparkSession
 from pyspark.sql import functions as F
-from pyspark.sql.types import StructType, StructField, StringType, IntegerType, TimestampType, DoubleType
-
-
-EVENT_SCHEMA = StructType([
-    StructField("event_id", StringType()),
-    StructField("learner_id", StringType()),
-    StructField("course_id", StringType()),
-    StructField("event_time", TimestampType()),
-    StructField("event_type", StringType()),
-    StructField("duration_seconds", IntegerType()),
-    StructField("score", DoubleType()),
-])
-
-
-def get_spark() -> SparkSession:
-    return (
-        SparkSession.builder
-        .appName("LearningPlatformStreaming")
-        .master("local[*]")
-        .config("spark.sql.streaming.checkpointLocation", "/tmp/learning_platform_checkpoint")
-        .getOrCreate()
-    )
 
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
 
-def stream_from_directory(spark: SparkSession, input_dir: str, output_dir: str) -> None:
-    df = (
-        spark.readStream
-        .schema(EVENT_SCHEMA)
-        .json(input_dir)
-    )
+from spark_jobs.schemas import EVENT_SCHEMA  # noqa: E402
+from spark_jobs import session  # noqa: E402
+from spark_jobs.running_state import RUNNING_OUTPUT_SCHEMA, RUNNING_STATE_SCHEMA, running_state_updater  # noqa: E402
+from spark_jobs.metrics import (  # noqa: E402
+    DEFAULT_METRICS_BACKUPS, DEFAULT_METRICS_MAX_MB, DEFAULT_METRICS_PATH, attach_metrics,
+)
+
+
+STREAMING_DEFAULTS = {
+    "mode": "windowed",
+    "trigger_interval": "30 seconds",
+    "max_files_per_trigger": 100,
+    "output_files_per_batch": 1,
+    "state_ttl_minutes": 120,
+    "allowed_lateness_minutes": 10,
+    "state_store": "hdfs",
+    "metrics_path": str(DEFAULT_METRICS_PATH),
+    "metrics_max_mb": DEFAULT_METRICS_MAX_MB,
+    "metrics_backups": DEFAULT_METRICS_BACKUPS,
+    "metrics_port": None,
+}
+INTERVAL_UNITS_MS = {"ms": 1, "millisecond": 1, "second": 1000, "minute": 60_000, "hour": 3_600_000}
+
+
+def get_spark(profile: str = None) -> SparkSession:
+    spark = session.get_spark("streaming", profile)
+    if streaming_settings(profile)["state_store"] == "rocksdb":
+        # Keeps keyed state off the JVM heap (Spark 3.2+), so state size is bounded by disk, not memory
+        spark.conf.set(
+            "spark.sql.streaming.stateStore.providerClass",
+            "org.apache.spark.sql.execution.streaming.state.RocksDBStateStoreProvider",
+        )
+    return spark
+
+
+def streaming_settings(profile: Optional[str] = None) -> dict:
+    """spark.streaming from config/settings.yaml (profile overrides applied) over STREAMING_DEFAULTS."""
+    return {**STREAMING_DEFAULTS, **(session.resolve_profile(profile).get("streaming") or {})}
+
+
+def interval_ms(interval: Optional[str]) -> Optional[int]:
+    """'30 seconds' / '2 minutes' / '500 ms' -> milliseconds (None if unset or unparseable)."""
+    if not interval:
+        return None
+    amount, _, unit = str(interval).strip().partition(" ")
+    unit = unit.strip().lower() or "second"
+    factor = INTERVAL_UNITS_MS.get(unit if unit == "ms" else unit.rstrip("s"))
+    try:
+        return int(float(amount) * factor) if factor else None
+    except ValueError:
+        return None
+
+
+def metrics_options(settings: dict, metrics_port: Optional[int] = None, trigger_interval: Optional[str] = None) -> dict:
+    """attach_metrics keyword arguments from streaming_settings(); CLI values win over the config."""
+    return {
+        "metrics_path": settings["metrics_path"],
+        "prometheus_port": metrics_port or settings["metrics_port"],
+        "trigger_interval_ms": interval_ms(trigger_interval or settings["trigger_interval"]),
+        "max_mb": settings["metrics_max_mb"],
+        "backups": int(settings["metrics_backups"]),
+    }
+
+
+def read_events(spark: SparkSession, input_dir: str, max_files_per_trigger: Optional[int] = None) -> DataFrame:
+    reader = spark.readStream.schema(EVENT_SCHEMA)
+    if max_files_per_trigger:
+        reader = reader.option("maxFilesPerTrigger", int(max_files_per_trigger))
+    return reader.json(input_dir)
+
+
+def stream_from_directory(
+    spark: SparkSession,
+    input_dir: str,
+    output_dir: str,
+    output_files_per_batch: int = 1,
+    checkpoint_dir: str = None,
+    trigger_interval: Optional[str] = None,
+    max_files_per_trigger: Optional[int] = None,
+    profile: Optional[str] = None,
+) -> None:
+    """output_files_per_batch caps the Parquet files written per micro-batch (one per shuffle
+    partition otherwise) with a repartition before the sink, so the stateful aggregation keeps its
+    shuffle parallelism (a coalesce would collapse it into that many tasks). Run
+    spark_jobs/compaction.py with --output to merge older batches.
+    checkpoint_dir defaults to <checkpoint_location of profile>/event_windows; pass the profile
+    the session was built with. Late events are not written out in this mode: the watermark drops
+    them, and the metrics listener's rows_dropped_by_watermark counts them after Spark's partial
+    aggregation (so per window group, not per event). Use the running mode for exact counts."""
+    checkpoint_dir = checkpoint_dir or session.checkpoint_location(session.resolve_profile(profile), "event_windows")
+    df = read_events(spark, input_dir, max_files_per_trigger)
     aggregated = (
         df
         .withWatermark("event_time", "10 minutes")
@@ -44,23 +120,123 @@ def stream_from_directory(spark: SparkSession, input_dir: str, output_dir: str)
             F.sum("duration_seconds").alias("total_duration_seconds"),
         )
     )
-    query = (
+    writer = (
         aggregated
+        .repartition(output_files_per_batch)
         .writeStream
+        .queryName("event_windows")
         .outputMode("append")
         .format("parquet")
         .option("path", output_dir)
-        .option("checkpointLocation", "/tmp/learning_platform_checkpoint")
-        .start()
+        .option("checkpointLocation", checkpoint_dir)
     )
+    if trigger_interval:
+        writer = writer.trigger(processingTime=trigger_interval)
+    query = writer.start()
     query.awaitTermination()
 
 
+def stream_running_aggregates(
+    spark: SparkSession,
+    input_dir: str,
+    output_dir: str,
+    late_output_dir: str,
+    checkpoint_dir: str = None,
+    trigger_interval: str = "30 seconds",
+    max_files_per_trigger: Optional[int] = 100,
+    state_ttl_minutes: float = 120,
+    allowed_lateness_minutes: float = 10,
+    output_files_per_batch: int = 1,
+    profile: Optional[str] = None,
+):
+    """
+    Running per-learner/per-course totals (event_count, total_duration_seconds, avg_score) in update
+    mode. Each trigger appends the changed keys to output_dir tagged with batch_id (latest batch_id
+    per key is the current value), and one row per batch with the late-event count to late_output_dir.
+    checkpoint_dir defaults to <checkpoint_location of profile>/running_aggregates.
+    Returns the started query.
+    """
+    checkpoint_dir = checkpoint_dir or session.checkpoint_location(session.resolve_profile(profile), "running_aggregates")
+    from pyspark.sql.streaming.state import GroupStateTimeout
+
+    running = (
+        read_events(spark, input_dir, max_files_per_trigger)
+        .where(F.col("learner_id").isNotNull() & F.col("course_id").isNotNull() & F.col("event_time").isNotNull())
+        .select("learner_id", "course_id", "event_time", "duration_seconds", "score")
+        .groupBy("learner_id", "course_id")
+        .applyInPandasWithState(
+            running_state_updater(state_ttl_minutes, allowed_lateness_minutes),
+            outputStructType=RUNNING_OUTPUT_SCHEMA,
+            stateStructType=RUNNING_STATE_SCHEMA,
+            outputMode="Update",
+            timeoutConf=GroupStateTimeout.ProcessingTimeTimeout,
+        )
+    )
+
+    def write_batch(batch: DataFrame, batch_id: int) -> None:
+        batch = batch.withColumn("batch_id", F.lit(batch_id)).persist()
+        (
+            batch.drop("late_events")
+            .repartition(output_files_per_batch)
+            .write.mode("append")
+            .parquet(output_dir)
+        )
+        (
+            batch.agg(F.coalesce(F.sum("late_events"), F.lit(0)).alias("late_events"))
+            .select(F.lit(batch_id).alias("batch_id"), F.current_timestamp().alias("processed_at"), "late_events")
+            .coalesce(1)
+            .write.mode("append")
+            .parquet(late_output_dir)
+        )
+        batch.unpersist()
+
+    writer = (
+        running.writeStream
+        .queryName("running_aggregates")
+        .outputMode("update")
+        .foreachBatch(write_batch)
+        .option("checkpointLocation", checkpoint_dir)
+    )
+    if trigger_interval:
+        writer = writer.trigger(processingTime=trigger_interval)
+    return writer.start()
+
+
 if __name__ == "__main__":
     base = Path(__file__).resolve().parent.parent
-    spark = get_spark()
-    stream_from_directory(
-        spark,
-        str(base / "data" / "stream_input"),
-        str(base / "data" / "stream_output"),
-    )
+    parser = argparse.ArgumentParser(description="Spark streaming aggregation of learning events")
+    parser.add_argument("--profile", help="spark.profiles entry in config/settings.yaml (default: spark.profile)")
+    parser.add_argument("--mode", choices=["windowed", "running"], help="default: spark.streaming.mode")
+    parser.add_argument("--trigger-interval", help='processing-time trigger, e.g. "10 seconds"')
+    parser.add_argument("--max-files-per-trigger", type=int)
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus text metrics on this port")
+    args = parser.parse_args()
+    settings = streaming_settings(args.profile)
+    trigger_interval = args.trigger_interval or settings["trigger_interval"]
+    max_files = args.max_files_per_trigger or settings["max_files_per_trigger"]
+    spark = get_spark(args.profile)
+    attach_metrics(spark, **metrics_options(settings, args.metrics_port, trigger_interval))
+    if (args.mode or settings["mode"]) == "running":
+        query = stream_running_aggregates(
+            spark,
+            str(base / "data" / "stream_input"),
+            str(base / "data" / "stream_output" / "running"),
+            str(base / "data" / "stream_output" / "late_events"),
+            trigger_interval=trigger_interval,
+            max_files_per_trigger=max_files,
+            state_ttl_minutes=settings["state_ttl_minutes"],
+            allowed_lateness_minutes=settings["allowed_lateness_minutes"],
+            output_files_per_batch=settings["output_files_per_batch"],
+            profile=args.profile,
+        )
+        query.awaitTermination()
+    else:
+        stream_from_directory(
+            spark,
+            str(base / "data" / "stream_input"),
+            str(base / "data" / "stream_output"),
+            output_files_per_batch=settings["output_files_per_batch"],
+            trigger_interval=trigger_interval,
+            max_files_per_trigger=max_files,
+            profile=args.profile,
+        )
@@ -0,0 +1,67 @@
+import pytest
+
+pytest.importorskip("pyspark")
+
+from spark_jobs.batch_processing import batch_enrollments  # noqa: E402
+from spark_jobs.session import get_spark  # noqa: E402
+
+HEADER = "enrollment_id,learner_id,course_id,instructor_id,enroll_date,progress_pct,time_spent_minutes,certificate_issued\n"
+
+
+@pytest.fixture(scope="module")
+def spark():
+    spark = get_spark("batch-processing-tests", config={"spark": {"master": "local[1]", "shuffle_partitions": 1}})
+    yield spark
+    spark.stop()
+
+
+def _rows(spark, output):
+    df = spark.read.parquet(str(output))
+    return sorted((r.enrollment_id, r.year, r.month) for r in df.select("enrollment_id", "year", "month").collect())
+
+
+def test_incremental_run_moves_a_row_whose_partition_changed(spark, tmp_path):
+    raw, output = tmp_path / "raw", tmp_path / "out"
+    raw.mkdir()
+    (raw / "enrollments_1.csv").write_text(
+        HEADER + "E1,L1,C1,I1,2024-01-10,10,5,false\nE2,L2,C1,I1,2024-02-10,20,5,false\n"
+    )
+    batch_enrollments(spark, str(raw), str(output), incremental=True)
+
+    # E2 is re-sent with a March date; its February copy (the only row there) must go
+    (raw / "enrollments_2.csv").write_text(HEADER + "E2,L2,C1,I1,2024-03-01,40,9,false\n")
+    batch_enrollments(spark, str(raw), str(output), incremental=True)
+
+    assert _rows(spark, output) == [("E1", 2024, 1), ("E2", 2024, 3)]
+    assert not (output / "year=2024" / "month=2").exists()
+
+
+def test_incremental_run_keeps_other_rows_of_the_old_partition(spark, tmp_path):
+    raw, output = tmp_path / "raw", tmp_path / "out"
+    raw.mkdir()
+    (raw / "enrollments_1.csv").write_text(
+        HEADER + "E1,L1,C1,I1,2024-01-10,10,5,false\nE2,L2,C1,I1,2024-01-20,20,5,false\n"
+    )
+    batch_enrollments(spark, str(raw), str(output), incremental=True)
+
+    (raw / "enrollments_2.csv").write_text(HEADER + "E2,L2,C1,I1,2024-04-01,40,9,false\n")
+    batch_enrollments(spark, str(raw), str(output), incremental=True)
+
+    assert _rows(spark, output) == [("E1", 2024, 1), ("E2", 2024, 4)]
+
+
+def test_last_row_per_enrollment_wins_across_and_within_files(spark, tmp_path):
+    raw, output = tmp_path / "raw", tmp_path / "out"
+    raw.mkdir()
+    (raw / "enrollments_1.csv").write_text(
+        HEADER + "E1,L1,C1,I1,2024-01-10,10,5,false\nE2,L2,C1,I1,2024-01-20,20,5,false\n"
+    )
+    (raw / "enrollments_2.csv").write_text(
+        HEADER + "E2,L2,C1,I1,2024-02-01,30,5,false\nE2,L2,C1,I1,2024-02-02,35,5,false\n,L3,C1,I1,2024-02-03,1,1,false\n"
+    )
+
+    batch_enrollments(spark, str(raw), str(output))
+
+    df = spark.read.parquet(str(output))
+    rows = sorted((r.enrollment_id or "", r.progress_pct) for r in df.collect())
+    assert rows == [("", 1.0), ("E1", 10.0), ("E2", 35.0)]
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("pyspark")
+
+from spark_jobs.compaction import leaf_partitions, recover  # noqa: E402
+
+
+def _partition(root, name, files=("part-0.parquet",)):
+    path = root / name
+    path.mkdir(parents=True)
+    for f in files:
+        (path / f).write_bytes(b"data")
+    return path
+
+
+def test_recover_restores_partition_renamed_away(tmp_path):
+    _partition(tmp_path / "year=2024", ".month=1.old", ("part-0.parquet", "part-1.parquet"))
+    _partition(tmp_path / "year=2024", ".month=1.compacting")
+
+    assert recover(tmp_path) == 2
+
+    restored = tmp_path / "year=2024" / "month=1"
+    assert sorted(f.name for f in restored.iterdir()) == ["part-0.parquet", "part-1.parquet"]
+    assert sorted(p.name for p in (tmp_path / "year=2024").iterdir()) == ["month=1"]
+    assert leaf_partitions(tmp_path) == [restored]
+
+
+def test_recover_drops_old_copy_after_completed_swap(tmp_path):
+    _partition(tmp_path, "month=1", ("part-compacted.parquet",))
+    _partition(tmp_path, ".month=1.old", ("part-0.parquet", "part-1.parquet"))
+
+    assert recover(tmp_path) == 1
+
+    assert [p.name for p in tmp_path.iterdir()] == ["month=1"]
+    assert [f.name for f in (tmp_path / "month=1").iterdir()] == ["part-compacted.parquet"]
+
+
+def test_recover_leaves_clean_tree_alone(tmp_path):
+    _partition(tmp_path, "month=1")
+
+    assert recover(tmp_path) == 0
+    assert leaf_partitions(tmp_path) == [tmp_path / "month=1"]
@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("pyspark")
+
+from spark_jobs.metrics import append_line, progress_metrics, prometheus_text  # noqa: E402
+
+
+def test_append_line_rotates_and_keeps_backups(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    for i in range(8):
+        append_line(path, f"{i:09d}\n", max_bytes=25, backups=2)
+
+    # Each file holds two 10-byte lines; the oldest pair has been dropped
+    assert path.read_text() == "000000006\n000000007\n"
+    assert (tmp_path / "metrics.jsonl.1").read_text() == "000000004\n000000005\n"
+    assert (tmp_path / "metrics.jsonl.2").read_text() == "000000002\n000000003\n"
+    assert not (tmp_path / "metrics.jsonl.3").exists()
+
+
+def test_append_line_without_limit_never_rotates(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    for _ in range(50):
+        append_line(path, "x" * 100 + "\n")
+
+    assert len(path.read_text().splitlines()) == 50
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_progress_metrics_and_prometheus_text():
+    progress = {
+        "name": "event_windows", "batchId": 7, "timestamp": "2024-03-01T10:00:30.000Z", "numInputRows": 120,
+        "inputRowsPerSecond": 40.0, "processedRowsPerSecond": 60.0, "durationMs": {"triggerExecution": 1500},
+        "eventTime": {"watermark": "2024-03-01T09:50:00.000Z"},
+        "stateOperators": [{"memoryUsedBytes": 1024, "numRowsTotal": 10, "numRowsDroppedByWatermark": 3}],
+    }
+
+    metrics = progress_metrics(progress)
+
+    assert metrics["rows_dropped_by_watermark"] == 3
+    assert metrics["watermark_delay_seconds"] == 630.0
+    text = prometheus_text({"event_windows": metrics})
+    assert 'learning_stream_batch_duration_ms{query="event_windows"} 1500' in text
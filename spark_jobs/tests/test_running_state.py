@@ -0,0 +1,59 @@
+import pandas as pd
+
+from spark_jobs.running_state import running_state_updater
+
+
+class FakeGroupState:
+    """The parts of pyspark's GroupState the updater uses."""
+
+    def __init__(self):
+        self.value, self.timeout_ms, self.removed, self.hasTimedOut = None, None, False, False
+
+    @property
+    def exists(self) -> bool:
+        return self.value is not None
+
+    @property
+    def get(self) -> tuple:
+        return self.value
+
+    def update(self, value: tuple) -> None:
+        self.value = value
+
+    def remove(self) -> None:
+        self.value, self.removed = None, True
+
+    def setTimeoutDuration(self, ms: int) -> None:
+        self.timeout_ms = ms
+
+
+def _events(*rows):
+    return pd.DataFrame(rows, columns=["event_time", "duration_seconds", "score"])
+
+
+def test_running_totals_carry_across_micro_batches_and_count_late_events():
+    update = running_state_updater(state_ttl_minutes=60, allowed_lateness_minutes=10)
+    state, key = FakeGroupState(), ("L1", "C1")
+
+    first = pd.concat(update(key, iter([_events(("2024-03-01 10:00", 60, 80.0), ("2024-03-01 10:20", 30, None))]), state))
+    assert first.iloc[0][["event_count", "total_duration_seconds", "avg_score", "late_events"]].tolist() == [2, 90, 80.0, 0]
+    assert first.iloc[0]["last_event_time"] == pd.Timestamp("2024-03-01 10:20")
+    assert state.timeout_ms == 60 * 60_000
+
+    # 10:05 is more than 10 minutes behind the 10:20 seen so far, so it is counted, not applied
+    second = pd.concat(update(key, iter([_events(("2024-03-01 10:05", 500, 0.0), ("2024-03-01 10:15", 10, 60.0))]), state))
+    row = second.iloc[0]
+    assert (row["learner_id"], row["course_id"]) == key
+    assert row[["event_count", "total_duration_seconds", "avg_score", "late_events"]].tolist() == [3, 100, 70.0, 1]
+    assert row["last_event_time"] == pd.Timestamp("2024-03-01 10:20")
+    assert state.get[:4] == (3, 100, 140.0, 2)
+
+
+def test_timed_out_key_drops_its_state_and_emits_nothing():
+    update = running_state_updater(state_ttl_minutes=1, allowed_lateness_minutes=0)
+    state = FakeGroupState()
+    list(update(("L1", "C1"), iter([_events(("2024-03-01 10:00", 1, 1.0))]), state))
+
+    state.hasTimedOut = True
+    assert list(update(("L1", "C1"), iter([]), state)) == []
+    assert state.removed and not state.exists
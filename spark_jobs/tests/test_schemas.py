@@ -0,0 +1,55 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+from pyspark.sql.types import DateType, DoubleType, IntegerType  # noqa: E402
+
+from spark_jobs.schemas import ENROLLMENT_SCHEMA, EVENT_SCHEMA, conform  # noqa: E402
+from spark_jobs.session import get_spark  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def spark():
+    spark = get_spark("schemas-tests", config={"spark": {"master": "local[1]", "shuffle_partitions": 1}})
+    yield spark
+    spark.stop()
+
+
+def test_conform_casts_pandas_written_types(spark):
+    # pandas-written Parquet may carry int64 progress and string dates
+    df = spark.createDataFrame(
+        [("E1", "L1", "C1", "I1", "2024-01-10", 40, 5, True)],
+        "enrollment_id string, learner_id string, course_id string, instructor_id string, "
+        "enroll_date string, progress_pct long, time_spent_minutes long, certificate_issued boolean",
+    )
+
+    out = conform(df, ENROLLMENT_SCHEMA)
+
+    assert out.schema == ENROLLMENT_SCHEMA
+    row = out.first()
+    assert row.enroll_date == datetime.date(2024, 1, 10)
+    assert row.progress_pct == 40.0
+
+
+def test_conform_fills_missing_columns_with_typed_nulls(spark):
+    df = spark.createDataFrame([("V1", "L1", "C1", "video_play")], "event_id string, learner_id string, "
+                               "course_id string, event_type string")
+
+    out = conform(df, EVENT_SCHEMA)
+
+    assert out.columns == [f.name for f in EVENT_SCHEMA.fields]
+    assert isinstance(out.schema["duration_seconds"].dataType, IntegerType)
+    assert isinstance(out.schema["score"].dataType, DoubleType)
+    row = out.first()
+    assert row.duration_seconds is None and row.score is None and row.event_time is None
+
+
+def test_conform_projects_requested_columns_in_schema_order(spark):
+    df = spark.createDataFrame([("E1", "2024-01-10", "extra")], "enrollment_id string, enroll_date string, junk string")
+
+    out = conform(df, ENROLLMENT_SCHEMA, columns=["enroll_date", "enrollment_id"])
+
+    assert out.columns == ["enrollment_id", "enroll_date"]
+    assert isinstance(out.schema["enroll_date"].dataType, DateType)
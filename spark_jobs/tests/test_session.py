@@ -0,0 +1,63 @@
+import pytest
+
+from spark_jobs import session
+
+ADAPTIVE = {"spark.sql.adaptive.enabled": "true", "spark.sql.adaptive.coalescePartitions.enabled": "true"}
+ARROW = {"spark.sql.execution.arrow.pyspark.enabled": "true", "spark.sql.execution.arrow.pyspark.fallback.enabled": "true"}
+KRYO = {"spark.serializer": "org.apache.spark.serializer.KryoSerializer"}
+LOCAL_CHECKPOINTS = str(session.BASE / "data" / "checkpoints" / "default")
+
+
+@pytest.mark.parametrize("profile, master, expected", [
+    ("local-dev", "local[*]", {
+        **ADAPTIVE, **ARROW,
+        "spark.sql.shuffle.partitions": "8",
+        "spark.sql.autoBroadcastJoinThreshold": str(10 * 1024 * 1024),
+        "spark.driver.memory": "2g",
+        "spark.sql.streaming.checkpointLocation": LOCAL_CHECKPOINTS,
+    }),
+    ("single-node-large", "local[*]", {
+        **ADAPTIVE, **ARROW, **KRYO,
+        "spark.sql.shuffle.partitions": "64",
+        "spark.sql.autoBroadcastJoinThreshold": str(64 * 1024 * 1024),
+        "spark.memory.fraction": "0.7",
+        "spark.memory.storageFraction": "0.4",
+        "spark.driver.memory": "24g",
+        "spark.sql.streaming.checkpointLocation": LOCAL_CHECKPOINTS,
+    }),
+    ("cluster", "yarn", {
+        **ADAPTIVE, **ARROW, **KRYO,
+        "spark.sql.shuffle.partitions": "400",
+        "spark.sql.autoBroadcastJoinThreshold": str(128 * 1024 * 1024),
+        "spark.memory.fraction": "0.6",
+        "spark.memory.storageFraction": "0.5",
+        "spark.executor.memory": "8g",
+        "spark.executor.cores": "4",
+        "spark.sql.streaming.checkpointLocation": "hdfs:///checkpoints/learning_platform/default",
+    }),
+])
+def test_configured_profiles_produce_their_spark_conf(profile, master, expected):
+    settings = session.resolve_profile(profile, session.load_config())
+
+    assert settings["profile"] == profile and settings["master"] == master
+    assert session.spark_conf(settings) == expected
+
+
+def test_profile_comes_from_argument_then_env_then_config(monkeypatch):
+    config = {"spark": {"profile": "a", "profiles": {"a": {"shuffle_partitions": 1}, "b": {"shuffle_partitions": 2}}}}
+    monkeypatch.delenv("SPARK_PROFILE", raising=False)
+    assert session.resolve_profile(None, config)["shuffle_partitions"] == 1
+    monkeypatch.setenv("SPARK_PROFILE", "b")
+    assert session.resolve_profile(None, config)["shuffle_partitions"] == 2
+    assert session.resolve_profile("a", config)["shuffle_partitions"] == 1
+    with pytest.raises(ValueError, match="Unknown Spark profile 'c'"):
+        session.resolve_profile("c", config)
+
+
+def test_app_name_and_extra_conf_come_from_config():
+    settings = session.resolve_profile(None, {"spark": {"app_name": "Analytics", "conf": {"spark.ui.enabled": False}}})
+
+    assert session.app_name(settings) == "Analytics"
+    assert session.app_name(settings, "streaming") == "Analytics-streaming"
+    assert session.app_name({}, "streaming") == f"{session.DEFAULT_APP_NAME}-streaming"
+    assert session.spark_conf(settings)["spark.ui.enabled"] == "False"
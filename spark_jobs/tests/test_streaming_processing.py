@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("pyspark")
+
+from spark_jobs import session  # noqa: E402
+from spark_jobs import streaming_processing as sp  # noqa: E402
+from spark_jobs.metrics import attach_metrics  # noqa: E402
+
+
+class _FakeStreams:
+    def __init__(self):
+        self.listeners = []
+
+    def addListener(self, listener):
+        self.listeners.append(listener)
+
+
+class _FakeSpark:
+    def __init__(self):
+        self.streams = _FakeStreams()
+
+
+def _settings(monkeypatch, streaming):
+    monkeypatch.setattr(session, "resolve_profile", lambda profile=None: {"streaming": streaming})
+    return sp.streaming_settings()
+
+
+def test_metrics_defaults_reach_the_listener(monkeypatch, tmp_path):
+    settings = _settings(monkeypatch, {"metrics_path": str(tmp_path / "m.jsonl")})
+    spark = _FakeSpark()
+
+    listener = attach_metrics(spark, **sp.metrics_options(settings))
+
+    assert spark.streams.listeners == [listener]
+    assert listener.metrics_path == tmp_path / "m.jsonl"
+    assert listener.max_bytes == sp.STREAMING_DEFAULTS["metrics_max_mb"] * 1024 * 1024
+    assert listener.backups == sp.STREAMING_DEFAULTS["metrics_backups"]
+    assert listener.trigger_interval_ms == 30_000
+
+
+def test_metrics_settings_and_cli_overrides(monkeypatch, tmp_path):
+    settings = _settings(monkeypatch, {
+        "metrics_path": str(tmp_path / "m.jsonl"), "metrics_max_mb": None, "metrics_backups": "5", "metrics_port": 9108,
+    })
+
+    options = sp.metrics_options(settings, metrics_port=9200, trigger_interval="2 minutes")
+    listener = attach_metrics(_FakeSpark(), **{**options, "prometheus_port": None})
+
+    assert options["prometheus_port"] == 9200
+    assert sp.metrics_options(settings)["prometheus_port"] == 9108
+    assert listener.max_bytes is None
+    assert listener.backups == 5
+    assert listener.trigger_interval_ms == 120_000
+
+
+@pytest.mark.parametrize("interval, expected", [
+    ("30 seconds", 30_000), ("500 ms", 500), ("1 minute", 60_000), ("2", 2000), (None, None), ("soon", None),
+])
+def test_interval_ms(interval, expected):
+    assert sp.interval_ms(interval) == expected
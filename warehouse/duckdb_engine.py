@@ -0,0 +1,437 @@
+"""
+Local warehouse on DuckDB (embedded, columnar): creates the star schema from
+schema/ddl_star_schema.sql and loads it - from the keyed Parquet of etl/star_schema.py when that
+is up to date, else from the ETL staging Parquet (or the sample CSVs) with the dimensions built
+in SQL - and runs sql/advanced_queries.sql - translating the Snowflake-specific
+syntax - so the queries can be iterated on and timed offline. The dashboard can also read its
+aggregates from here (dashboard.backend: duckdb) while the file matches the current sources.
+Run from project root: python warehouse/duckdb_engine.py [build|queries|all] [--db data/warehouse.duckdb]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import yaml
+
+# Optional: DuckDB (pip install duckdb)
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+BASE = Path(__file__).resolve().parent.parent
+if str(BASE) not in sys.path:
+    sys.path.insert(0, str(BASE))
+
+from analytics.serving import PROGRESS_BINS, entity_paths, sources_fingerprint  # noqa: E402
+from etl.star_schema import DIMENSIONS, FACTS, FISCAL_YEAR_START_MONTH, STAR, UNKNOWN_ID, UNKNOWN_KEY, star_is_current  # noqa: E402
+
+DDL_PATH = BASE / "schema" / "ddl_star_schema.sql"
+QUERIES_PATH = BASE / "sql" / "advanced_queries.sql"
+DEFAULT_DB = BASE / "data" / "warehouse.duckdb"
+SOURCE_ENTITIES = ("learners", "courses", "enrollments", "events")
+# one row: sources_fingerprint(SOURCE_ENTITIES) as JSON, taken when the build started
+META_TABLE = "warehouse_meta"
+
+
+def load_config() -> dict:
+    config_path = BASE / "config" / "settings.yaml"
+    if not config_path.exists():
+        return {}
+    with open(config_path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def db_path(config: Optional[dict] = None) -> Path:
+    path = Path(((config if config is not None else load_config()).get("warehouse") or {}).get("path") or DEFAULT_DB)
+    return path if path.is_absolute() else BASE / path
+
+
+# ---------------------------------------------------------------------------
+# Snowflake -> DuckDB translation
+# ---------------------------------------------------------------------------
+
+def split_statements(sql: str) -> list:
+    """(title, statement) pairs; title is the latest '-- N) ...' heading before the statement."""
+    statements, title, current = [], None, []
+    for line in sql.splitlines():
+        stripped = line.strip()
+        heading = re.match(r"--\s*(\d+\).*)", stripped)
+        if heading:
+            title = heading.group(1).strip()
+        if stripped.startswith("--"):
+            continue
+        current.append(line.split("--", 1)[0])
+        if stripped.endswith(";"):
+            stmt = "\n".join(current).strip().rstrip(";").strip()
+            if stmt:
+                statements.append((title, stmt))
+            current = []
+    return statements
+
+
+def translate_ddl(stmt: str) -> list:
+    """
+    One Snowflake CREATE TABLE -> DuckDB statements. TIMESTAMP_NTZ becomes TIMESTAMP and VARIANT
+    becomes JSON. IDENTITY becomes a sequence default. Key and REFERENCES constraints are dropped:
+    Snowflake only records them, while DuckDB would enforce them with an index per key and slow
+    bulk loads down.
+    """
+    table = re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", stmt, re.I).group(1)
+    out = []
+    stmt = re.sub(r"\bTIMESTAMP_NTZ\b", "TIMESTAMP", stmt, flags=re.I)
+    stmt = re.sub(r"\bVARIANT\b", "JSON", stmt, flags=re.I)
+    stmt = re.sub(r"\s+REFERENCES\s+\w+\s*\([^)]*\)", "", stmt, flags=re.I)
+    if re.search(r"\bIDENTITY\b", stmt, re.I):
+        out.append(f"CREATE SEQUENCE IF NOT EXISTS seq_{table}")
+        stmt = re.sub(r"\bIDENTITY\b", f"DEFAULT nextval('seq_{table}')", stmt, flags=re.I)
+    stmt = re.sub(r",\s*UNIQUE\s*\([^)]*\)", "", stmt, flags=re.I)
+    stmt = re.sub(r"\s+PRIMARY KEY\b", "", stmt, flags=re.I)
+    stmt = re.sub(r"\s+UNIQUE\b", "", stmt, flags=re.I)
+    out.append(stmt)
+    return out
+
+
+def translate_query(sql: str) -> str:
+    """Snowflake date functions used in sql/ -> DuckDB: CURRENT_DATE(), DATEADD(unit, n, expr)."""
+    sql = re.sub(r"\bCURRENT_DATE\(\)", "CURRENT_DATE", sql, flags=re.I)
+    sql = re.sub(r"\bCURRENT_TIMESTAMP\(\)", "CURRENT_TIMESTAMP", sql, flags=re.I)
+    return re.sub(
+        r"\bDATEADD\(\s*(\w+)\s*,\s*([^,()]+?)\s*,\s*([^,()]+?)\s*\)",
+        lambda m: f"({m.group(3)} + INTERVAL ({m.group(2)}) {m.group(1).upper()})",
+        sql,
+        flags=re.I,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Schema and load
+# ---------------------------------------------------------------------------
+
+def connect(path=None, read_only: bool = False):
+    if not HAS_DUCKDB:
+        raise ImportError("duckdb is not installed: pip install duckdb")
+    path = Path(path) if path else db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return duckdb.connect(str(path), read_only=read_only)
+
+
+def create_star_schema(conn, ddl_path: Path = DDL_PATH) -> list:
+    """Drop and recreate every table in the DDL file; returns the table names."""
+    tables = []
+    for _, stmt in split_statements(Path(ddl_path).read_text()):
+        if not re.match(r"CREATE TABLE", stmt, re.I):
+            continue
+        table = re.search(r"CREATE TABLE IF NOT EXISTS (\w+)", stmt, re.I).group(1)
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"DROP SEQUENCE IF EXISTS seq_{table}")
+        for ddl in translate_ddl(stmt):
+            conn.execute(ddl)
+        tables.append(table)
+    return tables
+
+
+def _source_relation(entity: str) -> Optional[str]:
+    """SQL relation over staged Parquet parts, else the sample CSV (None if neither exists)."""
+    staged, sample = entity_paths(entity)
+    if staged.is_dir() and any(staged.glob("*.parquet")):
+        return f"read_parquet('{staged.as_posix()}/*.parquet', union_by_name = true)"
+    if sample.exists():
+        return f"read_csv('{sample.as_posix()}', header = true)"
+    return None
+
+
+def _columns(conn, relation: str) -> set:
+    return {row[0] for row in conn.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()}
+
+
+def _date_key(expr: str) -> str:
+    return f"CAST(strftime(CAST({expr} AS DATE), '%Y%m%d') AS INTEGER)"
+
+
+def load_sources(conn) -> dict:
+    """Stage each entity as a src_<entity> view; returns {entity: relation} for those found."""
+    found = {}
+    for entity in SOURCE_ENTITIES:
+        relation = _source_relation(entity)
+        if relation is None:
+            continue
+        conn.execute(f"CREATE OR REPLACE TEMP VIEW src_{entity} AS SELECT * FROM {relation}")
+        found[entity] = relation
+    return found
+
+
+def load_star_parquet(conn, star_dir: Path = STAR) -> dict:
+    """Insert the keyed tables written by etl/star_schema.py as-is (identity columns take their defaults)."""
+    for table in DIMENSIONS + FACTS:
+        path = Path(star_dir) / f"{table}.parquet"
+        if path.exists():
+            conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM read_parquet('{path.as_posix()}')")
+    return table_counts(conn)
+
+
+def load_star(conn) -> dict:
+    """
+    Populate the star schema from the staged entities. Dimension keys are assigned by
+    ROW_NUMBER over the natural key, dim_date covers every date referenced, and the facts are
+    joined to the dimensions in one INSERT ... SELECT each; facts whose learner or course is
+    missing point at the unknown member (key -1), as in etl/star_schema.py. Returns row counts
+    per table.
+    """
+    sources = load_sources(conn)
+    if not {"courses", "enrollments", "learners"} <= set(sources):
+        raise FileNotFoundError("learners, courses and enrollments are required (data/staging or data/sample_*.csv)")
+    learner_cols = _columns(conn, "src_learners")
+    email_hash = "email_hash" if "email_hash" in learner_cols else (
+        "sha256(nullif(lower(trim(email)), ''))" if "email" in learner_cols else "NULL"
+    )
+    has_events = "events" in sources
+    event_dates = "UNION SELECT CAST(event_time AS DATE) FROM src_events" if has_events else ""
+    q = FISCAL_YEAR_START_MONTH
+
+    conn.execute(f"""
+        INSERT INTO dim_date
+        WITH bounds AS (
+            SELECT min(d) AS lo, max(d) AS hi FROM (
+                SELECT CAST(enroll_date AS DATE) AS d FROM src_enrollments
+                UNION SELECT CAST(signup_date AS DATE) FROM src_learners
+                {event_dates}
+            ) WHERE d IS NOT NULL
+        ),
+        days AS (SELECT CAST(unnest(generate_series(lo, hi, INTERVAL 1 DAY)) AS DATE) AS full_date FROM bounds)
+        SELECT
+            {_date_key('full_date')}, full_date, year(full_date), quarter(full_date), month(full_date),
+            weekofyear(full_date), isodow(full_date), dayname(full_date), monthname(full_date),
+            isodow(full_date) >= 6,
+            year(full_date) + CASE WHEN month(full_date) >= {q} AND {q} > 1 THEN 1 ELSE 0 END,
+            ((month(full_date) - {q} + 12) % 12) // 3 + 1
+        FROM days
+    """)
+    conn.execute("INSERT INTO dim_course_category (category_key, category_name) VALUES (?, ?)", [UNKNOWN_KEY, UNKNOWN_ID])
+    conn.execute("""
+        INSERT INTO dim_course_category (category_key, category_name, parent_category_key)
+        SELECT row_number() OVER (ORDER BY category_name), category_name, NULL
+        FROM (SELECT DISTINCT coalesce(category_name, 'Unknown') AS category_name FROM src_courses)
+    """)
+    conn.execute("INSERT INTO dim_course (course_key, course_id, course_name, category_key) VALUES (?, ?, ?, ?)", [UNKNOWN_KEY, UNKNOWN_ID, UNKNOWN_ID, UNKNOWN_KEY])
+    conn.execute("""
+        INSERT INTO dim_course (course_key, course_id, course_name, category_key, level_code, duration_minutes, created_at, updated_at)
+        SELECT row_number() OVER (ORDER BY c.course_id), c.course_id, c.course_name, cat.category_key,
+               c.level_code, c.duration_minutes, current_timestamp, current_timestamp
+        FROM src_courses c
+        JOIN dim_course_category cat ON cat.category_name = coalesce(c.category_name, 'Unknown')
+    """)
+    conn.execute("INSERT INTO dim_learner (learner_key, learner_id, is_active) VALUES (?, ?, FALSE)", [UNKNOWN_KEY, UNKNOWN_ID])
+    conn.execute(f"""
+        INSERT INTO dim_learner (learner_key, learner_id, email_hash, country_code, signup_date_key, is_active, created_at, updated_at)
+        SELECT row_number() OVER (ORDER BY learner_id), learner_id, {email_hash}, country_code,
+               {_date_key('signup_date')}, TRUE, current_timestamp, current_timestamp
+        FROM src_learners
+    """)
+    conn.execute("""
+        INSERT INTO dim_instructor (instructor_key, instructor_id, display_name, created_at)
+        SELECT row_number() OVER (ORDER BY instructor_id), instructor_id, instructor_id, current_timestamp
+        FROM (SELECT DISTINCT instructor_id FROM src_enrollments WHERE instructor_id IS NOT NULL)
+    """)
+    conn.execute("""
+        INSERT INTO dim_enrollment_status VALUES
+            (1, 'not_started', 'Not started'), (2, 'in_progress', 'In progress'), (3, 'completed', 'Completed')
+    """)
+    conn.execute(f"""
+        INSERT INTO fact_enrollment (
+            enrollment_id, learner_key, course_key, instructor_key, status_key, enroll_date_key,
+            complete_date_key, progress_pct, time_spent_minutes, certificate_issued, created_at, updated_at)
+        SELECT e.enrollment_id, coalesce(l.learner_key, {UNKNOWN_KEY}), coalesce(c.course_key, {UNKNOWN_KEY}), i.instructor_key,
+               CASE WHEN e.progress_pct >= 100 THEN 3 WHEN coalesce(e.progress_pct, 0) > 0 THEN 2 ELSE 1 END,
+               {_date_key('e.enroll_date')}, NULL, e.progress_pct, e.time_spent_minutes,
+               coalesce(CAST(e.certificate_issued AS BOOLEAN), FALSE), current_timestamp, current_timestamp
+        FROM src_enrollments e
+        LEFT JOIN dim_learner l ON l.learner_id = e.learner_id
+        LEFT JOIN dim_course c ON c.course_id = e.course_id
+        LEFT JOIN dim_instructor i ON i.instructor_id = e.instructor_id
+    """)
+    if has_events:
+        conn.execute(f"""
+            INSERT INTO fact_learning_event (
+                event_id, learner_key, course_key, event_date_key, event_time, event_type,
+                module_id, duration_seconds, score, payload, created_at)
+            SELECT v.event_id, coalesce(l.learner_key, {UNKNOWN_KEY}), coalesce(c.course_key, {UNKNOWN_KEY}), {_date_key('v.event_time')}, CAST(v.event_time AS TIMESTAMP),
+                   v.event_type, NULL, v.duration_seconds, v.score, NULL, current_timestamp
+            FROM src_events v
+            LEFT JOIN dim_learner l ON l.learner_id = v.learner_id
+            LEFT JOIN dim_course c ON c.course_id = v.course_id
+        """)
+    return table_counts(conn)
+
+
+def table_counts(conn) -> dict:
+    tables = [r[0] for r in conn.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'main' AND table_type = 'BASE TABLE' ORDER BY 1").fetchall()]
+    return {t: conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0] for t in tables if t != META_TABLE}
+
+
+def stamp_sources(conn, fingerprint: tuple) -> None:
+    conn.execute(f"CREATE OR REPLACE TABLE {META_TABLE} (sources VARCHAR)")
+    conn.execute(f"INSERT INTO {META_TABLE} VALUES (?)", [json.dumps(fingerprint)])
+
+
+def warehouse_is_current(conn) -> bool:
+    """True when the warehouse was built from the sources as they are now."""
+    found = conn.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?", [META_TABLE]
+    ).fetchone()[0]
+    if not found:
+        return False
+    row = conn.execute(f"SELECT sources FROM {META_TABLE}").fetchone()
+    return row is not None and json.loads(row[0]) == json.loads(json.dumps(sources_fingerprint(SOURCE_ENTITIES)))
+
+
+def build_warehouse(path=None) -> dict:
+    """
+    Recreate the schema and reload it from the current data/star or staging output; returns row
+    counts. The build goes to a temp file that replaces the database once complete, so readers
+    never see it half loaded.
+    """
+    start = time.perf_counter()
+    path = Path(path) if path else db_path()
+    tmp = path.with_name(f".{path.name}.tmp")
+    # Left behind by an interrupted build
+    for stale in (tmp, tmp.with_name(tmp.name + ".wal")):
+        stale.unlink(missing_ok=True)
+    # Taken before reading, so sources that change mid-build leave the stamp stale
+    fingerprint = sources_fingerprint(SOURCE_ENTITIES)
+    conn = connect(tmp)
+    try:
+        create_star_schema(conn)
+        # Prefer the ETL's star output (persistent surrogate keys) when it is up to date
+        counts = load_star_parquet(conn) if star_is_current() else load_star(conn)
+        stamp_sources(conn, fingerprint)
+    finally:
+        conn.close()
+    # A leftover log of the old file must not be replayed against the new one
+    path.with_name(path.name + ".wal").unlink(missing_ok=True)
+    os.replace(tmp, path)
+    print(f"Warehouse built in {time.perf_counter() - start:.2f}s: {counts}")
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+def run_advanced_queries(conn, path: Path = QUERIES_PATH, repeat: int = 1) -> list:
+    """Run each query in sql/advanced_queries.sql; best-of-`repeat` seconds and row count per query."""
+    results = []
+    for title, stmt in split_statements(Path(path).read_text()):
+        sql = translate_query(stmt)
+        timings, frame = [], None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            frame = conn.execute(sql).df()
+            timings.append(time.perf_counter() - start)
+        results.append({"query": title, "rows": len(frame), "seconds": round(min(timings), 4), "result": frame})
+    return results
+
+
+def dashboard_aggregates(conn) -> dict:
+    """
+    The analytics/serving.py aggregate tables, computed by SQL over the star schema. Totals match
+    the pandas backend; the course views leave out the unknown member as pandas leaves out
+    courses missing from the catalogue. Orphan learner and course ids are collapsed into the
+    unknown member, so unique_learners / unique_courses count them once and by_learner has one
+    "(unknown)" row for them, where pandas keeps each id.
+    """
+    completed = "coalesce(f.certificate_issued, FALSE)"
+    by_course = conn.execute(f"""
+        SELECT c.course_id, c.course_name, cat.category_name, c.level_code, c.duration_minutes,
+               count(f.enrollment_id) AS enrollments,
+               avg(CAST(f.progress_pct AS DOUBLE)) AS avg_progress,
+               CAST(coalesce(sum(CAST({completed} AS INTEGER)), 0) AS BIGINT) AS completed
+        FROM dim_course c
+        JOIN dim_course_category cat ON cat.category_key = c.category_key
+        LEFT JOIN fact_enrollment f ON f.course_key = c.course_key
+        WHERE c.course_key <> {UNKNOWN_KEY}
+        GROUP BY ALL ORDER BY c.course_id
+    """).df()
+    width = 100 / PROGRESS_BINS
+    hist = conn.execute(f"""
+        SELECT least(CAST(floor(CAST(progress_pct AS DOUBLE) / {width}) AS INTEGER), {PROGRESS_BINS - 1}) AS b, count(*) AS count
+        FROM fact_enrollment WHERE progress_pct BETWEEN 0 AND 100 GROUP BY b
+    """).df().set_index("b")["count"].reindex(range(PROGRESS_BINS), fill_value=0)
+    return {
+        "summary": conn.execute(f"""
+            SELECT count(*) AS total_enrollments, CAST(coalesce(sum(CAST({completed} AS INTEGER)), 0) AS BIGINT) AS completed,
+                   count(DISTINCT learner_key) AS unique_learners, count(DISTINCT course_key) AS unique_courses
+            FROM fact_enrollment f
+        """).df(),
+        "by_date": conn.execute(f"""
+            SELECT CAST(d.full_date AS TIMESTAMP) AS enroll_date, count(*) AS count,
+                   CAST(sum(CAST({completed} AS INTEGER)) AS BIGINT) AS completed
+            FROM fact_enrollment f JOIN dim_date d ON d.date_key = f.enroll_date_key
+            GROUP BY 1 ORDER BY 1
+        """).df(),
+        "by_course": by_course,
+        "by_course_name": conn.execute(f"""
+            SELECT c.course_name, count(*) AS enrollments, avg(CAST(f.progress_pct AS DOUBLE)) AS avg_progress
+            FROM fact_enrollment f JOIN dim_course c ON c.course_key = f.course_key
+            WHERE c.course_key <> {UNKNOWN_KEY}
+            GROUP BY 1 ORDER BY 1
+        """).df(),
+        "by_category": by_course.groupby("category_name").agg(courses=("course_id", "nunique"), enrollments=("enrollments", "sum")).reset_index(),
+        "by_learner": conn.execute(f"""
+            SELECT l.learner_id, count(*) AS courses, avg(CAST(f.progress_pct AS DOUBLE)) AS avg_progress,
+                   CAST(sum(CAST({completed} AS INTEGER)) AS BIGINT) AS completed, sum(f.time_spent_minutes) AS time_spent_minutes
+            FROM fact_enrollment f JOIN dim_learner l ON l.learner_key = f.learner_key
+            GROUP BY 1 ORDER BY 1
+        """).df(),
+        "progress_hist": pd.DataFrame({
+            "bin_start": [i * width for i in range(PROGRESS_BINS)],
+            "bin_end": [(i + 1) * width for i in range(PROGRESS_BINS)],
+            "count": hist.to_numpy(),
+        }),
+    }
+
+
+def read_dashboard_aggregates(path=None) -> Optional[dict]:
+    """Dashboard aggregates from a built warehouse (read-only), or None if there is none built
+    from the current sources."""
+    path = Path(path) if path else db_path()
+    if not HAS_DUCKDB or not path.exists():
+        return None
+    conn = connect(path, read_only=True)
+    try:
+        if not warehouse_is_current(conn):
+            return None
+        return dashboard_aggregates(conn)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local DuckDB star-schema warehouse")
+    parser.add_argument("command", nargs="?", choices=["build", "queries", "all"], default="all")
+    parser.add_argument("--db", help="database file (default warehouse.path or data/warehouse.duckdb)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query; the best time is reported")
+    parser.add_argument("--show", type=int, default=0, help="print the first N rows of each result")
+    args = parser.parse_args()
+    if args.command in ("build", "all"):
+        build_warehouse(args.db)
+    if args.command in ("queries", "all"):
+        conn = connect(args.db, read_only=True)
+        try:
+            for r in run_advanced_queries(conn, repeat=args.repeat):
+                print(f"{r['seconds']:>9.4f}s  {r['rows']:>10,} rows  {r['query']}")
+                if args.show:
+                    print(r["result"].head(args.show).to_string(index=False))
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
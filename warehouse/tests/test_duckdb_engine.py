@@ -0,0 +1,89 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from analytics import serving  # noqa: E402
+from etl import star_schema  # noqa: E402
+from warehouse import duckdb_engine as dw  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_star(monkeypatch):
+    """Load from the sources, not from whatever star output the tree holds."""
+    monkeypatch.setattr(dw, "star_is_current", lambda: False)
+
+
+def _touch(path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_build_replaces_the_database_and_leaves_no_temp_file(data_dir):
+    db = data_dir / "warehouse.duckdb"
+    first = dw.build_warehouse(db)
+    assert dw.build_warehouse(db) == first
+    assert "warehouse_meta" not in first
+    assert sorted(p.name for p in data_dir.glob("*.duckdb*")) == ["warehouse.duckdb"]
+
+
+def test_failed_build_keeps_the_previous_database(data_dir, monkeypatch):
+    db = data_dir / "warehouse.duckdb"
+    dw.build_warehouse(db)
+
+    def broken(conn):
+        raise RuntimeError("load failed")
+
+    monkeypatch.setattr(dw, "load_star", broken)
+    with pytest.raises(RuntimeError):
+        dw.build_warehouse(db)
+
+    assert dw.read_dashboard_aggregates(db) is not None
+
+
+def test_dashboard_aggregates_require_a_current_stamp(data_dir):
+    db = data_dir / "warehouse.duckdb"
+    assert dw.read_dashboard_aggregates(db) is None
+    dw.build_warehouse(db)
+
+    aggs = dw.read_dashboard_aggregates(db)
+    expected = serving.build_aggregates(*serving.load_sources())
+    assert aggs["summary"]["total_enrollments"].iloc[0] == expected["summary"]["total_enrollments"].iloc[0]
+
+    path = data_dir / "sample_enrollments.csv"
+    enrollments = pd.read_csv(path)
+    pd.concat([enrollments, enrollments.tail(1).assign(enrollment_id="E999")]).to_csv(path, index=False)
+    _touch(path)
+    assert dw.read_dashboard_aggregates(db) is None
+
+    dw.build_warehouse(db)
+    assert dw.read_dashboard_aggregates(db)["summary"]["total_enrollments"].iloc[0] == len(enrollments) + 1
+
+
+
+@pytest.mark.parametrize("from_star", [False, True])
+def test_orphans_count_like_the_pandas_backend(tmp_path, data_dir, monkeypatch, from_star):
+    path = data_dir / "sample_enrollments.csv"
+    df = pd.read_csv(path)
+    orphans = pd.concat([df.head(1).assign(enrollment_id="E901", learner_id="L999"), df.head(1).assign(enrollment_id="E902", course_id="C999")])
+    pd.concat([df, orphans]).to_csv(path, index=False)
+    if from_star:
+        star = tmp_path / "star"
+        star_schema.build_star_schema(star)
+        load_star_parquet = dw.load_star_parquet
+        monkeypatch.setattr(dw, "star_is_current", lambda: True)
+        monkeypatch.setattr(dw, "load_star_parquet", lambda conn: load_star_parquet(conn, star))
+    db = data_dir / "warehouse.duckdb"
+    dw.build_warehouse(db)
+
+    aggs = dw.read_dashboard_aggregates(db)
+    expected = serving.build_aggregates(*serving.load_sources())
+    for name in ("total_enrollments", "completed"):
+        assert aggs["summary"][name].iloc[0] == expected["summary"][name].iloc[0]
+    assert aggs["by_date"]["count"].sum() == expected["by_date"]["count"].sum()
+    assert aggs["progress_hist"]["count"].tolist() == expected["progress_hist"]["count"].tolist()
+    assert aggs["by_course"]["course_id"].tolist() == expected["by_course"]["course_id"].tolist()
+    assert aggs["by_course"]["enrollments"].tolist() == expected["by_course"]["enrollments"].tolist()
+    assert aggs["by_course_name"]["enrollments"].sum() == expected["by_course_name"]["enrollments"].sum()